@@ -0,0 +1,121 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import datetime as dt
+import subprocess
+from typing import Any, Dict, List
+
+from download import EXECUTORS
+from benchmark.mock_reddit_server import MockRedditServer
+
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUMMARY = re.compile(r"Reddit details downloaded\. Total: (\d+)\. Authors downloaded: (\d+)\.")
+
+
+def write_config(folder: str, start_date: dt.datetime) -> None:
+    """ Writes the app config (of the repository) into the folder, searching since the start date """
+    with open(os.path.join(ROOT_FOLDER, "config.json")) as f:
+        config = json.load(f)
+    config["start_date"] = start_date.strftime("%Y-%m-%d")
+    with open(os.path.join(folder, "config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def run_single(api_url: str, start_date: dt.datetime, executor_name: str, concurrency: int, limit: int,
+               extra_args: List[str] | None = None) -> Dict[str, Any]:
+    """ Runs the downloader app end to end against the API (in a fresh folder) and returns its measurements """
+    with tempfile.TemporaryDirectory() as folder:
+        write_config(folder, start_date)
+        args = [sys.executable, os.path.join(ROOT_FOLDER, "run_download_reddits.py"), "corgi", "-l", str(limit),
+                "--api_url", api_url, "--executor", executor_name, "--num_processes", str(concurrency),
+                "--details_concurrency", str(concurrency), "--authors_concurrency", str(concurrency),
+                "--no_journal", "--progress_interval", "3600"] + (extra_args or list([]))
+        output_file = os.path.join(folder, "output.txt")
+        with open(output_file, "w") as output:
+            start = time.perf_counter()
+            process = subprocess.Popen(args, cwd=folder, stdout=output, stderr=subprocess.STDOUT)
+            # Resource usage of the app together with its (waited for) worker processes
+            _, status, usage = os.wait4(process.pid, 0)
+            wall = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+        with open(output_file) as f:
+            text = f.read()
+        match = SUMMARY.search(text)
+        if process.returncode != 0 or match is None:
+            raise RuntimeError(f"Download with {executor_name} executor failed (exit code: {process.returncode}):\n{text[-2000:]}")
+
+    num_posts, num_authors = int(match.group(1)), int(match.group(2))
+    return {
+        "executor": executor_name,
+        "concurrency": concurrency,
+        "posts": num_posts,
+        "authors": num_authors,
+        "wall_s": wall,
+        "posts_per_s": num_posts / wall,
+        "authors_per_s": num_authors / wall,
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+    }
+
+
+def run(server: MockRedditServer, executors: List[str] | None = None, concurrencies: List[int] | None = None,
+        limit: int | None = None, extra_args: List[str] | None = None) -> List[Dict[str, Any]]:
+    """ Runs the downloader against the (started) mock server for every executor and concurrency """
+    measurements = list([])
+    for executor_name in executors or list(EXECUTORS):
+        for concurrency in concurrencies or [4, 8, 16]:
+            measurements.append(run_single(server.url, server.start_date, executor_name, concurrency,
+                                           limit or server.num_posts, extra_args))
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End to end benchmark of the downloader app against a local mock Reddit API.")
+    parser.add_argument("-e", "--executors", type=str, nargs="+", required=False, choices=list(EXECUTORS), default=list(EXECUTORS),
+                        help=f"executors to benchmark, default: {' '.join(EXECUTORS)}")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", required=False, default=[4, 8, 16],
+                        help="reddits and authors concurrencies to benchmark, default: 4 8 16")
+    parser.add_argument("-n", "--num_posts", type=int, required=False, default=500,
+                        help="number of posts found by the search, default: 500")
+    parser.add_argument("--latency", type=float, required=False, default=0.05,
+                        help="delay of every response in seconds, default: 0.05")
+    parser.add_argument("--jitter", type=float, required=False, default=0.,
+                        help="max random delay added to the latency in seconds, default: 0")
+    parser.add_argument("--page_size", type=int, required=False, default=100,
+                        help="max number of search results of a page, default: 100")
+    parser.add_argument("--num_comments", type=int, required=False, default=20,
+                        help="number of comments of every post, default: 20")
+    parser.add_argument("--max_depth", type=int, required=False, default=3,
+                        help="max nesting of the comments, default: 3")
+    parser.add_argument("--num_authors", type=int, required=False, default=200,
+                        help="number of authors of the posts and comments, default: 200")
+    parser.add_argument("--output", type=str, required=False, default=None,
+                        help="JSON file to save the measurements into, default: none")
+    args, extra_args = parser.parse_known_args()
+
+    server = MockRedditServer(latency=args.latency, jitter=args.jitter, num_posts=args.num_posts, page_size=args.page_size,
+                              num_comments=args.num_comments, max_depth=args.max_depth, num_authors=args.num_authors).start()
+    try:
+        measurements = run(server, args.executors, args.concurrency, extra_args=extra_args)
+    finally:
+        server.stop()
+
+    print(f"{args.num_posts} posts, {args.num_comments} comments each, {args.num_authors} authors, latency {args.latency} s"
+          f"{' ' + ' '.join(extra_args) if extra_args else ''}\n")
+    print(f"{'executor':<10}{'concurrency':>12}{'posts':>8}{'authors':>9}{'wall [s]':>10}{'posts/s':>10}{'authors/s':>11}"
+          f"{'CPU [s]':>10}{'peak RSS [MB]':>15}")
+    for m in measurements:
+        print(f"{m['executor']:<10}{m['concurrency']:>12}{m['posts']:>8}{m['authors']:>9}{m['wall_s']:>10.2f}"
+              f"{m['posts_per_s']:>10.1f}{m['authors_per_s']:>11.1f}{m['cpu_s']:>10.2f}{m['peak_rss_mb']:>15.1f}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(measurements, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import functools
+import subprocess
+from typing import Any, Dict, List
+
+from download import EXECUTORS, create_executor
+
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_fetch(item: int, latency: float, payload_kb: int) -> Dict[str, Any]:
+    """ I/O-bound stand-in of a YARS call: waits for the 'network' and returns a payload of given size """
+    time.sleep(latency)
+    return {"id": item, "body": "x" * (payload_kb * 1024)}
+
+
+def run_single(executor_name: str, num_items: int, concurrency: int, latency: float, payload_kb: int) -> Dict[str, Any]:
+    """ Runs the workload on one executor (in the current process) and returns its measurements """
+    executor = create_executor(executor_name, concurrency, num_items)
+    fn = functools.partial(synthetic_fetch, latency=latency, payload_kb=payload_kb)
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    results = executor.run(fn, list(range(num_items)), stage="items")
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    processes = 1 + (executor.concurrency if executor.name == "process" else 0)
+    peak_rss_mb, peak_child_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, children.ru_maxrss / 1024
+    return {
+        "executor": executor.name,
+        "items": len(results),
+        "wall_s": wall,
+        "items_per_s": len(results) / wall,
+        "cpu_s": cpu + children.ru_utime + children.ru_stime,
+        "peak_rss_mb": peak_rss_mb,
+        "peak_child_rss_mb": peak_child_rss_mb,
+        "total_rss_mb": peak_rss_mb + peak_child_rss_mb * (processes - 1),
+        "processes": processes,
+    }
+
+
+def run(num_items: int = 400, concurrency: int = 8, latency: float = 0.05, payload_kb: int = 64,
+        executors: List[str] | None = None) -> List[Dict[str, Any]]:
+    """ Runs the same workload on every executor, each in a fresh interpreter (for clean memory figures) """
+    measurements = list([])
+    for executor_name in executors or list(EXECUTORS):
+        output = subprocess.run([sys.executable, "-m", "benchmark.bench_executors", "--single", executor_name,
+                                 "-n", str(num_items), "-c", str(concurrency), "--latency", str(latency),
+                                 "--payload_kb", str(payload_kb)],
+                                cwd=ROOT_FOLDER, check=True, capture_output=True, text=True).stdout
+        measurements.append(json.loads(output.strip().splitlines()[-1]))
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the thread, process and async executors on one workload.")
+    parser.add_argument("-n", "--num_items", type=int, required=False, default=400,
+                        help="number of items (simulated requests), default: 400")
+    parser.add_argument("-c", "--concurrency", type=int, required=False, default=8,
+                        help="concurrency of every executor, default: 8")
+    parser.add_argument("--latency", type=float, required=False, default=0.05,
+                        help="simulated request latency in seconds, default: 0.05")
+    parser.add_argument("--payload_kb", type=int, required=False, default=64,
+                        help="size of every result in KB (pickled between processes), default: 64")
+    parser.add_argument("--single", type=str, required=False, choices=list(EXECUTORS), default=None,
+                        help="run only given executor in this process and print its measurements as JSON")
+    args = parser.parse_args()
+
+    if args.single is not None:
+        print(json.dumps(run_single(args.single, args.num_items, args.concurrency, args.latency, args.payload_kb)))
+        return
+
+    measurements = run(args.num_items, args.concurrency, args.latency, args.payload_kb)
+    print(f"{args.num_items} items, concurrency {args.concurrency}, latency {args.latency} s, payload {args.payload_kb} KB\n")
+    print(f"{'executor':<10}{'wall [s]':>10}{'items/s':>10}{'CPU [s]':>10}{'RSS [MB]':>10}{'child RSS [MB]':>16}{'total RSS [MB]':>16}{'processes':>11}")
+    for m in measurements:
+        print(f"{m['executor']:<10}{m['wall_s']:>10.2f}{m['items_per_s']:>10.1f}{m['cpu_s']:>10.2f}"
+              f"{m['peak_rss_mb']:>10.1f}{m['peak_child_rss_mb']:>16.1f}{m['total_rss_mb']:>16.1f}{m['processes']:>11}")
+
+
+if __name__ == "__main__":
+    main()
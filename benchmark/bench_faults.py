@@ -0,0 +1,110 @@
+import time
+import json
+import logging
+import argparse
+import itertools
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import yars
+from benchmark.mock_reddit_server import MockRedditServer
+
+FAULTS = "429:0.05x3,429_retry_after:0.02,5xx:0.03,timeout:0.01,truncated:0.01,drip:0.02,reset:0.02"
+
+
+def run_single(server: MockRedditServer, faults: str | None, retries: int, backoff_factor: float, concurrency: int,
+               num_requests: int, timeout: float = 2., seed: int = 0) -> Dict[str, Any]:
+    """ Downloads the post details with the faults injected, returns the throughput, failures and latency percentiles """
+    downloader = yars.YARS(logger=logging.getLogger("bench_faults"), base_url=server.url, timeout=timeout,
+                           pool_maxsize=concurrency, retries=retries, backoff_factor=backoff_factor)
+    hits = [hit for page in downloader.search_reddit_pages("corgi", limit=num_requests) for hit in page]
+    permalinks = list(map(lambda h: h["link"].split("www.reddit.com")[1], hits))
+    # Injected from the post details on, every configuration gets the same faults
+    injector = yars.FaultInjector(faults or "", max_retries=downloader.session.adapters["http://"].max_retries,
+                                  pool_maxsize=concurrency, seed=seed)
+    downloader.session.mount("http://", injector)
+    downloader.session.mount("https://", injector)
+
+    def timed(permalink: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        details = downloader.scrape_post_details(permalink)
+        return {"latency_s": time.perf_counter() - start, "is_failed": details is None}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, permalinks))
+    wall = time.perf_counter() - start
+    latencies = list(map(lambda r: r["latency_s"] * 1000, results))
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    num_failed = sum(map(lambda r: r["is_failed"], results))
+    return {
+        "retries": retries,
+        "backoff_factor": backoff_factor,
+        "concurrency": concurrency,
+        "posts": len(results) - num_failed,
+        "failed": num_failed,
+        "wall_s": wall,
+        "posts_per_s": (len(results) - num_failed) / wall,
+        "p50_ms": percentiles[49],
+        "p95_ms": percentiles[94],
+        "p99_ms": percentiles[98],
+        "max_ms": max(latencies),
+        "injected": dict(injector.injected),
+    }
+
+
+def run(server: MockRedditServer, faults: str | None, retries: List[int], backoff_factors: List[float],
+        concurrencies: List[int], num_requests: int, timeout: float = 2., seed: int = 0) -> List[Dict[str, Any]]:
+    """ Runs every combination of the retries, backoff factor and concurrency against the (started) mock server """
+    return list(map(lambda c: run_single(server, faults, c[0], c[1], c[2], num_requests, timeout, seed),
+                    itertools.product(retries, backoff_factors, concurrencies)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fault injection benchmark: throughput, failures and tail latency of the "
+                                                 "post details downloading under injected faults, by the retry settings and concurrency.")
+    parser.add_argument("-f", "--faults", type=str, required=False, default=FAULTS,
+                        help=f"faults injected into the requests, comma separated KIND:RATE or KIND:RATExBURST of kinds "
+                             f"{', '.join(yars.faults.FAULTS)}, default: {FAULTS}")
+    parser.add_argument("-r", "--retries", type=int, nargs="+", required=False, default=[0, 2, 5],
+                        help="max numbers of retries of a request to benchmark, default: 0 2 5")
+    parser.add_argument("-b", "--backoff_factor", type=float, nargs="+", required=False, default=[0.1, 0.5],
+                        help="backoff factors of the retries to benchmark, default: 0.1 0.5")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", required=False, default=[4, 16],
+                        help="numbers of concurrent requests (threads) to benchmark, default: 4 16")
+    parser.add_argument("-n", "--num_posts", type=int, required=False, default=200,
+                        help="number of posts to download the details of, default: 200")
+    parser.add_argument("--timeout", type=float, required=False, default=2.,
+                        help="timeout of a request in seconds (an injected timeout takes as long), default: 2")
+    parser.add_argument("--latency", type=float, required=False, default=0.05,
+                        help="delay of every response of the mock in seconds, default: 0.05")
+    parser.add_argument("--num_comments", type=int, required=False, default=20,
+                        help="number of comments of every post, default: 20")
+    parser.add_argument("--seed", type=int, required=False, default=0,
+                        help="seed of the injected faults, default: 0")
+    parser.add_argument("--output", type=str, required=False, default=None,
+                        help="JSON file to save the measurements into, default: none")
+    args = parser.parse_args()
+
+    server = MockRedditServer(latency=args.latency, num_posts=args.num_posts, num_comments=args.num_comments).start()
+    try:
+        measurements = run(server, args.faults, args.retries, args.backoff_factor, args.concurrency, args.num_posts,
+                           args.timeout, args.seed)
+    finally:
+        server.stop()
+
+    print(f"{args.num_posts} posts, faults {args.faults}, latency {args.latency} s, timeout {args.timeout} s\n")
+    print(f"{'retries':>7}{'backoff':>9}{'concurrency':>13}{'posts':>7}{'failed':>8}{'wall [s]':>10}{'posts/s':>9}"
+          f"{'p50 [ms]':>10}{'p95 [ms]':>10}{'p99 [ms]':>10}{'max [ms]':>10}  injected")
+    for m in measurements:
+        injected = " ".join(map(lambda kv: f"{kv[0]}:{kv[1]}", sorted(m["injected"].items())))
+        print(f"{m['retries']:>7}{m['backoff_factor']:>9g}{m['concurrency']:>13}{m['posts']:>7}{m['failed']:>8}{m['wall_s']:>10.2f}"
+              f"{m['posts_per_s']:>9.1f}{m['p50_ms']:>10.0f}{m['p95_ms']:>10.0f}{m['p99_ms']:>10.0f}{m['max_ms']:>10.0f}  {injected}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(measurements, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
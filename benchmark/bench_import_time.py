@@ -0,0 +1,175 @@
+import os
+import sys
+import gzip
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each scenario is run in a fresh interpreter, the same way the CLI and spawn-style workers start
+SCENARIOS = {
+    "yars package (lazy agents)": "import yars",
+    "yars package (eager legacy agents)": "import legacy_agents; import yars",
+    "yars package + first get_agent() call": "import yars; yars.agents.get_agent()",
+    "CLI / worker module (lazy agents)": "import run_download_reddits",
+    "CLI / worker module (eager legacy agents)": "import legacy_agents; import run_download_reddits",
+}
+# Modules of the applications, imported at their startup (and by every spawned worker)
+APPLICATIONS = {
+    "download CLI": "run_download_reddits",
+    "batch CLI": "run_batch_download_reddits",
+    "daemon CLI": "run_daemon_download_reddits",
+    "distributed CLI / worker": "run_distributed_download_reddits",
+}
+# Config models every application builds first (pydantic), the startup target is set over them
+FLOOR_MODULE = "model"
+# Loaded by the features using them only (HTTP requests, displaying, async executor, metrics endpoint, month and year intervals)
+DEFERRED_MODULES = ["requests", "urllib3", "pygments", "asyncio", "http.server", "dateutil"]
+# Max import time of an application over the config models, in ms
+TARGET_MS = 80.
+
+
+def fresh_env(**variables: str) -> Dict[str, str]:
+    """ Environment of the fresh interpreters, writing bytecode caches (as a regular installation has them) """
+    return dict(filter(lambda kv: kv[0] != "PYTHONDONTWRITEBYTECODE", os.environ.items())) | variables
+
+
+def write_legacy_agents_module(folder: str) -> None:
+    """ Recreates the former module holding the whole pool as a tuple literal (for comparison) """
+    with gzip.open(os.path.join(ROOT_FOLDER, "yars", "user_agents.txt.gz"), "rt", encoding="utf-8") as f:
+        agents = [line.strip() for line in f if line.strip()]
+    with open(os.path.join(folder, "legacy_agents.py"), "w", encoding="utf-8") as f:
+        f.write("import random\n\nUSER_AGENTS = (\n")
+        f.writelines(f"    {a!r},\n" for a in agents)
+        f.write(")\n\n\ndef get_agent():\n    return random.choice(USER_AGENTS)\n")
+
+
+def measure(statement: str, env: Dict[str, str]) -> float:
+    """ Returns wall time (in ms) of running given statement in a fresh interpreter """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], cwd=ROOT_FOLDER, env=env, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def import_times(statement: str) -> Dict[str, Tuple[int, int]]:
+    """ Self and cumulative import times (in us) of every module imported by the statement in a fresh interpreter """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT_FOLDER, env=fresh_env(),
+                            check=True, capture_output=True, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # The header line has no times
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def run_startup(repeats: int = 20) -> Dict[str, Dict[str, Any]]:
+    """
+    Startup of every application (``-X importtime`` of its module, interleaved runs): median import time,
+    of the config models and over them, the deferred modules imported and the packages taking the most
+    """
+    runs: Dict[str, List[Dict[str, Tuple[int, int]]]] = {name: list([]) for name in APPLICATIONS}
+    # Warm-up run so that bytecode caches exist, as on a regular installation
+    for module in APPLICATIONS.values():
+        import_times(f"import {module}")
+    for _ in range(repeats):
+        for name, module in APPLICATIONS.items():
+            runs[name].append(import_times(f"import {module}"))
+
+    results = {}
+    for name, module in APPLICATIONS.items():
+        packages: Counter = Counter()
+        for times in runs[name]:
+            packages.update(dict(map(lambda kv: (kv[0], kv[1][0] / 1000 / repeats), times.items())))
+        by_package: Counter = Counter()
+        for imported, value in packages.items():
+            by_package[imported.split(".")[0]] += value
+        results[name] = {
+            "module": module,
+            "import_ms": statistics.median(map(lambda t: t[module][1] / 1000, runs[name])),
+            "floor_ms": statistics.median(map(lambda t: t.get(FLOOR_MODULE, (0, 0))[1] / 1000, runs[name])),
+            "over_floor_ms": statistics.median(map(lambda t: (t[module][1] - t.get(FLOOR_MODULE, (0, 0))[1]) / 1000, runs[name])),
+            "deferred": list(filter(lambda m: m in runs[name][-1], DEFERRED_MODULES)),
+            "packages": by_package.most_common(),
+        }
+    return results
+
+
+def check_target(results: Dict[str, Dict[str, Any]], target_ms: float) -> List[str]:
+    """ Applications over the target (over their config models) or importing deferred modules at startup """
+    violations = list([])
+    for name, r in results.items():
+        if r["over_floor_ms"] > target_ms:
+            violations.append(f"{name}: {r['over_floor_ms']:.1f} ms over the config models, target {target_ms:.0f} ms")
+        if len(r["deferred"]) > 0:
+            violations.append(f"{name}: imports {', '.join(r['deferred'])} at startup")
+    return violations
+
+
+def run(repeats: int = 20) -> Dict[str, float]:
+    """ Runs all scenarios (interleaved, to even out machine noise) and returns median wall times (in ms) """
+    scenarios = {"interpreter": "pass"} | SCENARIOS
+    with tempfile.TemporaryDirectory() as legacy_folder:
+        write_legacy_agents_module(legacy_folder)
+        env = fresh_env(PYTHONPATH=os.pathsep.join([ROOT_FOLDER, legacy_folder]))
+        # Warm-up run so that bytecode caches exist, as on a regular installation
+        for statement in scenarios.values():
+            measure(statement, env)
+
+        times: Dict[str, List[float]] = {name: list([]) for name in scenarios}
+        for _ in range(repeats):
+            for name, statement in scenarios.items():
+                times[name].append(measure(statement, env))
+    return {name: statistics.median(values) for name, values in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark of the applications startup (-X importtime) "
+                                                 "and of the user agents pool.")
+    parser.add_argument("-r", "--repeats", type=int, required=False, default=20,
+                        help="number of fresh interpreter runs per scenario, default: 20")
+    parser.add_argument("-t", "--target_ms", type=float, required=False, default=TARGET_MS,
+                        help=f"max import time of an application over its config models in ms, default: {TARGET_MS:.0f}")
+    parser.add_argument("--top", type=int, required=False, default=10,
+                        help="number of the packages taking the most of the download CLI startup shown, default: 10")
+    parser.add_argument("--startup_only", required=False, default=False, action="store_true",
+                        help="flag whether to skip the user agents pool scenarios, default: False")
+    args = parser.parse_args()
+
+    if not args.startup_only:
+        results = run(args.repeats)
+        print(f"{'scenario':<45}{'median [ms]':>12}{'over bare interpreter [ms]':>30}")
+        for name, value in results.items():
+            print(f"{name:<45}{value:>12.1f}{value - results['interpreter']:>30.1f}")
+
+        saving = results["CLI / worker module (eager legacy agents)"] - results["CLI / worker module (lazy agents)"]
+        print(f"\nStartup saving per CLI / worker process: {saving:.1f} ms\n")
+
+    startup = run_startup(args.repeats)
+    print(f"{'application':<30}{'import [ms]':>13}{'config models [ms]':>20}{'over them [ms]':>16}  deferred modules imported")
+    for name, r in startup.items():
+        print(f"{name:<30}{r['import_ms']:>13.1f}{r['floor_ms']:>20.1f}{r['over_floor_ms']:>16.1f}  {', '.join(r['deferred']) or '-'}")
+    print("\nPackages taking the most of the download CLI startup (self time, interpreter startup included):")
+    for package, value in startup["download CLI"]["packages"][:args.top]:
+        print(f"  {package:<30}{value:>8.1f} ms")
+
+    violations = check_target(startup, args.target_ms)
+    if len(violations) > 0:
+        print("\nStartup over the target:")
+        for violation in violations:
+            print(f"  {violation}")
+        sys.exit(1)
+    print(f"\nStartup within the target: at most {args.target_ms:.0f} ms over the config models, no deferred modules imported.")
+
+
+if __name__ == "__main__":
+    main()
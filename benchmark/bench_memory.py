@@ -0,0 +1,74 @@
+import sys
+import json
+import argparse
+from typing import Any, Dict, List
+
+from download import EXECUTORS
+from benchmark import bench_e2e
+from benchmark.mock_reddit_server import MockRedditServer
+
+
+def check_budget(measurements: List[Dict[str, Any]], budget_mb: float) -> List[str]:
+    """ Violations of the memory budget (peak RSS of the largest process) by the measured runs """
+    return list(map(lambda m: f"{m['executor']} executor at concurrency {m['concurrency']}: peak RSS "
+                              f"{m['peak_rss_mb']:.1f} MB over the budget of {budget_mb:.1f} MB "
+                              f"({m['posts']} posts, {m['peak_rss_mb'] / max(1, m['posts']) * 1024:.1f} KB per post)",
+                    filter(lambda m: m["peak_rss_mb"] > budget_mb, measurements)))
+
+
+def run(server: MockRedditServer, budget_mb: float, executors: List[str] | None = None, concurrency: int = 4,
+        extra_args: List[str] | None = None) -> Dict[str, Any]:
+    """ Downloads all the posts of the (started) mock server with every executor, checks the peak memory """
+    measurements = list(map(lambda e: bench_e2e.run_single(server.url, server.start_date, e, concurrency, server.num_posts,
+                                                           extra_args),
+                            executors or list(EXECUTORS)))
+    return {"budget_mb": budget_mb, "measurements": measurements, "violations": check_budget(measurements, budget_mb)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory budget benchmark: peak RSS of the downloader app downloading "
+                                                 "synthetic posts from a local mock Reddit API.")
+    parser.add_argument("-b", "--budget_mb", type=float, required=False, default=300.,
+                        help="max peak RSS of any process of the app in MB, default: 300")
+    parser.add_argument("-e", "--executors", type=str, nargs="+", required=False, choices=list(EXECUTORS), default=list(EXECUTORS),
+                        help=f"executors to check, default: {' '.join(EXECUTORS)}")
+    parser.add_argument("-c", "--concurrency", type=int, required=False, default=4,
+                        help="reddits and authors concurrency, default: 4")
+    parser.add_argument("-n", "--num_posts", type=int, required=False, default=1000,
+                        help="number of posts found by the search, default: 1000")
+    parser.add_argument("--num_comments", type=int, required=False, default=100,
+                        help="number of comments of every post, default: 100")
+    parser.add_argument("--max_depth", type=int, required=False, default=3,
+                        help="max nesting of the comments, default: 3")
+    parser.add_argument("--num_authors", type=int, required=False, default=200,
+                        help="number of authors of the posts and comments, default: 200")
+    parser.add_argument("--latency", type=float, required=False, default=0.,
+                        help="delay of every response in seconds, default: 0")
+    parser.add_argument("--output", type=str, required=False, default=None,
+                        help="JSON file to save the measurements into, default: none")
+    args, extra_args = parser.parse_known_args()
+
+    server = MockRedditServer(latency=args.latency, num_posts=args.num_posts, num_comments=args.num_comments,
+                              max_depth=args.max_depth, num_authors=args.num_authors).start()
+    try:
+        result = run(server, args.budget_mb, args.executors, args.concurrency, extra_args)
+    finally:
+        server.stop()
+
+    print(f"{args.num_posts} posts, {args.num_comments} comments each, budget {args.budget_mb:.1f} MB"
+          f"{' ' + ' '.join(extra_args) if extra_args else ''}\n")
+    print(f"{'executor':<10}{'posts':>8}{'wall [s]':>10}{'peak RSS [MB]':>15}{'budget':>8}")
+    for m in result["measurements"]:
+        print(f"{m['executor']:<10}{m['posts']:>8}{m['wall_s']:>10.2f}{m['peak_rss_mb']:>15.1f}"
+              f"{'over' if m['peak_rss_mb'] > args.budget_mb else 'ok':>8}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if len(result["violations"]) > 0:
+        print("\nMemory budget exceeded (run the app with --track_memory for the allocation sites):\n"
+              + "\n".join(result["violations"]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import io
+import gc
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import statistics
+import contextlib
+import datetime as dt
+from typing import Any, Callable, Dict, List
+
+import util
+import yars
+from benchmark.synthetic import SyntheticReddits
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def bench_extract_comments(generator: SyntheticReddits, size: int, thread_size: int) -> Callable[[], Any]:
+    """ Parsing of one thread of ``size`` comments """
+    parser = yars.YARS(logger=logging.getLogger("bench_micro"))
+    children = generator.thread(size)[1]["data"]["children"]
+    return lambda: parser._extract_comments(children)
+
+
+def bench_collect_authors(generator: SyntheticReddits, size: int, thread_size: int) -> Callable[[], Any]:
+    """ Authors of reddits with ``size`` comments """
+    reddits = generator.reddits(size, thread_size)
+    return lambda: util.collect_authors(reddits)
+
+
+def bench_filter_reddits_by_dates(generator: SyntheticReddits, size: int, thread_size: int) -> Callable[[], Any]:
+    """ Reddits of one day out of ``size`` reddits """
+    posts = list(map(lambda i: generator.post(i, num_posts=size), range(size)))
+    start_date = generator.start_date + dt.timedelta(days=generator.days // 2)
+    return lambda: util.filter_reddits_by_dates(posts, start_date, start_date + dt.timedelta(days=1))
+
+
+def bench_date_range(generator: SyntheticReddits, size: int, thread_size: int) -> Callable[[], Any]:
+    """ ``size`` hourly intervals """
+    return lambda: list(util.date_range(generator.start_date, generator.start_date + dt.timedelta(hours=size - 1), "h"))
+
+
+def bench_save_jsons(generator: SyntheticReddits, size: int, thread_size: int) -> Callable[[], Any]:
+    """ JSON file of reddits with ``size`` comments """
+    reddits = generator.reddits(size, thread_size)
+    # Removed once the benchmark function is released
+    folder = tempfile.TemporaryDirectory(prefix="bench_micro_")
+    logger = logging.getLogger("bench_micro")
+
+    def save() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            util.save_jsons(reddits, folder.name, "reddits_{start_date}_{end_date}.json",
+                            generator.start_date, generator.start_date + dt.timedelta(days=1), logger=logger)
+    return save
+
+
+BENCHMARKS: Dict[str, Callable[[SyntheticReddits, int, int], Callable[[], Any]]] = {
+    "extract_comments": bench_extract_comments,
+    "collect_authors": bench_collect_authors,
+    "filter_reddits_by_dates": bench_filter_reddits_by_dates,
+    "date_range": bench_date_range,
+    "save_jsons": bench_save_jsons,
+}
+
+
+def measure(fn: Callable[[], Any], repeats: int = 5, trace: bool = True) -> Dict[str, Any]:
+    """
+    Times the function (best and median of the repeats) and measures its allocations: the memory
+    blocks its result keeps allocated and (if traced) the peak of the memory allocated by the call
+    """
+    times = list([])
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    result = fn()
+    retained_blocks = sys.getallocatedblocks() - blocks
+    del result
+
+    peak_mb = None
+    if trace:
+        gc.collect()
+        tracemalloc.start()
+        # The peak includes the result, freeing it right away does not lower it
+        fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return {"best_s": min(times), "median_s": statistics.median(times), "retained_blocks": retained_blocks,
+            "peak_mb": peak_mb}
+
+
+def run(benchmarks: List[str] | None = None, sizes: List[int] | None = None, repeats: int = 5, thread_size: int = 100,
+        trace_max_size: int = 100000, generator: SyntheticReddits | None = None) -> List[Dict[str, Any]]:
+    """ Runs every benchmark at every size, returns the measurements """
+    generator = generator or SyntheticReddits()
+    measurements = list([])
+    for name in benchmarks or list(BENCHMARKS):
+        for size in sizes or SIZES:
+            fn = BENCHMARKS[name](generator, size, thread_size)
+            # Traced allocations take far more memory than the data itself for the largest sizes
+            measurement = measure(fn, repeats=max(1, repeats if size < 1000000 else 1), trace=size <= trace_max_size)
+            measurements.append({"benchmark": name, "size": size} | measurement | {"per_item_us": measurement["best_s"] / size * 1e6})
+            del fn
+            gc.collect()
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the parsing and utilities hot paths on synthetic reddits.")
+    parser.add_argument("-b", "--benchmarks", type=str, nargs="+", required=False, choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help=f"benchmarks to run, default: {' '.join(BENCHMARKS)}")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", required=False, default=SIZES,
+                        help=f"numbers of comments (reddits, intervals) to benchmark, default: {' '.join(map(str, SIZES))}")
+    parser.add_argument("-r", "--repeats", type=int, required=False, default=5,
+                        help="timed runs per benchmark and size (one for a million items and more), default: 5")
+    parser.add_argument("--thread_size", type=int, required=False, default=100,
+                        help="number of comments per reddit (except the one thread of extract_comments), default: 100")
+    parser.add_argument("--num_authors", type=int, required=False, default=1000,
+                        help="number of distinct authors, default: 1000")
+    parser.add_argument("--max_depth", type=int, required=False, default=6,
+                        help="max nesting of the comments (geometrically fewer comments per level), default: 6")
+    parser.add_argument("--trace_max_size", type=int, required=False, default=100000,
+                        help="max size the peak of allocated memory is traced at (tracemalloc), default: 100000")
+    parser.add_argument("--output", type=str, required=False, default=None,
+                        help="JSON file to save the measurements into, default: none")
+    args = parser.parse_args()
+
+    generator = SyntheticReddits(num_authors=args.num_authors,
+                                 depth_weights=list(map(lambda d: 0.6 ** d, range(args.max_depth))))
+    measurements = run(args.benchmarks, args.sizes, args.repeats, args.thread_size, args.trace_max_size, generator)
+
+    print(f"{'benchmark':<25}{'size':>9}{'best [s]':>11}{'median [s]':>12}{'per item [us]':>15}"
+          f"{'retained blocks':>17}{'peak [MB]':>11}")
+    for m in measurements:
+        peak = f"{m['peak_mb']:.1f}" if m["peak_mb"] is not None else "-"
+        print(f"{m['benchmark']:<25}{m['size']:>9}{m['best_s']:>11.4f}{m['median_s']:>12.4f}{m['per_item_us']:>15.2f}"
+              f"{m['retained_blocks']:>17}{peak:>11}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(measurements, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
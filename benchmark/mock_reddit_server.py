@@ -0,0 +1,289 @@
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import datetime as dt
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+SUBREDDITS = ["aww", "dogs", "pics", "funny", "corgi", "photography", "AskReddit", "pets"]
+WORDS = ["corgi", "dog", "puppy", "walk", "park", "fluffy", "loaf", "bark", "treat", "ball", "sunny", "nap",
+         "friend", "best", "today", "look", "happy", "little", "tail", "zoomies"]
+
+
+class MockRedditServer:
+    """
+    Local HTTP server answering the Reddit API requests of YARS with generated (deterministic) data:
+    ``search.json`` (also of a subreddit), ``{permalink}.json`` (post with its comments tree),
+    ``user/{name}/.json`` (posts and comments of the user) and the ``hot``, ``top`` and ``new``
+    listings of subreddits and users.
+
+    The searches find ``num_posts`` posts created within ``days`` days before ``end_date``, written by
+    (and commented on by) ``num_authors`` authors, served in pages of at most ``page_size`` results.
+    Every post has ``num_comments`` comments nested up to ``max_depth`` levels, comment bodies have
+    ``body_size`` characters. Every response is delayed by ``latency`` seconds (plus a random jitter
+    of up to ``jitter`` seconds), each request is served by its own thread, so concurrent requests
+    are delayed concurrently, as by a remote server.
+    """
+
+    def __init__(self, port: int = 0, host: str = "127.0.0.1", latency: float = 0.05, jitter: float = 0.,
+                 num_posts: int = 1000, page_size: int = 100, num_comments: int = 20, max_depth: int = 3,
+                 body_size: int = 200, num_authors: int = 200, days: int = 30, end_date: dt.datetime | None = None,
+                 seed: int = 0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.num_posts = num_posts
+        self.page_size = page_size
+        self.num_comments = num_comments
+        self.max_depth = max_depth
+        self.body_size = body_size
+        self.num_authors = num_authors
+        self.days = days
+        self.end_date = end_date or dt.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.seed = seed
+        self.num_requests = 0
+        self._posts: List[Dict[str, Any]] | None = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(handler) -> None:
+                url = urlsplit(handler.path)
+                status, data = server.route(url.path, dict(map(lambda kv: (kv[0], kv[1][-1]), parse_qs(url.query).items())))
+                delay = server.latency + random.uniform(0., server.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                body = json.dumps(data).encode("utf-8")
+                handler.send_response(status)
+                handler.send_header("Content-Type", "application/json; charset=UTF-8")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format: str, *args) -> None:
+                pass
+
+        self._server = _Server((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-reddit", daemon=True)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def start_date(self) -> dt.datetime:
+        """ Creation date of the oldest post """
+        return self.end_date - dt.timedelta(days=self.days)
+
+    def start(self) -> 'MockRedditServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, path: str, params: Dict[str, str]) -> Tuple[int, Any]:
+        """ Status code and JSON data answering the request """
+        with self._lock:
+            self.num_requests += 1
+        limit, after = int(params.get("limit") or 25), params.get("after")
+        if path.endswith("/search.json"):
+            return 200, self.listing(self.search(), limit, after)
+        if (match := re.match(r"^/r/(\w+)/comments/(\w+)/[^/]*/?\.json$", path)) is not None:
+            return 200, self.post_thread(int(match.group(2), 36))
+        if (match := re.match(r"^/user/([\w-]+)/\.json$", path)) is not None:
+            return 200, self.listing(self.user_items(match.group(1)), limit, after)
+        if (match := re.match(r"^/(r|user)/([\w-]+)/(?:submitted/)?(hot|top|new)\.json$", path)) is not None:
+            return 200, self.listing(self.source_posts(match.group(2), match.group(3)), limit, after)
+        return 404, {"message": "Not Found", "error": 404}
+
+    def listing(self, children: List[Dict[str, Any]], limit: int, after: str | None) -> Dict[str, Any]:
+        """ Page of a listing (of at most the page size), following the ``after`` cursor """
+        names = list(map(lambda c: c["data"]["name"], children))
+        start = names.index(after) + 1 if after in names else 0
+        page = children[start:start + min(limit, self.page_size)]
+        is_last = start + len(page) >= len(children)
+        return {"kind": "Listing", "data": {"after": None if is_last or len(page) == 0 else page[-1]["data"]["name"],
+                                            "dist": len(page), "before": None, "children": page}}
+
+    def search(self) -> List[Dict[str, Any]]:
+        """ Posts found by a search, the same ones for every query (generated once) """
+        if self._posts is None:
+            self._posts = list(map(lambda i: {"kind": "t3", "data": self.post(i)}, range(self.num_posts)))
+        return self._posts
+
+    def source_posts(self, source: str, category: str) -> List[Dict[str, Any]]:
+        """ Posts of a subreddit (or of a user) listing """
+        offset = zlib.crc32(f"{source}/{category}".encode()) % max(1, self.num_posts)
+        return list(map(lambda i: {"kind": "t3", "data": self.post((offset + i) % self.num_posts)}, range(min(100, self.num_posts))))
+
+    def post(self, i: int) -> Dict[str, Any]:
+        rng = self._random("post", i)
+        entry_id = _base36(i)
+        subreddit = SUBREDDITS[i % len(SUBREDDITS)]
+        title = " ".join(rng.choices(WORDS, k=rng.randint(3, 10)))
+        created = (self.end_date - dt.timedelta(seconds=(i + 0.5) * self.days * 86400 / max(1, self.num_posts))).timestamp()
+        return {
+            "id": entry_id,
+            "name": f"t3_{entry_id}",
+            "permalink": f"/r/{subreddit}/comments/{entry_id}/{'_'.join(title.split()[:5]).lower()}/",
+            "url": f"https://i.redd.it/{entry_id}.jpg" if i % 3 == 0 else f"https://www.reddit.com/r/{subreddit}/comments/{entry_id}/",
+            "post_hint": "image" if i % 3 == 0 else "self",
+            "thumbnail": f"https://b.thumbs.redditmedia.com/{entry_id}.jpg" if i % 3 == 0 else "self",
+            "author": self.author(rng.randrange(self.num_authors)),
+            "title": title,
+            "selftext": self._text(rng, self.body_size),
+            "created": created,
+            "created_utc": created,
+            "likes": None,
+            "ups": rng.randint(0, 5000),
+            "downs": 0,
+            "score": rng.randint(0, 5000),
+            "upvote_ratio": round(rng.uniform(0.5, 1.), 2),
+            "gilded": 0,
+            "over_18": False,
+            "subreddit": subreddit,
+            "subreddit_id": f"t5_{_base36(zlib.crc32(subreddit.encode()))}",
+            "num_comments": self.num_comments,
+        }
+
+    def post_thread(self, i: int) -> List[Dict[str, Any]]:
+        """ Post with its comments tree, as answered for the post permalink """
+        post = self.post(i)
+        rng = self._random("comments", i)
+        # Every comment replies to the post or to an earlier comment not nested too deep
+        comments, top_level = list([]), list([])
+        for c in range(self.num_comments):
+            parents = list(filter(lambda comment: comment["depth"] < self.max_depth - 1, comments))
+            parent = rng.choice(parents) if len(parents) > 0 and rng.random() < 0.6 else None
+            comment_id = f"{post['id']}{_base36(c)}"
+            comment = {
+                "id": comment_id,
+                "name": f"t1_{comment_id}",
+                "parent_id": parent["name"] if parent is not None else post["name"],
+                "permalink": f"{post['permalink']}{comment_id}/",
+                "author": self.author(rng.randrange(self.num_authors)),
+                "body": self._text(rng, self.body_size),
+                "created": post["created"] + 60 * (c + 1),
+                "created_utc": post["created_utc"] + 60 * (c + 1),
+                "depth": parent["depth"] + 1 if parent is not None else 0,
+                "controversiality": 0,
+                "likes": None,
+                "ups": rng.randint(0, 500),
+                "downs": 0,
+                "score": rng.randint(0, 500),
+                "gilded": 0,
+                "subreddit": post["subreddit"],
+                "subreddit_id": post["subreddit_id"],
+                "replies": "",
+            }
+            comments.append(comment)
+            if parent is None:
+                top_level.append(comment)
+            else:
+                if parent["replies"] == "":
+                    parent["replies"] = {"kind": "Listing", "data": {"after": None, "children": list([])}}
+                parent["replies"]["data"]["children"].append({"kind": "t1", "data": comment})
+        return [
+            {"kind": "Listing", "data": {"after": None, "children": [{"kind": "t3", "data": post}]}},
+            {"kind": "Listing", "data": {"after": None, "children": list(map(lambda c: {"kind": "t1", "data": c}, top_level))}},
+        ]
+
+    def user_items(self, name: str) -> List[Dict[str, Any]]:
+        """ Posts and comments of the user """
+        rng = self._random("user", zlib.crc32(name.encode()))
+        items = list([])
+        for n in range(25):
+            post = self.post(rng.randrange(max(1, self.num_posts)))
+            fields = {"author": name, "author_fullname": f"t2_{_base36(zlib.crc32(name.encode()))}",
+                      "author_flair_type": "text", "author_flair_text": None, "author_flair_richtext": [],
+                      "author_is_blocked": False, "author_patreon_flair": False, "author_premium": False}
+            if n % 2 == 0:
+                items.append({"kind": "t3", "data": post | fields | {"name": f"t3_{post['id']}{_base36(n)}"}})
+            else:
+                items.append({"kind": "t1", "data": {"id": f"{post['id']}{_base36(n)}", "name": f"t1_{post['id']}{_base36(n)}",
+                                                     "body": self._text(rng, self.body_size), "subreddit": post["subreddit"],
+                                                     "permalink": f"{post['permalink']}{_base36(n)}/",
+                                                     "created": post["created"], "created_utc": post["created_utc"]} | fields})
+        return items
+
+    @staticmethod
+    def author(i: int) -> str:
+        return "[deleted]" if i == 0 else f"user_{i}"
+
+    def _random(self, kind: str, i: int) -> random.Random:
+        return random.Random(f"{self.seed}/{kind}/{i}")
+
+    @staticmethod
+    def _text(rng: random.Random, size: int) -> str:
+        words = list([])
+        while sum(map(len, words)) + len(words) < size:
+            words.append(rng.choice(WORDS))
+        return " ".join(words)[:size]
+
+
+class _Server(ThreadingHTTPServer):
+    # Connections of all the workers are accepted at once (the default backlog of 5 drops some, delaying them by seconds)
+    request_queue_size = 1024
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients giving up on a request (eg. timed out) are not errors of the server
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    text = ""
+    while True:
+        number, digit = divmod(number, 36)
+        text = digits[digit] + text
+        if number == 0:
+            return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Reddit API (as used by YARS) serving generated data.")
+    parser.add_argument("-p", "--port", type=int, required=False, default=8080,
+                        help="port of the server, default: 8080")
+    parser.add_argument("--latency", type=float, required=False, default=0.05,
+                        help="delay of every response in seconds, default: 0.05")
+    parser.add_argument("--jitter", type=float, required=False, default=0.,
+                        help="max random delay added to the latency in seconds, default: 0")
+    parser.add_argument("--num_posts", type=int, required=False, default=1000,
+                        help="number of posts found by the searches, default: 1000")
+    parser.add_argument("--page_size", type=int, required=False, default=100,
+                        help="max number of results of a listing page, default: 100")
+    parser.add_argument("--num_comments", type=int, required=False, default=20,
+                        help="number of comments of every post, default: 20")
+    parser.add_argument("--max_depth", type=int, required=False, default=3,
+                        help="max nesting of the comments, default: 3")
+    parser.add_argument("--num_authors", type=int, required=False, default=200,
+                        help="number of authors of the posts and comments, default: 200")
+    parser.add_argument("--days", type=int, required=False, default=30,
+                        help="number of days (until today) the posts were created within, default: 30")
+    args = parser.parse_args()
+
+    server = MockRedditServer(port=args.port, latency=args.latency, jitter=args.jitter, num_posts=args.num_posts,
+                              page_size=args.page_size, num_comments=args.num_comments, max_depth=args.max_depth,
+                              num_authors=args.num_authors, days=args.days).start()
+    print(f"Mock Reddit API serving at {server.url} (posts since {server.start_date.date()}), press Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
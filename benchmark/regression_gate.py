@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import yars
+from benchmark import bench_e2e, bench_memory
+from benchmark.mock_reddit_server import MockRedditServer
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SUITES = ["micro", "e2e", "latency", "memory"]
+# Workload of the gate, the baseline is valid for the same one only
+SETTINGS: Dict[str, Any] = {
+    "micro": {"sizes": [1000, 10000], "repeats": 5, "rounds": 3, "thread_size": 100},
+    "e2e": {"num_posts": 200, "num_comments": 20, "latency": 0.02, "concurrency": 8},
+    "latency": {"num_requests": 200, "num_comments": 100, "latency": 0.02, "concurrency": 8},
+    "memory": {"num_posts": 500, "num_comments": 100, "concurrency": 4},
+}
+# Relative change of a metric (for the worse) tolerated, by the kind of the metric
+TOLERANCES = {
+    "per_item_us": 0.5,
+    "peak_mb": 0.2,
+    "posts_per_s": 0.25,
+    "authors_per_s": 0.25,
+    "p50_ms": 0.3,
+    "p95_ms": 0.5,
+    "p99_ms": 0.75,
+    "peak_rss_mb": 0.15,
+}
+HIGHER_IS_BETTER = {"posts_per_s", "authors_per_s"}
+
+
+def measure_latency(server: MockRedditServer, num_requests: int, concurrency: int) -> Dict[str, float]:
+    """ Percentiles of the post details latency (request and parsing by YARS) with concurrent requests """
+    downloader = yars.YARS(logger=logging.getLogger("regression_gate"), base_url=server.url, pool_maxsize=concurrency)
+    permalinks = list(map(lambda h: h["link"].split("www.reddit.com")[1], downloader.search_reddit("corgi", limit=num_requests)))
+
+    def timed(permalink: str) -> float:
+        start = time.perf_counter()
+        downloader.scrape_post_details(permalink)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, permalinks))
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {"p50_ms": percentiles[49], "p95_ms": percentiles[94], "p99_ms": percentiles[98]}
+
+
+def run_micro(sizes: List[int], repeats: int, thread_size: int) -> Dict[str, float]:
+    """ Metrics of the microbenchmarks run in a fresh process """
+    with tempfile.TemporaryDirectory() as folder:
+        output_file = os.path.join(folder, "micro.json")
+        subprocess.run([sys.executable, "-m", "benchmark.bench_micro", "-s"] + list(map(str, sizes))
+                       + ["-r", str(repeats), "--thread_size", str(thread_size), "--output", output_file],
+                       cwd=bench_e2e.ROOT_FOLDER, check=True, capture_output=True)
+        with open(output_file) as f:
+            measurements = json.load(f)
+    metrics = {}
+    for m in measurements:
+        metrics[f"micro/{m['benchmark']}/{m['size']}/per_item_us"] = m["per_item_us"]
+        metrics[f"micro/{m['benchmark']}/{m['size']}/peak_mb"] = m["peak_mb"]
+    return metrics
+
+
+def collect(suites: List[str] | None = None, settings: Dict[str, Any] | None = None) -> Dict[str, float]:
+    """ Runs the benchmark suites, returns their metrics by name (suite/benchmark/metric) """
+    settings = settings or SETTINGS
+    metrics: Dict[str, float] = {}
+    suites = suites or SUITES
+    if "micro" in suites:
+        micro = settings["micro"]
+        # Timings of a process (or a while) can be off as a whole, the best of fresh processes is kept
+        for _ in range(micro["rounds"]):
+            metrics = best_of(metrics, run_micro(micro["sizes"], micro["repeats"], micro["thread_size"]))
+    if "e2e" in suites:
+        e2e = settings["e2e"]
+        server = MockRedditServer(latency=e2e["latency"], num_posts=e2e["num_posts"], num_comments=e2e["num_comments"]).start()
+        try:
+            for m in bench_e2e.run(server, concurrencies=[e2e["concurrency"]]):
+                metrics[f"e2e/{m['executor']}/posts_per_s"] = m["posts_per_s"]
+                metrics[f"e2e/{m['executor']}/authors_per_s"] = m["authors_per_s"]
+        finally:
+            server.stop()
+    if "latency" in suites:
+        latency = settings["latency"]
+        server = MockRedditServer(latency=latency["latency"], num_posts=latency["num_requests"],
+                                  num_comments=latency["num_comments"]).start()
+        try:
+            for name, value in measure_latency(server, latency["num_requests"], latency["concurrency"]).items():
+                metrics[f"latency/post_details/{name}"] = value
+        finally:
+            server.stop()
+    if "memory" in suites:
+        memory = settings["memory"]
+        server = MockRedditServer(latency=0., num_posts=memory["num_posts"], num_comments=memory["num_comments"]).start()
+        try:
+            # The budget is checked by the gate against the baseline
+            for m in bench_memory.run(server, float("inf"), concurrency=memory["concurrency"])["measurements"]:
+                metrics[f"memory/{m['executor']}/peak_rss_mb"] = m["peak_rss_mb"]
+        finally:
+            server.stop()
+    return metrics
+
+
+def best_of(metrics: Dict[str, float], other: Dict[str, float]) -> Dict[str, float]:
+    """ Better value of every metric of two measurements """
+    return metrics | dict(map(lambda kv: (kv[0], (max if kv[0].rsplit("/", 1)[1] in HIGHER_IS_BETTER else min)(
+        kv[1], metrics.get(kv[0], kv[1]))), other.items()))
+
+
+def create_baseline(metrics: Dict[str, float], baseline: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """ Baseline of the metrics, keeping the tolerances of the (edited) earlier baseline """
+    earlier = (baseline or {}).get("metrics", {})
+    return {
+        "settings": SETTINGS,
+        "metrics": dict(map(lambda kv: (kv[0], {
+            "value": kv[1],
+            "tolerance": earlier.get(kv[0], {}).get("tolerance", TOLERANCES[kv[0].rsplit("/", 1)[1]]),
+        }), sorted(metrics.items()))),
+    }
+
+
+def compare(baseline: Dict[str, Any], metrics: Dict[str, float]) -> List[Dict[str, Any]]:
+    """ Every metric of the baseline compared: ok, improved, regressed (over its tolerance) or missing """
+    rows = list([])
+    for name, expected in baseline["metrics"].items():
+        value = metrics.get(name)
+        if value is None:
+            if name.split("/", 1)[0] in set(map(lambda m: m.split("/", 1)[0], metrics)):
+                rows.append({"metric": name, "baseline": expected["value"], "value": None, "change": None,
+                             "tolerance": expected["tolerance"], "status": "missing"})
+            continue
+        change = (value - expected["value"]) / expected["value"] if expected["value"] != 0 else 0.
+        # Positive for the worse
+        worse = -change if name.rsplit("/", 1)[1] in HIGHER_IS_BETTER else change
+        status = "regressed" if worse > expected["tolerance"] else "improved" if worse < -expected["tolerance"] else "ok"
+        rows.append({"metric": name, "baseline": expected["value"], "value": value, "change": change,
+                     "tolerance": expected["tolerance"], "status": status})
+    return rows
+
+
+def format_diff(rows: List[Dict[str, Any]]) -> str:
+    """ Table of the compared metrics, the regressed and missing ones marked """
+    width = max([len("metric")] + list(map(lambda r: len(r["metric"]), rows)))
+    lines = [f"  {'metric':<{width}}{'baseline':>12}{'current':>12}{'change':>10}{'tolerance':>11}  status"]
+    for r in rows:
+        value = f"{r['value']:.4g}" if r["value"] is not None else "-"
+        change = f"{r['change']:+.1%}" if r["change"] is not None else "-"
+        mark = "!" if r["status"] in ["regressed", "missing"] else " "
+        lines.append(f"{mark} {r['metric']:<{width}}{r['baseline']:>12.4g}{value:>12}{change:>10}{r['tolerance']:>11.0%}  {r['status']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regression gate: runs the benchmarks and compares their throughput, "
+                                                 "latency percentiles and peak memory against the stored baseline.")
+    parser.add_argument("-s", "--suites", type=str, nargs="+", required=False, choices=SUITES, default=SUITES,
+                        help=f"benchmark suites to run, default: {' '.join(SUITES)}")
+    parser.add_argument("--baseline", type=str, required=False, default=BASELINE_FILE,
+                        help="baseline JSON file with the metrics and their tolerances, default: benchmark/baseline.json")
+    parser.add_argument("--update", required=False, default=False, action="store_true",
+                        help="flag whether to store the measured metrics as the new baseline (keeping the tolerances) instead of comparing, default: False")
+    parser.add_argument("--retries", type=int, required=False, default=2,
+                        help="times the suites with regressed metrics (all of them for the baseline) are measured again, the better values kept, so noise does not fail the gate, default: 2")
+    parser.add_argument("--output", type=str, required=False, default=None,
+                        help="JSON file to save the measured metrics into, default: none")
+    args = parser.parse_args()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if not args.update and baseline is None:
+        print(f"No baseline {args.baseline}, create it with --update.")
+        sys.exit(2)
+    if not args.update and baseline["settings"] != json.loads(json.dumps(SETTINGS)):
+        print(f"Baseline {args.baseline} was measured on another workload, update it with --update.")
+        sys.exit(2)
+
+    metrics = collect(args.suites)
+    for _ in range(args.retries):
+        # The baseline is the best of all the measurements, a regression has to show in every one of them
+        suites = args.suites if args.update else list(filter(
+            lambda s: any(map(lambda r: r["status"] == "regressed" and r["metric"].startswith(f"{s}/"), compare(baseline, metrics))),
+            args.suites))
+        if len(suites) == 0:
+            break
+        if not args.update:
+            print(f"Measuring {' '.join(suites)} again, regressions are confirmed by every measurement.")
+        metrics = best_of(metrics, collect(suites))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(metrics, f, indent=2)
+    if args.update:
+        # Metrics of the suites not run are kept
+        kept = dict(map(lambda kv: (kv[0], kv[1]["value"]), (baseline or {}).get("metrics", {}).items()))
+        kept = dict(filter(lambda kv: kv[0].split("/", 1)[0] not in args.suites, kept.items()))
+        with open(args.baseline, "w") as f:
+            json.dump(create_baseline(kept | metrics, baseline), f, indent=2)
+        print(f"Baseline {args.baseline} updated: {len(metrics)} metrics.")
+        return
+
+    rows = compare(baseline, metrics)
+    print(format_diff(rows))
+    failed = list(filter(lambda r: r["status"] in ["regressed", "missing"], rows))
+    if len(failed) > 0:
+        print(f"\n{len(failed)} of {len(rows)} metrics regressed (or missing) over their tolerances:")
+        for r in failed:
+            if r["value"] is None:
+                print(f"  {r['metric']}: {r['baseline']:.4g} -> not measured")
+            else:
+                print(f"  {r['metric']}: {r['baseline']:.4g} -> {r['value']:.4g} ({r['change']:+.1%}, tolerance {r['tolerance']:.0%})")
+        sys.exit(1)
+    print(f"\nNo regressions: {len(rows)} metrics within their tolerances.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import random
+import logging
+import itertools
+import datetime as dt
+from typing import Any, Dict, List, Sequence
+
+import yars
+from benchmark.mock_reddit_server import SUBREDDITS, WORDS, _base36
+
+
+class SyntheticReddits:
+    """
+    Generator of synthetic (deterministic) Reddit payloads of controlled size, as answered by the
+    Reddit API (``thread``, ``post``) or as parsed by YARS (``reddits``), also of millions of comments.
+
+    Comments are spread over the depths by ``depth_weights`` (relative number of comments at depth
+    0, 1, ...), every reply goes to a random comment one level up. Authors are drawn from
+    ``num_authors`` ones with Zipf-like popularity (``author_skew`` 0 is uniform, 1 makes the most
+    active author ``num_authors`` times as active as the least one), ``deleted_ratio`` of the posts
+    and comments are of deleted authors. The posts are created evenly within ``days`` days since
+    ``start_date``. Bodies have ``body_size`` characters and are shared by many comments, so large
+    threads take memory for their structure mostly, as parsed JSON would.
+    """
+
+    def __init__(self, num_authors: int = 1000, author_skew: float = 1., deleted_ratio: float = 0.05,
+                 depth_weights: Sequence[float] = (0.4, 0.25, 0.15, 0.1, 0.05, 0.05), body_size: int = 200,
+                 start_date: dt.datetime = dt.datetime(2024, 1, 1), days: int = 30, seed: int = 0) -> None:
+        if num_authors < 1 or len(depth_weights) == 0:
+            raise ValueError("Synthetic reddits need at least one author and one depth.")
+        self.num_authors = num_authors
+        self.author_skew = author_skew
+        self.deleted_ratio = deleted_ratio
+        self.depth_weights = tuple(depth_weights)
+        self.body_size = body_size
+        self.start_date = start_date
+        self.days = days
+        self.seed = seed
+
+        self._author_weights = list(itertools.accumulate(map(lambda k: 1 / (k + 1) ** author_skew, range(num_authors))))
+        self._depth_weights = list(itertools.accumulate(self.depth_weights))
+        rng = random.Random(f"{seed}/bodies")
+        self._bodies = list(map(lambda _: self._text(rng, body_size), range(256)))
+        self._parser: yars.YARS | None = None
+
+    def post(self, i: int, num_comments: int = 0, num_posts: int = 1) -> Dict[str, Any]:
+        """ Data of the i-th post (of ``num_posts`` spread over the days), as answered by a search """
+        rng = random.Random(f"{self.seed}/post/{i}")
+        entry_id = _base36(i)
+        subreddit = SUBREDDITS[i % len(SUBREDDITS)]
+        title = " ".join(rng.choices(WORDS, k=rng.randint(3, 10)))
+        created = (self.start_date + dt.timedelta(seconds=(i + 0.5) * self.days * 86400 / max(1, num_posts))).timestamp()
+        return {
+            "id": entry_id,
+            "name": f"t3_{entry_id}",
+            "permalink": f"/r/{subreddit}/comments/{entry_id}/{'_'.join(title.split()[:5]).lower()}/",
+            "author": self._authors(rng, 1)[0],
+            "title": title,
+            "selftext": self._bodies[i % len(self._bodies)],
+            "created": created,
+            "created_utc": created,
+            "likes": None,
+            "ups": rng.randint(0, 5000),
+            "downs": 0,
+            "score": rng.randint(0, 5000),
+            "upvote_ratio": round(rng.uniform(0.5, 1.), 2),
+            "gilded": 0,
+            "subreddit": subreddit,
+            "subreddit_id": f"t5_{subreddit.lower()}",
+            "num_comments": num_comments,
+        }
+
+    def thread(self, num_comments: int, i: int = 0, num_posts: int = 1) -> List[Dict[str, Any]]:
+        """ The i-th post with a tree of ``num_comments`` comments, as answered for the post permalink """
+        post = self.post(i, num_comments, num_posts)
+        rng = random.Random(f"{self.seed}/comments/{i}")
+        depths = rng.choices(range(len(self.depth_weights)), cum_weights=self._depth_weights, k=num_comments)
+        authors = self._authors(rng, num_comments)
+        by_depth: List[List[Dict[str, Any]]] = list(list([]) for _ in self.depth_weights)
+        top_level = list([])
+        for c, (depth, author) in enumerate(zip(depths, authors)):
+            # Replies need a comment one level up, the first comments are shallower
+            while depth > 0 and len(by_depth[depth - 1]) == 0:
+                depth -= 1
+            parent = rng.choice(by_depth[depth - 1]) if depth > 0 else None
+            comment_id = f"{post['id']}_{_base36(c)}"
+            created = post["created_utc"] + c
+            comment = {
+                "id": comment_id,
+                "name": f"t1_{comment_id}",
+                "parent_id": parent["name"] if parent is not None else post["name"],
+                "permalink": f"{post['permalink']}{comment_id}/",
+                "author": author,
+                "body": self._bodies[c % len(self._bodies)],
+                "created": created,
+                "created_utc": created,
+                "depth": depth,
+                "controversiality": 0,
+                "likes": None,
+                "ups": c % 500,
+                "downs": 0,
+                "score": c % 500,
+                "gilded": 0,
+                "subreddit": post["subreddit"],
+                "subreddit_id": post["subreddit_id"],
+                "replies": "",
+            }
+            by_depth[depth].append(comment)
+            if parent is None:
+                top_level.append({"kind": "t1", "data": comment})
+            else:
+                if parent["replies"] == "":
+                    parent["replies"] = {"kind": "Listing", "data": {"after": None, "children": list([])}}
+                parent["replies"]["data"]["children"].append({"kind": "t1", "data": comment})
+        return [
+            {"kind": "Listing", "data": {"after": None, "children": [{"kind": "t3", "data": post}]}},
+            {"kind": "Listing", "data": {"after": None, "children": top_level}},
+        ]
+
+    def reddits(self, num_comments: int, thread_size: int = 100) -> List[Dict[str, Any]]:
+        """ Reddits details (as parsed by YARS) with ``num_comments`` comments in threads of ``thread_size`` """
+        if self._parser is None:
+            self._parser = yars.YARS(logger=logging.getLogger("synthetic"))
+        num_posts = max(1, -(-num_comments // thread_size))
+        sizes = list(map(lambda i: min(thread_size, num_comments - i * thread_size), range(num_posts)))
+        return list(map(lambda i: self._parser.parse_post_details(self.thread(sizes[i], i, num_posts)), range(num_posts)))
+
+    def _authors(self, rng: random.Random, k: int) -> List[str]:
+        authors = rng.choices(range(self.num_authors), cum_weights=self._author_weights, k=k)
+        return list(map(lambda a: "[deleted]" if rng.random() < self.deleted_ratio else f"user_{a}", authors))
+
+    @staticmethod
+    def _text(rng: random.Random, size: int) -> str:
+        words = list([])
+        while sum(map(len, words)) + len(words) < size:
+            words.append(rng.choice(WORDS))
+        return " ".join(words)[:size]
@@ -0,0 +1,42 @@
+import importlib
+
+# Exported names by their submodules, imported on the first use so that a run loads the stages and
+# features it uses only (eg. sqlite3 for the ledger, http.server for the metrics endpoint)
+_EXPORTS = {
+    "Executor": "executors",
+    "SerialExecutor": "executors",
+    "ThreadExecutor": "executors",
+    "AsyncExecutor": "executors",
+    "ProcessExecutor": "executors",
+    "EXECUTORS": "executors",
+    "create_executor": "executors",
+    "IntervalBuckets": "intervals",
+    "RunJournal": "journal",
+    "SharedResults": "shared",
+    "ProgressTracker": "progress",
+    "MetricsCollector": "metrics",
+    "MetricsServer": "metrics",
+    "RunProfiler": "profiler",
+    "MemoryTracker": "memory",
+    "PollScheduler": "scheduler",
+    "DownloadPipeline": "pipeline",
+    "DownloadPlanner": "planner",
+    "TaskLedger": "ledger",
+    "LedgerCoordinator": "distributed",
+    "LedgerWorker": "distributed",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{_EXPORTS[name]}"), name)
+    # Later lookups do not get here
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,208 @@
+from __future__ import annotations
+import time
+import logging
+import threading
+import datetime as dt
+from typing import Any, Dict, Iterator, Set, Tuple
+
+import util
+import yars
+from model import EloadType, DownloadParams, LoadParams
+from download.executors import Executor
+from download.intervals import IntervalBuckets
+from download.ledger import TaskLedger
+from download.progress import ProgressTracker
+
+
+class LedgerCoordinator:
+    """
+    Coordinator of a distributed run: fills the task ledger with the search results, waits for the
+    workers (of any node) to complete the tasks and saves the reddits and authors files.
+
+    A rerun with the same ledger resumes: the search is not repeated once done, the period of the
+    original run is kept (a differing period of the rerun is overridden) and the ledger of another
+    phrase or date interval is refused.
+    """
+
+    def __init__(self, downloader: yars.YARS, download_params: DownloadParams, load_params: LoadParams,
+                 website_url: str, ledger: TaskLedger, logger: logging.Logger) -> None:
+        self.downloader = downloader
+        self.download_params = download_params
+        self.website_url = website_url
+        self.ledger = ledger
+        self.logger = logger
+
+        fingerprint = download_params.journal_fingerprint() | {
+            "date_from": load_params.date_from.isoformat(), "date_to": load_params.date_to.isoformat()}
+        ledger_fingerprint = ledger.get_meta("fingerprint")
+        if ledger_fingerprint is None:
+            ledger.set_meta("fingerprint", fingerprint)
+            ledger.set_meta("is_author_downloaded", download_params.is_author_downloaded)
+        elif ledger_fingerprint["phrase"] != fingerprint["phrase"] \
+                or ledger_fingerprint["date_interval"] != fingerprint["date_interval"]:
+            raise ValueError(f"Ledger {ledger.path} belongs to another run: {ledger_fingerprint}.")
+        elif ledger_fingerprint["date_from"] != fingerprint["date_from"] \
+                or ledger_fingerprint["date_to"] != fingerprint["date_to"]:
+            # Resumed run keeps the period of the original one
+            period = f"{ledger_fingerprint['date_from']} -- {ledger_fingerprint['date_to']}"
+            requested = f"{fingerprint['date_from']} -- {fingerprint['date_to']}"
+            print(f"Resuming the period {period} of ledger {ledger.path} instead of {requested}.")
+            self.logger.info(f"Resuming the period {period} of ledger {ledger.path} instead of {requested}.")
+            load_params = LoadParams(load_type=load_params.load_type,
+                                     date_from=dt.datetime.fromisoformat(ledger_fingerprint["date_from"]),
+                                     date_to=dt.datetime.fromisoformat(ledger_fingerprint["date_to"]))
+        self.load_params = load_params
+
+    def search(self) -> int:
+        """ Adds the found reddits (within the load period) to the ledger, returns number of the new ones """
+        if self.ledger.get_meta("is_search_done", False):
+            return 0
+
+        buckets = IntervalBuckets(self.load_params.date_from, self.load_params.date_to, self.download_params.date_interval)
+        num_added = 0
+        pages = self.downloader.search_reddit_pages(query=self.download_params.phrase, limit=self.download_params.limit)
+        for reddit_headers in pages:
+            tasks = list([])
+            for reddit_header in reddit_headers:
+                created = dt.datetime.fromtimestamp(reddit_header['created_utc'])
+                # Restriction to the newest only for INCREMENTAL load
+                if self.load_params.load_type == EloadType.INCREMENTAL \
+                        and not self.load_params.date_to > created >= self.load_params.date_from:
+                    continue
+                if buckets.index_of(created) is not None:
+                    tasks.append((reddit_header['link'].split(self.website_url)[1], reddit_header['created_utc']))
+            num_added += self.ledger.add("reddit", tasks)
+        self.ledger.set_meta("is_search_done", True)
+        print(f"Found {num_added} results.")
+        self.logger.info(f"Found {num_added} results.")
+        return num_added
+
+    def wait(self, poll_interval: float = 10.) -> Dict[str, Dict[str, int]]:
+        """ Waits until the workers complete all the tasks, reporting the progress, returns the task counts """
+        while not self.ledger.is_finished():
+            counts = self.ledger.counts()
+            print(f"Progress: {_format_counts(counts)}.")
+            self.logger.info(f"Progress: {_format_counts(counts)}.")
+            time.sleep(poll_interval)
+        return self.ledger.counts()
+
+    def save(self) -> int:
+        """ Saves the reddits and authors files of all the intervals, returns number of the saved reddits """
+        num_saved = 0
+        for sd, ed in util.date_range(self.load_params.date_from, self.load_params.date_to,
+                                      interval=self.download_params.date_interval):
+            reddits_interval = self.ledger.results("reddit", sd.timestamp(), ed.timestamp())
+            num_saved += len(reddits_interval)
+            util.save_jsons(reddits_interval,
+                            self.download_params.output_reddits_folder, self.download_params.output_reddits_file_pattern,
+                            sd, ed, logger=self.logger)
+            if self.download_params.is_author_downloaded:
+                authors = util.collect_authors(reddits_interval)
+                print(f"Found {len(authors)} different authors for period {sd} -- {ed}.")
+                self.logger.info(f"Found {len(authors)} different authors for period {sd} -- {ed}.")
+                util.save_jsons(self.ledger.results("author", keys=authors),
+                                self.download_params.output_authors_folder, self.download_params.output_authors_file_pattern,
+                                sd, ed, logger=self.logger)
+        return num_saved
+
+
+class LedgerWorker:
+    """
+    Worker of a distributed run: claims reddit and author tasks from the ledger (reddits first),
+    downloads them with the executor and reports their results. The authors of every downloaded
+    reddit become tasks themselves. Runs until the ledger is finished, reporting the claimed and
+    processed tasks to the progress tracker (if given). The leases of the claimed tasks not reported
+    yet are renewed every ``renew_interval`` seconds (a third of the lease by default), so long
+    running tasks are not claimed by other workers meanwhile.
+    """
+
+    def __init__(self, downloader: yars.YARS, ledger: TaskLedger, executor: Executor, worker_id: str,
+                 logger: logging.Logger, claim_size: int | None = None, idle_interval: float = 5.,
+                 progress: ProgressTracker | None = None, renew_interval: float | None = None) -> None:
+        self.downloader = downloader
+        self.ledger = ledger
+        self.executor = executor
+        self.worker_id = worker_id
+        self.logger = logger
+        self.claim_size = claim_size or executor.concurrency * executor.batch_size
+        self.idle_interval = idle_interval
+        self.progress = progress
+        self.renew_interval = renew_interval or ledger.lease_seconds / 3
+        self.stats = {"reddits": 0, "authors": 0, "failed": 0}
+
+        self._leased: Dict[str, Set[str]] = {"reddit": set(), "author": set()}
+        self._leased_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def run(self) -> Dict[str, int]:
+        """ Processes the tasks until the ledger is finished, returns the worker statistics """
+        is_author_downloaded = self.ledger.get_meta("is_author_downloaded", True)
+        if self.progress is not None:
+            self.progress.start()
+        self._stopped.clear()
+        renewer = threading.Thread(target=self._renew_periodically, name="lease renewal", daemon=True)
+        renewer.start()
+        try:
+            while True:
+                for (kind, key), result in self.executor.map(self._fetch, self._claimed_tasks(), "tasks"):
+                    self._report(kind, key, result, is_author_downloaded)
+                if self.ledger.is_finished():
+                    return self.stats
+                # Nothing to claim yet (search still running or tasks leased by other workers)
+                time.sleep(self.idle_interval)
+        finally:
+            self._stopped.set()
+            renewer.join()
+            if self.progress is not None:
+                self.progress.stop()
+
+    def _renew_periodically(self) -> None:
+        while not self._stopped.wait(self.renew_interval):
+            for kind, keys in self._leased.items():
+                with self._leased_lock:
+                    keys = list(keys)
+                if len(keys) > 0:
+                    self.ledger.renew(kind, keys, self.worker_id)
+
+    def _claimed_tasks(self) -> Iterator[Tuple[str, str]]:
+        """ Claims the tasks lazily (as the executor asks for them), so the leases start when the work does """
+        while True:
+            kind, keys = "reddit", self.ledger.claim("reddit", self.worker_id, self.claim_size)
+            if len(keys) == 0:
+                kind, keys = "author", self.ledger.claim("author", self.worker_id, self.claim_size)
+            if len(keys) == 0:
+                return
+            with self._leased_lock:
+                self._leased[kind].update(keys)
+            if self.progress is not None:
+                self.progress.expect(f"{kind}s", len(keys))
+            for key in keys:
+                yield kind, key
+
+    def _report(self, kind: str, key: str, result: Any, is_author_downloaded: bool) -> None:
+        with self._leased_lock:
+            self._leased[kind].discard(key)
+        if self.progress is not None:
+            self.progress.done(f"{kind}s", is_failed=not isinstance(result, dict if kind == "reddit" else list))
+        if kind == "reddit" and isinstance(result, dict):
+            authors = util.collect_authors([result]) if is_author_downloaded else list([])
+            self.ledger.complete_with_children(kind, key, result, "author", map(lambda name: (name, None), authors))
+            self.stats["reddits"] += 1
+        elif kind == "author" and isinstance(result, list):
+            self.ledger.complete(kind, key, result)
+            self.stats["authors"] += 1
+        else:
+            self.ledger.fail(kind, key, self.worker_id)
+            self.stats["failed"] += 1
+            self.logger.warning(f"Failed to download {kind} {key}.")
+
+    def _fetch(self, task: Tuple[str, str]) -> Any:
+        kind, key = task
+        if kind == "reddit":
+            return self.downloader.scrape_post_details(key)
+        return self.downloader.scrape_user_data(key, limit=1)
+
+
+def _format_counts(counts: Dict[str, Dict[str, int]]) -> str:
+    return "; ".join(map(lambda kc: f"{kc[0]}s " + ", ".join(map(lambda sc: f"{sc[0]}: {sc[1]}", sorted(kc[1].items()))),
+                         sorted(counts.items(), reverse=True)))
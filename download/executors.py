@@ -0,0 +1,137 @@
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Type
+
+from download.metrics import MetricsCollector
+from download.supervisor import WorkerSupervisor
+
+
+class Executor(ABC):
+    """ Runs a (blocking, I/O-bound) download function over many items with given concurrency """
+    name: str = ""
+
+    def __init__(self, concurrency: int = 1, batch_size: int = 1, logger: logging.Logger | None = None,
+                 task_timeout: float | None = None, metrics: MetricsCollector | None = None) -> None:
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size
+        # Enforced by the process executor only (threads cannot be killed)
+        self.task_timeout = task_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.metrics = metrics
+
+    @abstractmethod
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], stage: str) -> Iterator[Tuple[Any, Any]]:
+        """ Yields (item, result) pairs as soon as the function finishes with the items (in no particular order) """
+
+    def run(self, fn: Callable[[Any], Any], items: Iterable[Any], stage: str) -> List[Any]:
+        """ Returns results of the function applied to all items (in no particular order) """
+        return list(result for _, result in self.map(fn, items, stage))
+
+
+class SerialExecutor(Executor):
+    """ Runs everything one by one in the current thread """
+    name = "serial"
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], stage: str) -> Iterator[Tuple[Any, Any]]:
+        return ((item, fn(item)) for item in items)
+
+
+class ThreadExecutor(Executor):
+    """ Runs items on a pool of threads sharing one task queue (no pickling, small memory footprint) """
+    name = "thread"
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], stage: str) -> Iterator[Tuple[Any, Any]]:
+        iterator = iter(items)
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=stage) as executor:
+            while True:
+                # Items are submitted lazily, keeping just enough of them queued to never starve the threads
+                while len(pending) < 2 * self.concurrency and (item := next(iterator, _END)) is not _END:
+                    pending[executor.submit(fn, item)] = item
+                if len(pending) == 0:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+
+class AsyncExecutor(Executor):
+    """
+    Runs items as asyncio tasks, at most ``concurrency`` of them in flight.
+
+    YARS is built on the blocking ``requests`` API, so each call is handed to a worker thread
+    of a pool sized to the concurrency; the event loop only schedules and collects them.
+    """
+    name = "async"
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], stage: str) -> Iterator[Tuple[Any, Any]]:
+        # Imported by the async runs only, the other executors do not pay for it
+        import asyncio
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=stage))
+
+        async def run_one(item: Any) -> Tuple[Any, Any]:
+            return item, await loop.run_in_executor(None, fn, item)
+
+        iterator = iter(items)
+        pending = set()
+        try:
+            while True:
+                while len(pending) < self.concurrency and (item := next(iterator, _END)) is not _END:
+                    pending.add(loop.create_task(run_one(item)))
+                if len(pending) == 0:
+                    break
+                # The loop runs only until the first task completes, so its results can be yielded right away
+                done, pending = loop.run_until_complete(asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+
+class ProcessExecutor(Executor):
+    """
+    Runs items on separate (supervised) processes pulling small batches of them. Dead or stuck
+    processes (over the task timeout on one item) are replaced and their unfinished items requeued.
+    """
+    name = "process"
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], stage: str) -> Iterator[Tuple[Any, Any]]:
+        supervisor = WorkerSupervisor(fn, self.concurrency, stage, batch_size=self.batch_size,
+                                      task_timeout=self.task_timeout, logger=self.logger, metrics=self.metrics)
+        return supervisor.run(items)
+
+
+_END = object()
+
+EXECUTORS: Dict[str, Type[Executor]] = {
+    ThreadExecutor.name: ThreadExecutor,
+    ProcessExecutor.name: ProcessExecutor,
+    AsyncExecutor.name: AsyncExecutor,
+}
+
+
+def create_executor(name: str, concurrency: int, num_items: int | None = None, batch_size: int = 1,
+                    logger: logging.Logger | None = None, task_timeout: float | None = None,
+                    metrics: MetricsCollector | None = None) -> Executor:
+    """
+    Creates the named executor for given number of items (a serial one if concurrency is not worth it).
+    The number of items is None for streamed items (not known up front), these get a thread executor
+    instead of the process one.
+    """
+    if name not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{name}'. Should be one of: {', '.join(EXECUTORS)}.")
+    if num_items is None:
+        # Unknown whether spawning processes pays off, small workloads would only pay their start-up
+        if name == ProcessExecutor.name:
+            name = ThreadExecutor.name
+        num_items = concurrency
+    # Spawning processes pays off only if there are >= quadratic number of processes items to download
+    if concurrency <= 1 or num_items <= 1 or (name == ProcessExecutor.name and num_items < concurrency ** 2):
+        return SerialExecutor(logger=logger, metrics=metrics)
+    return EXECUTORS[name](concurrency=min(concurrency, num_items), batch_size=batch_size, logger=logger,
+                           task_timeout=task_timeout, metrics=metrics)
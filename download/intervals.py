@@ -0,0 +1,59 @@
+import bisect
+import datetime as dt
+from typing import Any, Dict, Hashable, Iterator, List, Tuple
+
+import util
+
+
+class IntervalBuckets:
+    """
+    Buckets streamed reddits details into the output date intervals.
+
+    Every expected item is registered up front (by its search header date), and an interval
+    is complete once all of its expected items have arrived (successfully or not). Completed
+    intervals are released in chronological order only, so the saved files always form a gap-free
+    prefix of the period (which the INCREMENTAL load relies on).
+    """
+
+    def __init__(self, date_from: dt.datetime, date_to: dt.datetime, interval: str) -> None:
+        self.intervals: List[Tuple[dt.datetime, dt.datetime]] = list(util.date_range(date_from, date_to, interval=interval))
+        self._starts = list(map(lambda i: i[0], self.intervals))
+        self._items: List[List[Dict[str, Any]]] = list([] for _ in self.intervals)
+        self._pending: List[int] = list(0 for _ in self.intervals)
+        self._keys: Dict[Hashable, int] = {}
+        self._next = 0
+
+    def index_of(self, date: dt.datetime) -> int | None:
+        """ Returns index of the interval containing given date (None if out of all intervals) """
+        i = bisect.bisect_right(self._starts, date) - 1
+        return i if 0 <= i < len(self.intervals) and date < self.intervals[i][1] else None
+
+    def expect(self, key: Hashable, created_utc: float) -> bool:
+        """ Registers an expected item, returns False (and ignores it) if it is out of all intervals """
+        i = self.index_of(dt.datetime.fromtimestamp(created_utc))
+        if i is None or i < self._next or key in self._keys:
+            return False
+        self._keys[key] = i
+        self._pending[i] += 1
+        return True
+
+    def add(self, key: Hashable, reddit: Dict[str, Any] | None) -> None:
+        """ Adds the result of an expected item (None if it failed to download) """
+        self._pending[self._keys.pop(key)] -= 1
+        if isinstance(reddit, dict):
+            i = self.index_of(dt.datetime.fromtimestamp(reddit["created_utc"]))
+            if i is not None and i >= self._next:
+                self._items[i].append(reddit)
+
+    def pop_completed(self) -> Iterator[Tuple[dt.datetime, dt.datetime, List[Dict[str, Any]]]]:
+        """ Yields (and forgets) the completed intervals with their reddits, in chronological order """
+        while self._next < len(self.intervals) and self._pending[self._next] == 0:
+            sd, ed = self.intervals[self._next]
+            items, self._items[self._next] = self._items[self._next], list([])
+            self._next += 1
+            yield sd, ed, items
+
+    @property
+    def num_pending(self) -> int:
+        """ Number of expected items not arrived yet """
+        return len(self._keys)
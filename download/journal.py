@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import zlib
+import logging
+import datetime as dt
+from typing import Any, Dict, Tuple
+
+
+class RunJournal:
+    """
+    Append-only checkpoint journal of a download run.
+
+    Every completed reddit (by permalink) and author (by name) is appended to the ``results.jsonl``
+    spool and recorded in ``journal.jsonl`` together with its location (offset and length) in the
+    spool, with its checksum. Writes are flushed and fsync-ed in batches (every ``fsync_every`` records or
+    ``fsync_interval`` seconds), the spool always before the journal. Rerunning with the same
+    parameters (fingerprint) resumes from the journal, anything else starts a new one. Results recorded
+    by the current run can be read back from the spool too.
+    """
+
+    JOURNAL_FILE = "journal.jsonl"
+    RESULTS_FILE = "results.jsonl"
+
+    def __init__(self, folder: str, fingerprint: Dict[str, Any], fsync_every: int = 100, fsync_interval: float = 2.,
+                 logger: logging.Logger | None = None) -> None:
+        self.folder = folder
+        self.fingerprint = fingerprint
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.logger = logger or logging.getLogger(__name__)
+
+        os.makedirs(folder, exist_ok=True)
+        self._journal_path = os.path.join(folder, self.JOURNAL_FILE)
+        self._results_path = os.path.join(folder, self.RESULTS_FILE)
+        self._resumed: Dict[Tuple[str, str], Tuple[int, int]] = self._load()
+        self._recorded: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        if len(self._resumed) == 0:
+            self._start()
+
+        self._terminate_torn_line(self._journal_path)
+        self._journal = open(self._journal_path, "ab")
+        self._results = open(self._results_path, "ab")
+        self._reader = open(self._results_path, "rb")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @property
+    def num_resumed(self) -> int:
+        """ Number of results resumed from the previous (interrupted) run """
+        return len(self._resumed)
+
+    def has(self, kind: str, key: str) -> bool:
+        """ Whether the result was completed by the previous run (safe to call from any thread) """
+        return (kind, key) in self._resumed
+
+    def get(self, kind: str, key: str) -> Any:
+        """ Returns the result completed by the previous run or recorded by this one """
+        if (kind, key) in self._recorded:
+            self._results.flush()
+            offset, length = self._recorded[(kind, key)]
+        else:
+            offset, length = self._resumed[(kind, key)]
+        self._reader.seek(offset)
+        return json.loads(self._reader.read(length))
+
+    def record(self, kind: str, key: str, result: Any) -> None:
+        """ Appends a completed result and its location """
+        data = json.dumps(result).encode("utf-8") + b"\n"
+        offset = self._results.tell()
+        self._results.write(data)
+        self._recorded[(kind, key)] = (offset, len(data))
+        self._journal.write(json.dumps({"kind": kind, "key": key, "file": self.RESULTS_FILE, "offset": offset,
+                                        "length": len(data), "crc32": zlib.crc32(data)}).encode("utf-8") + b"\n")
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """ Flushes and fsyncs the results spool, then the journal """
+        for f in (self._results, self._journal):
+            f.flush()
+            os.fsync(f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self, is_completed: bool = False) -> None:
+        """ Closes the journal, removing it if the run is completed (nothing to resume anymore) """
+        self.sync()
+        for f in (self._journal, self._results, self._reader):
+            f.close()
+        if is_completed:
+            os.remove(self._journal_path)
+            os.remove(self._results_path)
+            self.logger.info(f"Run completed, journal {self._journal_path} removed.")
+
+    def _start(self) -> None:
+        with open(self._journal_path, "wb") as f:
+            f.write(json.dumps({"fingerprint": self.fingerprint,
+                                "created": dt.datetime.now().isoformat()}).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        open(self._results_path, "wb").close()
+
+    @staticmethod
+    def _terminate_torn_line(path: str) -> None:
+        """ Ends a torn last line (of an interrupted run) so that new lines are appended cleanly """
+        with open(path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+    def _load(self) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """ Loads completed results locations of a previous run with the same fingerprint """
+        if not os.path.exists(self._journal_path) or not os.path.exists(self._results_path):
+            return {}
+
+        entries = {}
+        with open(self._journal_path, "rb") as f, open(self._results_path, "rb") as results:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                header = {}
+            if header.get("fingerprint") != self.fingerprint:
+                self.logger.info(f"Journal {self._journal_path} belongs to a run with other parameters, starting anew.")
+                return {}
+
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn line of an interrupted run
+                    continue
+                # Results torn or never synced (the journal may get flushed first) are downloaded again
+                results.seek(entry["offset"])
+                if zlib.crc32(results.read(entry["length"])) == entry["crc32"]:
+                    entries[(entry["kind"], entry["key"])] = (entry["offset"], entry["length"])
+
+        self.logger.info(f"Resuming {len(entries)} results from journal {self._journal_path}.")
+        return entries
@@ -0,0 +1,179 @@
+import json
+import contextlib
+import time
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tasks (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    created_utc REAL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (kind, status, lease_until);
+CREATE INDEX IF NOT EXISTS tasks_created ON tasks (kind, created_utc);
+"""
+
+
+class TaskLedger:
+    """
+    Shared ledger of the reddit (by permalink) and author (by name) download tasks of a distributed run.
+
+    The ledger is a SQLite database, shared by the coordinator and the workers of all nodes (eg. on
+    a shared filesystem). Workers claim pending tasks with time-limited leases and complete (or fail)
+    them, renewing the leases of long running ones; tasks with an expired lease (eg. of a crashed
+    worker) are claimable again, and tasks failing (or expiring) ``max_attempts`` times are given up.
+    Every claim is a single write transaction, so no task is leased by two workers at once. Each
+    thread gets its own connection.
+
+    Note: SQLite relies on the file locks of the filesystem, which have to work across the nodes
+    (eg. NFS with proper locking).
+    """
+
+    PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+    def __init__(self, path: str, lease_seconds: float = 300., max_attempts: int = 3,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def get_meta(self, name: str, default: Any = None) -> Any:
+        row = self._connection().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_meta(self, name: str, value: Any) -> None:
+        with self._transaction() as connection:
+            connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, json.dumps(value)))
+
+    def add(self, kind: str, tasks: Iterable[Tuple[str, float | None]]) -> int:
+        """ Adds (key, created_utc) tasks of the kind (ignoring already added ones), returns number of the new ones """
+        with self._transaction() as connection:
+            cursor = connection.executemany("INSERT OR IGNORE INTO tasks (kind, key, created_utc) VALUES (?, ?, ?)",
+                                            map(lambda t: (kind, t[0], t[1]), tasks))
+            return cursor.rowcount
+
+    def claim(self, kind: str, worker: str, limit: int) -> List[str]:
+        """ Leases up to ``limit`` pending (or expired) tasks of the kind to the worker, returns their keys """
+        now = self.clock()
+        with self._transaction() as connection:
+            # Expired after the last attempt (eg. crashing every worker taking it)
+            connection.execute("UPDATE tasks SET status = ?, lease_until = NULL "
+                               "WHERE kind = ? AND status = ? AND lease_until < ? AND attempts >= ?",
+                               (self.FAILED, kind, self.LEASED, now, self.max_attempts))
+            keys = list(map(lambda r: r[0], connection.execute(
+                "SELECT key FROM tasks WHERE kind = ? "
+                "AND (status = ? OR (status = ? AND lease_until < ? AND attempts < ?)) "
+                "ORDER BY created_utc LIMIT ?", (kind, self.PENDING, self.LEASED, now, self.max_attempts, limit))))
+            connection.executemany(
+                "UPDATE tasks SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1 WHERE kind = ? AND key = ?",
+                map(lambda k: (self.LEASED, worker, now + self.lease_seconds, kind, k), keys))
+        return keys
+
+    def renew(self, kind: str, keys: Iterable[str], worker: str) -> int:
+        """ Extends the leases of the tasks still leased to the worker, returns number of the renewed ones """
+        now = self.clock()
+        with self._transaction() as connection:
+            cursor = connection.executemany(
+                "UPDATE tasks SET lease_until = ? WHERE kind = ? AND key = ? AND status = ? AND worker = ?",
+                map(lambda k: (now + self.lease_seconds, kind, k, self.LEASED, worker), keys))
+            return cursor.rowcount
+
+    def complete(self, kind: str, key: str, result: Any) -> None:
+        """ Stores the result of the task (even if its lease expired meanwhile, the result is as good) """
+        with self._transaction() as connection:
+            connection.execute("UPDATE tasks SET status = ?, result = ?, lease_until = NULL WHERE kind = ? AND key = ?",
+                               (self.DONE, json.dumps(result), kind, key))
+
+    def complete_with_children(self, kind: str, key: str, result: Any, child_kind: str,
+                               children: Iterable[Tuple[str, float | None]]) -> int:
+        """
+        Stores the result of the task and adds its (key, created_utc) child tasks of the child kind in one
+        transaction, so a crash in between cannot leave a done task without them, returns number of the new ones
+        """
+        with self._transaction() as connection:
+            connection.execute("UPDATE tasks SET status = ?, result = ?, lease_until = NULL WHERE kind = ? AND key = ?",
+                               (self.DONE, json.dumps(result), kind, key))
+            cursor = connection.executemany("INSERT OR IGNORE INTO tasks (kind, key, created_utc) VALUES (?, ?, ?)",
+                                            map(lambda t: (child_kind, t[0], t[1]), children))
+            return cursor.rowcount
+
+    def fail(self, kind: str, key: str, worker: str) -> None:
+        """ Releases the failed task of the worker, gives it up after ``max_attempts`` attempts """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_until = NULL "
+                "WHERE kind = ? AND key = ? AND status = ? AND worker = ?",
+                (self.max_attempts, self.FAILED, self.PENDING, kind, key, self.LEASED, worker))
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """ Number of tasks by kind and status """
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in self._connection().execute("SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status"):
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def is_finished(self) -> bool:
+        """ Whether all the tasks are added (search done) and none of them is pending or leased """
+        if not self.get_meta("is_search_done", False):
+            return False
+        row = self._connection().execute("SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)",
+                                         (self.PENDING, self.LEASED)).fetchone()
+        return row[0] == 0
+
+    def results(self, kind: str, created_from: float | None = None, created_to: float | None = None,
+                keys: Iterable[str] | None = None) -> List[Any]:
+        """ Results of the completed tasks of the kind, created within [created_from, created_to) or with given keys """
+        connection = self._connection()
+        if keys is not None:
+            keys = list(keys)
+            rows = list([])
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows.extend(connection.execute(
+                    f"SELECT result FROM tasks WHERE kind = ? AND status = ? AND key IN ({', '.join('?' * len(chunk))})",
+                    (kind, self.DONE, *chunk)))
+        else:
+            rows = connection.execute(
+                "SELECT result FROM tasks WHERE kind = ? AND status = ? AND created_utc >= ? AND created_utc < ? ORDER BY created_utc",
+                (kind, self.DONE, created_from, created_to))
+        return list(map(lambda r: json.loads(r[0]), rows))
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """ Write transaction (taking the database write lock up front) """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=60., isolation_level=None)
+            # Autocommit mode, the writes are explicit transactions
+            connection.execute("PRAGMA busy_timeout = 60000")
+            self._local.connection = connection
+        return connection
@@ -0,0 +1,207 @@
+import os
+import json
+import glob
+import shutil
+import itertools
+import resource
+import threading
+import tracemalloc
+import contextlib
+import multiprocessing
+import multiprocessing.util
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Allocations of the tracking itself and of imports are left out of the allocation sites
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+class MemoryTracker:
+    """
+    Memory instrumentation of a run: every stage, thread and (forked) worker process.
+
+    Every process traces its allocations with tracemalloc (``frames`` frames per allocation), a forked
+    worker process the ones made since the fork. The traced memory is checked whenever a stage is left
+    and by a tracker thread of each process every ``interval`` seconds, keeping the peak of every stage
+    running meanwhile. Whenever the traced memory grows by more than ``growth`` over the last snapshot of
+    a running stage, the tracker thread takes a tracemalloc snapshot for the running stages (grouped into
+    its ``top`` allocation sites once the tracing stops), so every stage ends up with the sites of (nearly)
+    its peak. The stages of one process share its memory, so stages running at once share their sites
+    too. Each worker process dumps its stage peaks, sites and peak RSS when it exits; ``merge`` merges
+    them with the ones of the main process into one JSON file and one text report. Tracing slows the run
+    down and takes memory of its own, so compare tracked runs with tracked runs only.
+    """
+
+    def __init__(self, output_file_prefix: str, interval: float = 0.05, top: int = 10, frames: int = 3,
+                 growth: float = 0.1) -> None:
+        self.output_file_prefix = output_file_prefix
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.growth = growth
+        self.parts_folder = f"{output_file_prefix}_parts"
+        os.makedirs(self.parts_folder, exist_ok=True)
+
+        self._pid: int | None = None
+        self._main_pid = os.getpid()
+        self._ensure_process()
+
+    def profiled(self, fn: Callable[..., Any], stage: str) -> Callable[..., Any]:
+        """ The function, tracked as part of the stage wherever it runs """
+        return _Tracked(self, fn, stage)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """ Tracks the block as (a part of) the stage """
+        self._ensure_process()
+        with self._lock:
+            self._active[name] += 1
+        try:
+            yield
+        finally:
+            # Checked while still running, so short stages get their peak too
+            self._check(is_snapshot_taken=False)
+            with self._lock:
+                self._active[name] -= 1
+
+    def merge(self) -> Tuple[str, str]:
+        """ Merges the memory usage of all the processes, returns the JSON and text report files """
+        self._dump()
+        processes = list([])
+        for part_file in glob.glob(os.path.join(self.parts_folder, "*.json")):
+            with open(part_file, encoding="utf-8") as f:
+                processes.append(json.load(f))
+        processes.sort(key=lambda p: (not p["is_main"], p["name"]))
+
+        # Stage peaks of the process it peaked in
+        stages: Dict[str, Dict[str, Any]] = {}
+        for process in processes:
+            for name, stage in process["stages"].items():
+                if name not in stages or stage["peak_mb"] > stages[name]["peak_mb"]:
+                    stages[name] = stage | {"process": process["name"], "pid": process["pid"]}
+        report = {"processes": list(map(lambda p: dict(filter(lambda kv: kv[0] != "stages", p.items())), processes)),
+                  "stages": stages}
+
+        json_file, report_file = f"{self.output_file_prefix}.json", f"{self.output_file_prefix}.txt"
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        with open(report_file, "w", encoding="utf-8") as f:
+            f.write(format_report(report))
+        shutil.rmtree(self.parts_folder, ignore_errors=True)
+        return json_file, report_file
+
+    def _ensure_process(self) -> None:
+        """ Fresh state (and tracker thread) for a process forked with the tracker """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        # Lock of the parent might have been held by one of its threads at fork
+        self._lock = threading.Lock()
+        self._active: Counter = Counter()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        elif self._pid != self._main_pid:
+            # Memory of a forked process is counted since the fork
+            tracemalloc.clear_traces()
+        self._stopped = threading.Event()
+        self._tracker = threading.Thread(target=self._track, name="memory", daemon=True)
+        self._tracker.start()
+        if self._pid != self._main_pid:
+            # Run by the worker process when it exits
+            multiprocessing.util.Finalize(None, self._dump, exitpriority=10)
+
+    def _track(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._check()
+
+    def _check(self, is_snapshot_taken: bool = True) -> None:
+        """ Updates the peaks of the running stages, snapshots the ones grown over their last snapshot """
+        if not tracemalloc.is_tracing():
+            return
+        current_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        with self._lock:
+            grown = list([])
+            for name in filter(lambda n: self._active[n] > 0, list(self._active)):
+                stage = self._stages.setdefault(name, {"peak_mb": 0., "snapshot_mb": 0., "snapshot": None})
+                stage["peak_mb"] = max(stage["peak_mb"], current_mb)
+                if current_mb > stage["snapshot_mb"] * (1 + self.growth):
+                    grown.append(stage)
+        # Snapshots take a while (for every traced block), one is taken for all the grown stages
+        if is_snapshot_taken and len(grown) > 0:
+            snapshot = tracemalloc.take_snapshot()
+            with self._lock:
+                for stage in grown:
+                    stage["snapshot_mb"], stage["snapshot"] = current_mb, snapshot
+
+    def _top_sites(self, snapshot: tracemalloc.Snapshot | None) -> List[Dict[str, Any]]:
+        """ Largest allocation sites of the snapshot (by the traceback of the allocation, most recent call first) """
+        if snapshot is None:
+            return list([])
+        # Left out after grouping, Snapshot.filter_traces matches the file patterns of every trace (in Python)
+        statistics = filter(lambda stat: stat.traceback[-1].filename not in _IGNORED_FILES,
+                            snapshot.statistics("traceback"))
+        return list(map(lambda stat: {
+            "site": " < ".join(map(lambda frame: f"{frame.filename}:{frame.lineno}", reversed(stat.traceback))),
+            "size_mb": stat.size / 2 ** 20,
+            "count": stat.count,
+        }, itertools.islice(statistics, self.top)))
+
+    def _dump(self) -> None:
+        """ Dumps the memory usage of the process into the parts folder """
+        self._stopped.set()
+        self._tracker.join()
+        self._check(is_snapshot_taken=False)
+        peak_traced_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20 if tracemalloc.is_tracing() else 0.
+        tracemalloc.stop()
+        # Grouped untraced: every object Snapshot.statistics makes would be traced (seconds for a large snapshot)
+        with self._lock:
+            snapshots = dict(map(lambda st: (id(st["snapshot"]), st["snapshot"]), self._stages.values()))
+            tops = dict(map(lambda kv: (kv[0], self._top_sites(kv[1])), snapshots.items()))
+            stages = dict(map(lambda kv: (kv[0], {"peak_mb": kv[1]["peak_mb"], "top": tops[id(kv[1]["snapshot"])]}),
+                              self._stages.items()))
+        part = {
+            "pid": os.getpid(),
+            "name": multiprocessing.current_process().name,
+            "is_main": os.getpid() == self._main_pid,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "peak_traced_mb": peak_traced_mb,
+            "stages": stages,
+        }
+        with open(os.path.join(self.parts_folder, f"{os.getpid()}.json"), "w", encoding="utf-8") as f:
+            json.dump(part, f)
+
+
+class _Tracked:
+    """ Function tracked as part of a stage (a class, so it can be sent to worker processes) """
+
+    def __init__(self, tracker: MemoryTracker, fn: Callable[..., Any], stage: str) -> None:
+        self.tracker = tracker
+        self.fn = fn
+        self.stage = stage
+
+    def __call__(self, *args, **kwargs) -> Any:
+        with self.tracker.stage(self.stage):
+            return self.fn(*args, **kwargs)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """ Text report of the merged memory usage: processes, stage peaks and their top allocation sites """
+    lines = ["Processes:", f"{'process':<30}{'pid':>10}{'peak RSS [MB]':>16}{'peak traced [MB]':>19}"]
+    for process in report["processes"]:
+        lines.append(f"{process['name']:<30}{process['pid']:>10}{process['peak_rss_mb']:>16.1f}{process['peak_traced_mb']:>19.1f}")
+    lines.extend(["", "Stages:", f"{'stage':<30}{'process':>30}{'peak traced [MB]':>19}"])
+    for name, stage in sorted(report["stages"].items(), key=lambda kv: -kv[1]["peak_mb"]):
+        lines.append(f"{name:<30}{stage['process']:>30}{stage['peak_mb']:>19.1f}")
+    # Stages running at once share their snapshot
+    snapshots: Dict[str, List[str]] = {}
+    for name, stage in sorted(report["stages"].items(), key=lambda kv: -kv[1]["peak_mb"]):
+        snapshots.setdefault(json.dumps([stage["pid"], stage["top"]]), list([])).append(name)
+    for key, names in snapshots.items():
+        stage = report["stages"][names[0]]
+        lines.extend(["", f"Top allocation sites of stages {', '.join(map(repr, names))} (in {stage['process']}):"])
+        if len(stage["top"]) == 0:
+            lines.append("    none (the stage did not grow the memory)")
+        for site in stage["top"]:
+            lines.append(f"{site['size_mb']:>10.2f} MB {site['count']:>9} blocks  {site['site']}")
+    return "\n".join(lines) + "\n"
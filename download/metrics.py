@@ -0,0 +1,211 @@
+import re
+import bisect
+import logging
+import threading
+import multiprocessing
+from typing import Any, Callable, Dict, List, Tuple
+
+# YARS endpoints recognized by the request path (first match wins)
+ENDPOINTS: List[Tuple[str, re.Pattern]] = [
+    ("search", re.compile(r"/search\.json$")),
+    ("post_details", re.compile(r"/comments/[^/]+")),
+    ("user_data", re.compile(r"^/user/")),
+    ("subreddit_listing", re.compile(r"^/r/[^/]+/\w+\.json$")),
+    ("other", re.compile(r"")),
+]
+STATUS_CODES = [200, 301, 302, 304, 400, 401, 403, 404, 429, 500, 502, 503, 504]
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.]
+INTERVAL_ITEMS_BUCKETS = [0, 1, 10, 100, 1000, 10000]
+
+# Counters of an endpoint: requests per status code (and other codes), retries, bytes, latency sum and buckets
+_OTHER_CODE = len(STATUS_CODES)
+_RETRIES = _OTHER_CODE + 1
+_BYTES = _RETRIES + 1
+_LATENCY_SUM = _BYTES + 1
+_LATENCY_BUCKETS = _LATENCY_SUM + 1
+_ENDPOINT_COUNTERS = _LATENCY_BUCKETS + len(LATENCY_BUCKETS) + 1
+
+
+class MetricsCollector:
+    """
+    Metrics of a downloader run, rendered in the Prometheus text format.
+
+    Request metrics (per YARS endpoint: requests by status code, retries, bytes received and latency
+    histogram) are collected by the ``on_response`` hook of the requests session. They live in shared
+    memory, so the requests of the worker processes (forked or spawned with the session) are collected
+    too; a pickled collector takes the request metrics only.
+    The other metrics are of the main process: gauges read at scrape time (eg. queue depths), gauges
+    set by the supervisors (alive workers), counters and histograms (items written per interval).
+    """
+
+    def __init__(self) -> None:
+        self._lock = multiprocessing.Lock()
+        self._counters = multiprocessing.RawArray("d", _ENDPOINT_COUNTERS * len(ENDPOINTS))
+
+        self._local_lock = threading.Lock()
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Callable[[], float] | float] = {}
+        self._local_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sent to the spawned worker processes with the session hooks, the other metrics are of this process
+        return {"_lock": self._lock, "_counters": self._counters}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local_lock = threading.Lock()
+        self._gauges = {}
+        self._local_counters = {}
+        self._histograms = {}
+
+    def on_response(self, response, *args, **kwargs) -> None:
+        """ Response hook of the requests session (``session.hooks["response"]``) """
+        path = response.request.path_url.split("?")[0] if response.request is not None else ""
+        i = _ENDPOINT_COUNTERS * next(i for i, (_, pattern) in enumerate(ENDPOINTS) if pattern.search(path))
+        code = STATUS_CODES.index(response.status_code) if response.status_code in STATUS_CODES else _OTHER_CODE
+        retries = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+        # Streamed content is left for the caller to consume
+        size = int(response.headers.get("Content-Length", 0)) if kwargs.get("stream") else len(response.content or b"")
+        latency = response.elapsed.total_seconds()
+        with self._lock:
+            self._counters[i + code] += 1
+            self._counters[i + _RETRIES] += len(retries)
+            self._counters[i + _BYTES] += size
+            self._counters[i + _LATENCY_SUM] += latency
+            self._counters[i + _LATENCY_BUCKETS + bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def set_gauge(self, name: str, value: Callable[[], float] | float, **labels: str) -> None:
+        """ Sets the gauge to the value (or to a function evaluated at scrape time) """
+        with self._local_lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def remove_gauge(self, name: str, **labels: str) -> None:
+        with self._local_lock:
+            self._gauges.pop((name, tuple(sorted(labels.items()))), None)
+
+    def inc(self, name: str, value: float = 1., **labels: str) -> None:
+        """ Increments the counter (of the main process) """
+        key = (name, tuple(sorted(labels.items())))
+        with self._local_lock:
+            self._local_counters[key] = self._local_counters.get(key, 0.) + value
+
+    def observe_interval_items(self, kind: str, num_items: int) -> None:
+        """ Observes the number of items (reddits or authors) written into the file of an interval """
+        key = ("download_interval_items", (("kind", kind),))
+        with self._local_lock:
+            histogram = self._histograms.setdefault(key, list(0. for _ in range(len(INTERVAL_ITEMS_BUCKETS) + 2)))
+            histogram[bisect.bisect_left(INTERVAL_ITEMS_BUCKETS, num_items)] += 1
+            histogram[-1] += num_items
+
+    def render(self) -> str:
+        """ All the metrics in the Prometheus text format """
+        with self._lock:
+            counters = list(self._counters)
+        lines = list([])
+        lines.extend(_header("yars_requests_total", "counter", "Requests sent by YARS endpoint and status code."))
+        for e, (endpoint, _) in enumerate(ENDPOINTS):
+            i = _ENDPOINT_COUNTERS * e
+            for code, name in enumerate(STATUS_CODES + ["other"]):
+                if counters[i + code] > 0:
+                    lines.append(f'yars_requests_total{{endpoint="{endpoint}",code="{name}"}} {counters[i + code]:.0f}')
+        for name, kind, help_text, offset in [
+            ("yars_retries_total", "counter", "Retries (and redirects) of the requests by YARS endpoint.", _RETRIES),
+            ("yars_response_bytes_total", "counter", "Bytes received by YARS endpoint.", _BYTES),
+        ]:
+            lines.extend(_header(name, kind, help_text))
+            for e, (endpoint, _) in enumerate(ENDPOINTS):
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {counters[_ENDPOINT_COUNTERS * e + offset]:.0f}')
+
+        lines.extend(_header("yars_request_duration_seconds", "histogram", "Latency of the requests by YARS endpoint."))
+        for e, (endpoint, _) in enumerate(ENDPOINTS):
+            i = _ENDPOINT_COUNTERS * e
+            buckets = counters[i + _LATENCY_BUCKETS:i + _ENDPOINT_COUNTERS]
+            lines.extend(_histogram("yars_request_duration_seconds", f'endpoint="{endpoint}"', LATENCY_BUCKETS,
+                                    buckets, counters[i + _LATENCY_SUM]))
+
+        with self._local_lock:
+            gauges = dict(self._gauges)
+            local_counters = dict(self._local_counters)
+            histograms = dict(map(lambda kv: (kv[0], list(kv[1])), self._histograms.items()))
+        for name in sorted(set(map(lambda k: k[0], gauges))):
+            lines.extend(_header(name, "gauge"))
+            for (gauge_name, labels), value in sorted(gauges.items(), key=lambda kv: kv[0]):
+                if gauge_name == name:
+                    lines.append(f"{name}{_labels(labels)} {value() if callable(value) else value}")
+        for name in sorted(set(map(lambda k: k[0], local_counters))):
+            lines.extend(_header(name, "counter"))
+            for (counter_name, labels), value in sorted(local_counters.items()):
+                if counter_name == name:
+                    lines.append(f"{name}{_labels(labels)} {value:.0f}")
+        if len(histograms) > 0:
+            lines.extend(_header("download_interval_items", "histogram", "Items written into the file of an interval."))
+            for (name, labels), histogram in sorted(histograms.items()):
+                lines.extend(_histogram(name, _labels(labels)[1:-1], INTERVAL_ITEMS_BUCKETS, histogram[:-1], histogram[-1]))
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """ Local HTTP endpoint serving the metrics of the collector at /metrics (in a daemon thread) """
+
+    def __init__(self, collector: MetricsCollector, port: int, host: str = "127.0.0.1",
+                 logger: logging.Logger | None = None) -> None:
+        # Imported by the runs serving the metrics only, the collector does not need it
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.collector = collector
+        self.logger = logger or logging.getLogger(__name__)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler) -> None:
+                if handler.path.split("?")[0] != "/metrics":
+                    handler.send_error(404)
+                    return
+                body = collector.render().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format: str, *args) -> None:
+                self.logger.debug(f"Metrics server: {format % args}")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _header(name: str, kind: str, help_text: str | None = None) -> List[str]:
+    return ([f"# HELP {name} {help_text}"] if help_text else list([])) + [f"# TYPE {name} {kind}"]
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    return "{" + ",".join(map(lambda kv: f'{kv[0]}="{_escape(kv[1])}"', labels)) + "}" if len(labels) > 0 else ""
+
+
+def _escape(value: str) -> str:
+    """ Label value (eg. a searched phrase) escaped as the text format requires: backslashes, quotes and line feeds """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram(name: str, labels: str, bounds: List[float], buckets: List[float], total: float) -> List[str]:
+    """ Cumulative buckets, sum and count lines of a histogram (buckets counted per bound, the last one over all) """
+    lines, count = list([]), 0.
+    prefix = f"{labels}," if labels else ""
+    for bound, bucket in zip(bounds + ["+Inf"], buckets):
+        count += bucket
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count:.0f}')
+    lines.append(f"{name}_sum{{{labels}}} {total}" if labels else f"{name}_sum {total}")
+    lines.append(f"{name}_count{{{labels}}} {count:.0f}" if labels else f"{name}_count {count:.0f}")
+    return lines
@@ -0,0 +1,331 @@
+from __future__ import annotations
+import queue
+import logging
+import threading
+import functools
+import contextlib
+import datetime as dt
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Set, Tuple
+
+import util
+import yars
+from model import EloadType, DownloadParams, LoadParams
+from download.executors import create_executor
+from download.intervals import IntervalBuckets
+from download.journal import RunJournal
+from download.memory import MemoryTracker
+from download.metrics import MetricsCollector
+from download.profiler import RunProfiler
+from download.progress import ProgressTracker
+from download.shared import SharedResults
+
+_END = None
+
+
+class DownloadPipeline:
+    """
+    Streaming reddits downloader: search -> details -> authors -> write.
+
+    Every network stage runs in its own thread, connected to the next one by a bounded queue:
+    reddits details are downloaded as soon as the first search page arrives, and authors as
+    soon as the first thread containing them is parsed (each author once per run). The
+    coordinator (calling thread) owns all the bookkeeping and writes the reddits and authors
+    files of the date intervals as these complete, in chronological order.
+
+    With a journal, completed reddits and authors are checkpointed as they arrive and the ones
+    completed by an interrupted run are taken from it instead of being downloaded again. An author
+    no longer referred to by an arrived reddit waiting for its authors file is then kept in the
+    journal only (and read back from it if a later reddit refers to it again).
+
+    With shared results (batch runs), reddits and authors already downloaded or being downloaded
+    by the pipeline of another phrase are awaited instead of being downloaded again.
+
+    With a progress tracker, the coordinator reports every expected and arrived reddit and author to it.
+    With a metrics collector, the depths of the queues and the items written per interval are collected.
+    With a profiler, every stage (also in the worker threads and processes) is profiled: search, details,
+    authors and the coordinator with its author collection and serialization. With a memory tracker, the
+    memory of the same stages is tracked.
+    """
+
+    def __init__(self, downloader: yars.YARS, download_params: DownloadParams, load_params: LoadParams,
+                 website_url: str, logger: logging.Logger, queue_size: int = 1000,
+                 journal: RunJournal | None = None, shared: SharedResults | None = None,
+                 progress: ProgressTracker | None = None, metrics: MetricsCollector | None = None,
+                 profiler: RunProfiler | None = None, memory: MemoryTracker | None = None) -> None:
+        self.downloader = downloader
+        self.download_params = download_params
+        self.load_params = load_params
+        self.website_url = website_url
+        self.logger = logger
+        self.journal = journal
+        self.shared = shared
+        self.progress = progress
+        self.metrics = metrics
+        self.profiler = profiler
+        self.memory = memory
+
+        self.buckets = IntervalBuckets(load_params.date_from, load_params.date_to, download_params.date_interval)
+        self.stats = {"found": 0, "downloaded": 0, "failed": 0, "authors": 0, "intervals": 0, "resumed": 0, "shared": 0}
+
+        self._details_in: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._authors_in: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._events: queue.Queue = queue.Queue()
+
+        self._requested_authors: Set[str] = set()
+        self._author_results: Dict[str, Any] = {}
+        self._author_references: Counter = Counter()
+        self._released_authors: Set[str] = set()
+        self._waiting_authors: Deque[Tuple[dt.datetime, dt.datetime, Counter]] = deque()
+        self._claims: Set[Tuple[str, str]] = set()
+        self._awaited = {"reddit": 0, "author": 0}
+        self._awaited_lock = threading.Lock()
+        self._is_authors_end_sent = False
+
+    def run(self) -> Dict[str, int]:
+        """ Runs the whole pipeline, returns its statistics """
+        if self.progress is not None:
+            self.progress.start()
+        queues = {"details": self._details_in, "authors": self._authors_in, "events": self._events}
+        if self.metrics is not None:
+            for name, items_queue in queues.items():
+                self.metrics.set_gauge("download_queue_depth", items_queue.qsize, phrase=self.download_params.phrase, queue=name)
+        try:
+            with self._stage("coordinator"):
+                return self._run()
+        finally:
+            if self.progress is not None:
+                self.progress.stop()
+            if self.metrics is not None:
+                for name in queues:
+                    self.metrics.remove_gauge("download_queue_depth", phrase=self.download_params.phrase, queue=name)
+            if self.shared is not None:
+                self.shared.release(self._claims)
+
+    def _run(self) -> Dict[str, int]:
+        stages = [("search", self._search), ("reddits", self._download_reddits)]
+        if self.download_params.is_author_downloaded:
+            stages.append(("authors", self._download_authors))
+        for name, target in stages:
+            threading.Thread(target=self._run_stage, args=(name, target), name=name, daemon=True).start()
+
+        running = set(map(lambda st: st[0], stages))
+        while len(running) > 0 or sum(self._awaited.values()) > 0:
+            event, *payload = self._events.get()
+            if event == "header":
+                self.buckets.expect(*payload)
+                if self.progress is not None:
+                    self.progress.expect("reddits")
+            elif event == "reddit":
+                self._on_reddit(*payload)
+            elif event == "resumed":
+                self.stats["resumed"] += 1
+                self._on_reddit(payload[0], self.journal.get("reddit", payload[0]), is_resumed=True)
+            elif event == "author":
+                self._on_author(*payload)
+            elif event == "shared":
+                kind, key, result = payload
+                with self._awaited_lock:
+                    self._awaited[kind] -= 1
+                self.stats["shared"] += 1
+                if kind == "reddit":
+                    self._on_reddit(key, result)
+                else:
+                    self._on_author(key, result)
+            elif event == "done":
+                running.discard(payload[0])
+                if payload[0] == "search":
+                    print(f"Found {self.stats['found']} results.")
+                    self.logger.info(f"Found {self.stats['found']} results.")
+            elif event == "error":
+                raise RuntimeError(f"Stage '{payload[0]}' failed: {payload[1]}") from payload[1]
+
+            # No more authors once the reddits (also the ones awaited from other pipelines) are all there
+            if self.download_params.is_author_downloaded and not self._is_authors_end_sent \
+                    and "reddits" not in running and self._awaited["reddit"] == 0:
+                self._authors_in.put(_END)
+                self._is_authors_end_sent = True
+
+            if "search" not in running:
+                self._save_completed()
+
+        return self.stats
+
+    def _run_stage(self, name: str, target: Callable[[], None]) -> None:
+        try:
+            with self._stage(name):
+                target()
+            self._events.put(("done", name))
+        except Exception as e:
+            self.logger.exception(f"Stage '{name}' failed.")
+            self._events.put(("error", name, e))
+
+    def _search(self) -> None:
+        """ Search stage: streams found permalinks (within the load period) to the details stage """
+        seen = set()
+        pages = self.downloader.search_reddit_pages(query=self.download_params.phrase, limit=self.download_params.limit)
+        for reddit_headers in pages:
+            for reddit_header in reddit_headers:
+                created = dt.datetime.fromtimestamp(reddit_header['created_utc'])
+                # Restriction to the newest only for INCREMENTAL load
+                if self.load_params.load_type == EloadType.INCREMENTAL \
+                        and not self.load_params.date_to > created >= self.load_params.date_from:
+                    continue
+                permalink = reddit_header['link'].split(self.website_url)[1]
+                if permalink in seen or self.buckets.index_of(created) is None:
+                    continue
+                seen.add(permalink)
+                self.stats["found"] += 1
+                # Header event goes first, so the coordinator expects the reddit before its details arrive
+                self._events.put(("header", permalink, reddit_header['created_utc']))
+                if self.journal is not None and self.journal.has("reddit", permalink):
+                    self._events.put(("resumed", permalink))
+                elif self._claim("reddit", permalink):
+                    self._details_in.put(permalink)
+        self._details_in.put(_END)
+
+    def _download_reddits(self) -> None:
+        """ Details stage """
+        # At most the search limit of reddits
+        executor = create_executor(self.download_params.executor, self.download_params.details_concurrency,
+                                   num_items=self.download_params.limit, batch_size=self.download_params.batch_size, logger=self.logger,
+                                   task_timeout=self.download_params.task_timeout, metrics=self.metrics)
+        print(f"Downloading reddits ({executor.name} executor, concurrency: {executor.concurrency}).")
+        self.logger.info(f"Downloading reddits ({executor.name} executor, concurrency: {executor.concurrency}).")
+        fetch = self._profiled(self.downloader.scrape_post_details, "details")
+        for permalink, reddit in executor.map(fetch, _iter_queue(self._details_in), "reddits"):
+            self._events.put(("reddit", permalink, reddit))
+
+    def _download_authors(self) -> None:
+        """ Authors stage """
+        executor = create_executor(self.download_params.executor, self.download_params.authors_concurrency,
+                                   batch_size=self.download_params.batch_size, logger=self.logger,
+                                   task_timeout=self.download_params.task_timeout, metrics=self.metrics)
+        print(f"Downloading authors ({executor.name} executor, concurrency: {executor.concurrency}).")
+        self.logger.info(f"Downloading authors ({executor.name} executor, concurrency: {executor.concurrency}).")
+        fetch = self._profiled(functools.partial(self.downloader.scrape_user_data, limit=1), "authors")
+        for name, author in executor.map(fetch, _iter_queue(self._authors_in), "authors"):
+            self._events.put(("author", name, author))
+
+    def _on_reddit(self, permalink: str, reddit: Dict[str, Any] | None, is_resumed: bool = False) -> None:
+        self.buckets.add(permalink, reddit)
+        if self.progress is not None:
+            self.progress.done("reddits", is_failed=not isinstance(reddit, dict))
+        if not isinstance(reddit, dict):
+            self._resolve("reddit", permalink, reddit, is_failed=True)
+            self.stats["failed"] += 1
+            print("Something went wrong.")
+            self.logger.warning(f"Failed to download reddit {permalink}.")
+            return
+
+        self._resolve("reddit", permalink, reddit)
+        self.stats["downloaded"] += 1
+        if self.journal is not None and not is_resumed:
+            self.journal.record("reddit", permalink, reddit)
+        if self.download_params.is_author_downloaded:
+            with self._stage("author collection"):
+                authors = util.collect_authors([reddit])
+            self._author_references.update(authors)
+            for name in authors:
+                if name not in self._requested_authors:
+                    self._requested_authors.add(name)
+                    if self.progress is not None:
+                        self.progress.expect("authors")
+                    if self.journal is not None and self.journal.has("author", name):
+                        self.stats["resumed"] += 1
+                        self._on_author(name, self.journal.get("author", name), is_resumed=True)
+                    elif self._claim("author", name):
+                        self._authors_in.put(name)
+
+    def _on_author(self, name: str, author: Any, is_resumed: bool = False) -> None:
+        self._author_results[name] = author
+        self.stats["authors"] += 1
+        if self.progress is not None:
+            self.progress.done("authors", is_failed=not isinstance(author, list))
+        self._resolve("author", name, author, is_failed=not isinstance(author, list))
+        if self.journal is not None and not is_resumed and isinstance(author, list):
+            self.journal.record("author", name, author)
+
+    def _claim(self, kind: str, key: str) -> bool:
+        """ Whether the reddit or author has to be downloaded, otherwise its shared result is awaited """
+        if self.shared is None:
+            return True
+        future, is_owner = self.shared.claim(kind, key)
+        if is_owner:
+            self._claims.add((kind, key))
+            return True
+
+        with self._awaited_lock:
+            self._awaited[kind] += 1
+        future.add_done_callback(lambda f: self._events.put(("shared", kind, key, f.result())))
+        return False
+
+    def _resolve(self, kind: str, key: str, result: Any, is_failed: bool = False) -> None:
+        """ Shares the result of a reddit or author this pipeline claimed """
+        if (kind, key) in self._claims:
+            self.shared.resolve(kind, key, result, is_failed=is_failed)
+
+    @contextlib.contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        """ Profiled (if profiling) and memory tracked (if tracking) stage """
+        with contextlib.ExitStack() as stack:
+            for tracker in filter(lambda t: t is not None, [self.profiler, self.memory]):
+                stack.enter_context(tracker.stage(name))
+            yield
+
+    def _profiled(self, fn: Callable[..., Any], stage: str) -> Callable[..., Any]:
+        for tracker in filter(lambda t: t is not None, [self.profiler, self.memory]):
+            fn = tracker.profiled(fn, stage)
+        return fn
+
+    def _save_completed(self) -> None:
+        """ Saves the reddits, then the authors of completed intervals (in chronological order) """
+        for sd, ed, reddits_interval in self.buckets.pop_completed():
+            self.stats["intervals"] += 1
+            with self._stage("serialization"):
+                util.save_jsons(reddits_interval,
+                                self.download_params.output_reddits_folder, self.download_params.output_reddits_file_pattern,
+                                sd, ed, logger=self.logger)
+            if self.metrics is not None:
+                self.metrics.observe_interval_items("reddits", len(reddits_interval))
+            if self.download_params.is_author_downloaded:
+                with self._stage("author collection"):
+                    # Per reddit, as these are referenced on arrival
+                    references = Counter(name for reddit in reddits_interval for name in util.collect_authors([reddit]))
+                print(f"Found {len(references)} different authors for period {sd} -- {ed}.")
+                self.logger.info(f"Found {len(references)} different authors for period {sd} -- {ed}.")
+                self._waiting_authors.append((sd, ed, references))
+
+        while len(self._waiting_authors) > 0 \
+                and all(map(lambda a: a in self._author_results or a in self._released_authors,
+                            self._waiting_authors[0][2])):
+            sd, ed, references = self._waiting_authors.popleft()
+            author_details = list(filter(lambda r: isinstance(r, list), map(self._author_result, references)))
+            with self._stage("serialization"):
+                util.save_jsons(author_details,
+                                self.download_params.output_authors_folder, self.download_params.output_authors_file_pattern,
+                                sd, ed, logger=self.logger)
+            if self.metrics is not None:
+                self.metrics.observe_interval_items("authors", len(author_details))
+            self._release_authors(references)
+
+    def _author_result(self, name: str) -> Any:
+        if name in self._released_authors:
+            return self.journal.get("author", name)
+        return self._author_results[name]
+
+    def _release_authors(self, references: Counter) -> None:
+        """ Keeps the authors no longer referred to by a reddit waiting for its authors file in the journal only """
+        self._author_references.subtract(references)
+        for name in references:
+            if self._author_references[name] <= 0:
+                del self._author_references[name]
+                # Failed ones are not journaled
+                if self.journal is not None and isinstance(self._author_results.get(name), list):
+                    del self._author_results[name]
+                    self._released_authors.add(name)
+
+
+def _iter_queue(items_queue: queue.Queue) -> Iterable[Any]:
+    """ Yields items put into the queue until the end marker """
+    return iter(items_queue.get, _END)
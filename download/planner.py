@@ -0,0 +1,141 @@
+from __future__ import annotations
+import os
+import json
+import time
+import logging
+import datetime as dt
+from typing import Any, Dict, List, Set, Tuple
+
+import yars
+from model import EloadType, DownloadParams, LoadParams
+from download.intervals import IntervalBuckets
+
+# Sizes (bytes of the indented JSON files) used when there are no files of earlier runs to calibrate from
+REDDIT_BYTES = 2500
+COMMENT_BYTES = 700
+AUTHOR_BYTES = 1500
+
+
+class DownloadPlanner:
+    """
+    Dry run of a download: runs the search stage only (or its first ``max_pages`` pages) and estimates
+    the cost of the run without downloading any reddit details or authors.
+
+    The estimate covers the reddit details requests, the author requests (each author is requested once
+    per run; the search headers tell the posts authors and the number of comments only, so the comment
+    authors are bounded from above by the number of comments), the output intervals and files, the bytes
+    written (calibrated on the files of earlier runs if there are any) and the wall time under the
+    configured concurrency and rate limit (with the latency of the search requests).
+
+    A sampled search (stopped while results were still coming) is extrapolated to the search limit,
+    so its estimate is an upper bound.
+    """
+
+    def __init__(self, downloader: yars.YARS, download_params: DownloadParams, load_params: LoadParams,
+                 website_url: str, logger: logging.Logger, max_pages: int | None = None) -> None:
+        self.downloader = downloader
+        self.download_params = download_params
+        self.load_params = load_params
+        self.website_url = website_url
+        self.logger = logger
+        self.max_pages = max_pages
+
+    def plan(self) -> Dict[str, Any]:
+        """ Searches the reddits and returns the estimated cost of the download """
+        buckets = IntervalBuckets(self.load_params.date_from, self.load_params.date_to, self.download_params.date_interval)
+        seen: Set[str] = set()
+        authors: Set[str] = set()
+        num_searched, num_pages, num_comments, search_time = 0, 0, 0, 0.
+        is_sampled = False
+
+        pages = self.downloader.search_reddit_pages(query=self.download_params.phrase, limit=self.download_params.limit)
+        start = time.monotonic()
+        for reddit_headers in pages:
+            if self.max_pages is not None and num_pages >= self.max_pages:
+                # Search goes on past the sampled pages
+                is_sampled = True
+                break
+            search_time += time.monotonic() - start
+            num_pages += 1
+            num_searched += len(reddit_headers)
+            for reddit_header in reddit_headers:
+                created = dt.datetime.fromtimestamp(reddit_header['created_utc'])
+                # Same restrictions as of the download search stage
+                if self.load_params.load_type == EloadType.INCREMENTAL \
+                        and not self.load_params.date_to > created >= self.load_params.date_from:
+                    continue
+                permalink = reddit_header['link'].split(self.website_url)[1]
+                if permalink in seen or buckets.index_of(created) is None:
+                    continue
+                seen.add(permalink)
+                authors.add(reddit_header['author'])
+                num_comments += reddit_header.get('num_comments', 0)
+            start = time.monotonic()
+
+        # Sampled search is extrapolated to the limit
+        scale = self.download_params.limit / num_searched if is_sampled and num_searched > 0 else 1.
+        num_reddits = round(len(seen) * scale)
+        num_comments = round(num_comments * scale)
+        authors.discard("[deleted]")
+        if self.download_params.is_author_downloaded:
+            authors_range = (round(len(authors) * scale), round(len(authors) * scale) + num_comments)
+        else:
+            authors_range = (0, 0)
+        num_intervals = len(buckets.intervals)
+        num_files = num_intervals * (2 if self.download_params.is_author_downloaded else 1)
+
+        reddit_bytes, comment_bytes, author_bytes = self._calibrate()
+        reddits_bytes = num_reddits * reddit_bytes + num_comments * comment_bytes
+        authors_bytes = tuple(map(lambda n: n * author_bytes, authors_range))
+
+        latency = search_time / num_pages if num_pages > 0 else self.downloader.timeout
+        details_time = num_reddits * latency / self.download_params.details_concurrency
+        authors_time = authors_range[1] * latency / self.download_params.authors_concurrency
+        # Stages run at once (streaming pipeline), the rate limit is shared by all their requests
+        num_requests = round(num_pages * scale) + num_reddits + authors_range[1]
+        rate_time = num_requests / self.download_params.rate_limit if self.download_params.rate_limit else 0.
+        wall_time = search_time * scale + max(details_time, authors_time, rate_time)
+
+        return {
+            "phrase": self.download_params.phrase,
+            "is_sampled": is_sampled,
+            "search_pages": num_pages,
+            "searched": num_searched,
+            "reddits": num_reddits,
+            "comments": num_comments,
+            "detail_requests": num_reddits,
+            "author_requests": authors_range,
+            "requests": num_requests,
+            "intervals": num_intervals,
+            "files": num_files,
+            "bytes": (reddits_bytes + authors_bytes[0], reddits_bytes + authors_bytes[1]),
+            "latency": latency,
+            "wall_time": wall_time,
+        }
+
+    def _calibrate(self) -> Tuple[float, float, float]:
+        """ Bytes per reddit, comment and author, measured on the files of earlier runs (defaults otherwise) """
+        reddit_bytes, comment_bytes, author_bytes = REDDIT_BYTES, COMMENT_BYTES, AUTHOR_BYTES
+        reddits, size = self._read_jsons(self.download_params.output_reddits_folder)
+        num_comments = sum(map(lambda r: r.get("num_comments", 0), reddits))
+        if len(reddits) > 0:
+            # Size split between the reddits and the comments in the default proportion
+            unit = size / (len(reddits) * REDDIT_BYTES + num_comments * COMMENT_BYTES)
+            reddit_bytes, comment_bytes = unit * REDDIT_BYTES, unit * COMMENT_BYTES
+        authors, size = self._read_jsons(self.download_params.output_authors_folder)
+        if len(authors) > 0:
+            author_bytes = size / len(authors)
+        return reddit_bytes, comment_bytes, author_bytes
+
+    @staticmethod
+    def _read_jsons(folder: str, max_files: int = 10) -> Tuple[List[Dict[str, Any]], int]:
+        """ Items and total size of the most recent JSON files of the folder """
+        if not os.path.exists(folder):
+            return list([]), 0
+        items, size = list([]), 0
+        for file_name in sorted(os.listdir(folder), reverse=True)[:max_files]:
+            file_path = os.path.join(folder, file_name)
+            with open(file_path, encoding="utf-8") as f:
+                items.extend(json.load(f))
+            size += os.path.getsize(file_path)
+        return items, size
@@ -0,0 +1,175 @@
+import os
+import sys
+import glob
+import pstats
+import shutil
+import weakref
+import cProfile
+import threading
+import contextlib
+import multiprocessing.util
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# cProfile follows the thread enabling it only up to Python 3.11; from 3.12 on it is built on sys.monitoring,
+# which sees every thread of the process and takes one enabled profiler at a time (another one raises ValueError)
+IS_PROFILE_PER_THREAD = sys.version_info < (3, 12)
+# Profilers of the process, the profiles a forked process inherits enabled are disabled in it
+_PROFILERS = weakref.WeakSet()
+
+
+class RunProfiler:
+    """
+    Profiler of a whole run: every stage, thread and (forked) worker process.
+
+    Functions wrapped by ``profiled`` and blocks run in ``stage`` are profiled with cProfile (one
+    profile per thread up to Python 3.11, one per process enabled while any of its threads is in a
+    stage from 3.12 on) and sampled every ``interval`` seconds by a sampler thread of each process,
+    which records the stacks of the threads being in a profiled stage, so the samples are attributed
+    to the stages by thread. A worker process forked in the middle of a stage disables the profile it
+    inherits enabled. Each worker process dumps its stats and stacks when it exits; ``merge`` merges
+    them with the ones of the main process into one pstats file and one collapsed stacks file (one
+    ``stage;frame;frame count`` line per stack, as read by flamegraph tools), rooted by the stages.
+    """
+
+    def __init__(self, output_file_prefix: str, interval: float = 0.005) -> None:
+        self.output_file_prefix = output_file_prefix
+        self.interval = interval
+        self.parts_folder = f"{output_file_prefix}_parts"
+        os.makedirs(self.parts_folder, exist_ok=True)
+
+        self._pid: int | None = None
+        self._main_pid = os.getpid()
+        self._ensure_process()
+        _PROFILERS.add(self)
+
+    def profiled(self, fn: Callable[..., Any], stage: str) -> Callable[..., Any]:
+        """ The function, profiled as part of the stage wherever it runs """
+        return _Profiled(self, fn, stage)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """ Profiles the block as (a part of) the stage """
+        self._ensure_process()
+        ident = threading.get_ident()
+        with self._lock:
+            stages = self._stages.setdefault(ident, list([]))
+            stages.append(name)
+            key = ident if IS_PROFILE_PER_THREAD else None
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = cProfile.Profile()
+            if len(stages) == 1:
+                self._num_active += 1
+                # Enabled by the first thread entering a stage, disabled by the last one leaving
+                if not IS_PROFILE_PER_THREAD and self._num_active == 1:
+                    profile.enable()
+        # Enabled by the outermost stage of the thread only
+        if IS_PROFILE_PER_THREAD and len(stages) == 1:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if IS_PROFILE_PER_THREAD and len(stages) == 1:
+                profile.disable()
+            with self._lock:
+                stages.pop()
+                if len(stages) == 0:
+                    self._num_active -= 1
+                    if not IS_PROFILE_PER_THREAD and self._num_active == 0:
+                        profile.disable()
+
+    def merge(self) -> Tuple[str, str]:
+        """ Merges the stats and stacks of all the processes, returns the pstats and collapsed stacks files """
+        self._dump()
+        stats_files = sorted(glob.glob(os.path.join(self.parts_folder, "*.prof")))
+        stats_file, stacks_file = f"{self.output_file_prefix}.pstats", f"{self.output_file_prefix}.folded"
+        if len(stats_files) > 0:
+            pstats.Stats(*stats_files).dump_stats(stats_file)
+
+        stacks: Counter = Counter()
+        for folded_file in glob.glob(os.path.join(self.parts_folder, "*.folded")):
+            with open(folded_file, encoding="utf-8") as f:
+                for line in f:
+                    stack, count = line.rstrip("\n").rsplit(" ", 1)
+                    stacks[stack] += int(count)
+        with open(stacks_file, "w", encoding="utf-8") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        shutil.rmtree(self.parts_folder, ignore_errors=True)
+        return stats_file, stacks_file
+
+    def _ensure_process(self) -> None:
+        """ Fresh state (and sampler) for a process forked with the profiler """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        # Lock of the parent might have been held by one of its threads at fork
+        self._lock = threading.Lock()
+        # By thread (by None for the one of the process from Python 3.12 on)
+        self._profiles: Dict[int | None, cProfile.Profile] = {}
+        self._num_active = 0
+        self._stages: Dict[int, List[str]] = {}
+        self._stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._sampler.start()
+        if self._pid != self._main_pid:
+            # Run by the worker process when it exits
+            multiprocessing.util.Finalize(None, self._dump, exitpriority=10)
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                stages = dict(map(lambda kv: (kv[0], kv[1][-1]), filter(lambda kv: len(kv[1]) > 0, self._stages.items())))
+            frames = sys._current_frames()
+            for ident, stage in stages.items():
+                frame = frames.get(ident)
+                stack = list([])
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self._stacks[";".join([stage] + stack[::-1])] += 1
+
+    def _dump(self) -> None:
+        """ Dumps the stats and stacks of the process into the parts folder """
+        self._stopped.set()
+        self._sampler.join()
+        with self._lock:
+            # Never enabled ones (eg. of a thread forked in the middle of its stage) have no stats
+            profiles = list(filter(lambda p: len(p.getstats()) > 0, self._profiles.values()))
+        if len(profiles) > 0:
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(self.parts_folder, f"{os.getpid()}.prof"))
+        with open(os.path.join(self.parts_folder, f"{os.getpid()}.folded"), "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.items():
+                f.write(f"{stack} {count}\n")
+
+
+def _reset_profiles() -> None:
+    """
+    Disables the profiles a forked process inherits enabled (of the stages running at the fork), from
+    Python 3.12 on the inherited one would refuse every profile the forked process enables
+    """
+    for profiler in list(_PROFILERS):
+        for profile in list(profiler._profiles.values()):
+            profile.disable()
+
+
+os.register_at_fork(after_in_child=_reset_profiles)
+
+
+class _Profiled:
+    """ Function profiled as part of a stage (a class, so it can be sent to worker processes) """
+
+    def __init__(self, profiler: RunProfiler, fn: Callable[..., Any], stage: str) -> None:
+        self.profiler = profiler
+        self.fn = fn
+        self.stage = stage
+
+    def __call__(self, *args, **kwargs) -> Any:
+        with self.profiler.stage(self.stage):
+            return self.fn(*args, **kwargs)
@@ -0,0 +1,131 @@
+import time
+import logging
+import datetime as dt
+import threading
+import multiprocessing
+from typing import Any, Callable, Dict, List
+
+# Counters of a stage: expected, done and failed items
+_STAGE_COUNTERS = 3
+
+
+class ProgressTracker:
+    """
+    Central progress of a run: items expected, done and failed per stage, and requests, request errors
+    and bytes received in total.
+
+    The stages report their items in the calling process. Requests are counted by the ``on_response``
+    hook of the requests session, also in the worker processes (forked or spawned with the session),
+    since the counters live in shared memory; a pickled tracker takes the counters only. A reporter thread prints (and logs) one combined line every
+    ``interval`` seconds: the rates since the previous line and an ETA per stage. The expected items
+    of a stage may grow as the run goes (eg. authors of the downloaded reddits), so is its ETA.
+    """
+
+    def __init__(self, stages: List[str], logger: logging.Logger, interval: float = 10.,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.stages = stages
+        self.logger = logger
+        self.interval = interval
+        self.clock = clock
+
+        self._lock = multiprocessing.Lock()
+        self._counters = multiprocessing.RawArray("d", _STAGE_COUNTERS * len(stages) + 3)
+        self._last: Dict[str, Any] | None = None
+        self._stopped = threading.Event()
+        self._reporter: threading.Thread | None = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sent to the spawned worker processes with the session hooks, the reporting stays in this process
+        return dict(filter(lambda kv: kv[0] not in ("_last", "_stopped", "_reporter"), self.__dict__.items()))
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._last = None
+        self._stopped = threading.Event()
+        self._reporter = None
+
+    def expect(self, stage: str, num_items: int = 1) -> None:
+        """ Registers items the stage is going to process """
+        i = _STAGE_COUNTERS * self.stages.index(stage)
+        with self._lock:
+            self._counters[i] += num_items
+
+    def done(self, stage: str, is_failed: bool = False) -> None:
+        """ Registers an item the stage has processed (successfully or not) """
+        i = _STAGE_COUNTERS * self.stages.index(stage)
+        with self._lock:
+            self._counters[i + 1] += 1
+            if is_failed:
+                self._counters[i + 2] += 1
+
+    def on_response(self, response, *args, **kwargs) -> None:
+        """ Response hook of the requests session (``session.hooks["response"]``) """
+        i = _STAGE_COUNTERS * len(self.stages)
+        # Streamed content is left for the caller to consume
+        size = int(response.headers.get("Content-Length", 0)) if kwargs.get("stream") else len(response.content or b"")
+        with self._lock:
+            self._counters[i] += 1
+            if response.status_code >= 400:
+                self._counters[i + 1] += 1
+            self._counters[i + 2] += size
+
+    def snapshot(self) -> Dict[str, Any]:
+        """ Current counters with their rates (per second, since the previous snapshot) """
+        with self._lock:
+            counters = list(self._counters)
+        now = self.clock()
+        i = _STAGE_COUNTERS * len(self.stages)
+        snapshot = {"time": now, "requests": counters[i], "request_errors": counters[i + 1], "bytes": counters[i + 2],
+                    "stages": dict(map(lambda s: (s[1], {"expected": counters[_STAGE_COUNTERS * s[0]],
+                                                         "done": counters[_STAGE_COUNTERS * s[0] + 1],
+                                                         "failed": counters[_STAGE_COUNTERS * s[0] + 2]}),
+                                       enumerate(self.stages)))}
+
+        last = self._last
+        elapsed = now - last["time"] if last is not None and now > last["time"] else None
+        snapshot["requests_rate"] = (snapshot["requests"] - last["requests"]) / elapsed if elapsed else 0.
+        snapshot["bytes_rate"] = (snapshot["bytes"] - last["bytes"]) / elapsed if elapsed else 0.
+        for stage, counts in snapshot["stages"].items():
+            counts["rate"] = (counts["done"] - last["stages"][stage]["done"]) / elapsed if elapsed else 0.
+            remaining = counts["expected"] - counts["done"]
+            counts["eta"] = 0. if remaining <= 0 else remaining / counts["rate"] if counts["rate"] > 0 else None
+        self._last = snapshot
+        return snapshot
+
+    def format(self, snapshot: Dict[str, Any]) -> str:
+        """ One line view of the snapshot """
+        parts = list([])
+        for stage, counts in snapshot["stages"].items():
+            eta = "?" if counts["eta"] is None else dt.timedelta(seconds=round(counts["eta"]))
+            parts.append(f"{stage} {counts['done']:.0f}/{counts['expected']:.0f} ({counts['rate']:.1f}/s, "
+                         f"failed: {counts['failed']:.0f}, ETA: {eta})")
+        parts.append(f"requests {snapshot['requests']:.0f} ({snapshot['requests_rate']:.1f}/s, "
+                     f"errors: {snapshot['request_errors']:.0f}, {snapshot['bytes_rate'] / 1024:.1f} KB/s)")
+        return "; ".join(parts)
+
+    def report(self) -> str:
+        """ Prints and logs the current progress line """
+        line = f"Progress: {self.format(self.snapshot())}."
+        # One write, so the line does not interleave with the prints of the other threads
+        print(f"{line}\n", end="", flush=True)
+        self.logger.info(line)
+        return line
+
+    def start(self) -> None:
+        """ Starts reporting every ``interval`` seconds """
+        self.snapshot()
+        self._stopped.clear()
+        self._reporter = threading.Thread(target=self._report_periodically, name="progress", daemon=True)
+        self._reporter.start()
+
+    def stop(self) -> None:
+        """ Stops reporting, reporting the final progress """
+        if self._reporter is not None:
+            self._stopped.set()
+            self._reporter.join()
+            self._reporter = None
+        self.report()
+
+    def _report_periodically(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.report()
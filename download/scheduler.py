@@ -0,0 +1,77 @@
+import time
+import heapq
+import random
+import itertools
+from typing import Callable, Dict, List, Tuple
+
+
+class PollScheduler:
+    """
+    Adaptive polling schedule of the phrases downloaded by the daemon.
+
+    Every phrase is polled at its own cadence: its poll interval halves after a poll finding new
+    reddits (down to ``min_interval``) and doubles after a quiet or failed one (up to ``max_interval``),
+    so active phrases are polled often and quiet ones are backed off. Every delay is jittered by
+    up to ``jitter`` (fraction of the delay), so the polls of the phrases spread out instead of
+    piling up. Times are in seconds of the (injectable) monotonic clock.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, jitter: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic, rng: random.Random | None = None) -> None:
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(f"Poll intervals should be positive and ordered, got {min_interval} and {max_interval}.")
+        if not 0 <= jitter < 1:
+            raise ValueError(f"Poll jitter should be a fraction in [0, 1), got {jitter}.")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng or random.Random()
+
+        self._intervals: Dict[str, float] = {}
+        self._due: List[Tuple[float, int, str]] = list([])
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        """ Number of scheduled (ie. not being polled) phrases """
+        return len(self._due)
+
+    def interval(self, phrase: str) -> float:
+        """ Current poll interval of the phrase """
+        return self._intervals[phrase]
+
+    def add(self, phrase: str) -> None:
+        """ Schedules the first poll of the phrase, the first polls of all phrases are spread over the jitter """
+        self._intervals[phrase] = self.min_interval
+        self._push(phrase, self.rng.uniform(0, self.jitter * self.min_interval))
+
+    def report(self, phrase: str, num_new: int, is_failed: bool = False) -> float:
+        """ Adapts the poll interval of the phrase to the poll result and schedules its next poll """
+        interval = self._intervals[phrase] / 2 if num_new > 0 and not is_failed else self._intervals[phrase] * 2
+        self._intervals[phrase] = min(self.max_interval, max(self.min_interval, interval))
+        delay = self._intervals[phrase] * (1 + self.rng.uniform(-self.jitter, self.jitter))
+        self._push(phrase, delay)
+        return delay
+
+    def defer(self, phrase: str, delay: float) -> float:
+        """ Schedules the next poll after the delay (eg. when no interval is complete yet), keeps the poll interval """
+        delay = max(0., delay) + self.rng.uniform(0, self.jitter * self.min_interval)
+        self._push(phrase, delay)
+        return delay
+
+    def pop_due(self) -> List[str]:
+        """ Returns (and unschedules) the phrases due for a poll, the most overdue first """
+        now = self.clock()
+        phrases = list([])
+        while len(self._due) > 0 and self._due[0][0] <= now:
+            phrases.append(heapq.heappop(self._due)[2])
+        return phrases
+
+    def wait_time(self) -> float | None:
+        """ Seconds until the next poll is due, None if no phrase is scheduled """
+        if len(self._due) == 0:
+            return None
+        return max(0., self._due[0][0] - self.clock())
+
+    def _push(self, phrase: str, delay: float) -> None:
+        heapq.heappush(self._due, (self.clock() + delay, next(self._order), phrase))
@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, Tuple
+
+
+class SharedResults:
+    """
+    Reddits and authors shared by the pipelines of a batch run (several phrases).
+
+    The first pipeline claiming a reddit (by permalink) or an author (by name) downloads it and
+    resolves it, the other ones get its future and wait for the result instead of downloading it
+    again. Failed results are not kept (a later claim downloads them again) and at most
+    ``max_items`` resolved results of each kind are kept, the least recently claimed are dropped first.
+    """
+
+    KINDS = ("reddit", "author")
+
+    def __init__(self, max_items: int = 10000) -> None:
+        self.max_items = max_items
+        self.stats = {"hits": 0, "misses": 0}
+
+        self._lock = threading.Lock()
+        self._futures: Dict[str, OrderedDict[str, Future]] = dict(map(lambda k: (k, OrderedDict()), self.KINDS))
+
+    def claim(self, kind: str, key: str) -> Tuple[Future, bool]:
+        """ Returns the result future and whether the caller owns (ie. has to download and resolve) it """
+        with self._lock:
+            futures = self._futures[kind]
+            future = futures.get(key)
+            if future is not None:
+                futures.move_to_end(key)
+                self.stats["hits"] += 1
+                return future, False
+
+            future = Future()
+            futures[key] = future
+            self.stats["misses"] += 1
+            self._evict(futures)
+            return future, True
+
+    def resolve(self, kind: str, key: str, result: Any, is_failed: bool = False) -> None:
+        """ Sets the result of an owned claim (no-op for already resolved ones) """
+        with self._lock:
+            future = self._futures[kind].get(key)
+            if future is None or future.done():
+                return
+            if is_failed:
+                del self._futures[kind][key]
+        future.set_result(result)
+
+    def release(self, claims: Iterable[Tuple[str, str]]) -> None:
+        """ Resolves the unresolved claims as failed, so nobody waits for a pipeline that stopped """
+        for kind, key in claims:
+            self.resolve(kind, key, None, is_failed=True)
+
+    def _evict(self, futures: OrderedDict[str, Future]) -> None:
+        for key in list(futures.keys()):
+            if len(futures) <= self.max_items:
+                break
+            if futures[key].done():
+                del futures[key]
@@ -0,0 +1,253 @@
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from multiprocessing.queues import Queue
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Set, Tuple
+
+from download.metrics import MetricsCollector
+from yars.concurrency import reclaim_slots
+
+_END = object()
+
+# Supervisors of concurrent stages start processes one at a time, otherwise a process forked by one of
+# them inherits the pipes (eg. sentinels) another one has not closed yet, and joins wait for it too
+_START_LOCK = threading.Lock()
+
+
+def _supervised_worker(fn: Callable[[Any], Any], tasks: Queue, num: int, messages: Connection, stage: str,
+                       batch_size: int, logger: logging.Logger, current: Any, started_at: Any) -> None:
+    """
+    Applies the function to the items batches dispatched to the worker, streaming back results batches.
+    Asks for the next batch when starting one (so one batch is always prefetched) and publishes the
+    current item (batch id, index) and its start time for the supervisor. The progress is reported
+    by the caller of the supervisor (as the results arrive).
+    """
+    logger.info(f"P{num + 1}: Starting downloading {stage}.")
+
+    count = 0
+    messages.send(("ready", num, None))
+    for batch_id, items in iter(tasks.get, None):
+        messages.send(("ready", num, None))
+        results = list([])
+        for index, item in enumerate(items):
+            current[2 * num], current[2 * num + 1] = batch_id, index
+            started_at[num] = time.monotonic()
+            results.append((index, fn(item)))
+            started_at[num] = 0.
+            count += 1
+
+            if len(results) >= batch_size:
+                messages.send(("results", num, (batch_id, results)))
+                results = list([])
+        if len(results) > 0:
+            messages.send(("results", num, (batch_id, results)))
+
+    logger.info(f"P{num + 1}: Finished downloading {stage}. Downloaded: {count}.")
+
+
+class WorkerSupervisor:
+    """
+    Runs items on supervised worker processes.
+
+    The supervisor dispatches batches of items to the workers as they ask for them and tracks the
+    batches each worker holds. Every worker has its own tasks queue and messages pipe, so a killed
+    worker cannot leave a shared queue locked. A worker that dies (eg. segfault or OOM kill) or
+    spends more than ``task_timeout`` seconds on one item is killed, joined and replaced, and its
+    unfinished items are requeued for the other workers. The item a worker died (or timed out) on is given up with
+    a None result after ``max_attempts`` attempts, so one poisonous item cannot kill all workers.
+    The concurrency limiter slots a killed worker held are reclaimed, its requests never release them.
+    The number of alive workers and the restarts are reported to the metrics collector (if given).
+    """
+
+    def __init__(self, fn: Callable[[Any], Any], concurrency: int, stage: str, batch_size: int = 1,
+                 task_timeout: float | None = None, max_attempts: int = 3, poll_interval: float = 0.1,
+                 logger: logging.Logger | None = None, metrics: MetricsCollector | None = None) -> None:
+        self.fn = fn
+        self.concurrency = concurrency
+        self.stage = stage
+        self.batch_size = batch_size
+        self.task_timeout = task_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.metrics = metrics
+        self.stats = {"restarts": 0, "timeouts": 0, "requeued": 0, "given_up": 0}
+
+        self._current = multiprocessing.RawArray("q", 2 * concurrency)
+        self._started_at = multiprocessing.RawArray("d", concurrency)
+        self._processes: List[multiprocessing.Process | None] = list(None for _ in range(concurrency))
+        self._tasks: List[Queue | None] = list(None for _ in range(concurrency))
+        self._messages: List[Connection | None] = list(None for _ in range(concurrency))
+
+        # Batch id -> (worker, items with its attempts, indices of unfinished items)
+        self._batches: Dict[int, Tuple[int, List[Tuple[Any, int]], Set[int]]] = {}
+        self._assigned: List[Deque[int]] = list(deque() for _ in range(concurrency))
+        self._wants: List[int] = list(0 for _ in range(concurrency))
+        self._retry: Deque[Tuple[Any, int]] = deque()
+        self._batch_ids = itertools.count()
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Any]]:
+        """ Yields (item, result) pairs as the items complete (None results for the given up ones) """
+        # Bounded batches queue fed by a thread, so items can be produced lazily
+        batches: queue.Queue = queue.Queue(maxsize=2 * self.concurrency)
+        feeder = threading.Thread(target=self._feed, args=(items, batches), daemon=True)
+        feeder.start()
+        for num in range(self.concurrency):
+            self._start(num)
+
+        is_fed = False
+        try:
+            while not (is_fed and len(self._retry) == 0 and len(self._batches) == 0):
+                is_fed = self._dispatch(batches) or is_fed
+                wait(self._messages + list(map(lambda p: p.sentinel, self._processes)), timeout=self.poll_interval)
+                for num in range(self.concurrency):
+                    yield from self._receive(num)
+                yield from self._check_workers()
+        finally:
+            self._stop()
+            if self.metrics is not None:
+                self.metrics.remove_gauge("download_workers_alive", stage=self.stage)
+        feeder.join()
+
+    def _feed(self, items: Iterable[Any], batches: queue.Queue) -> None:
+        batch = list([])
+        for item in items:
+            batch.append((item, 0))
+            if len(batch) >= self.batch_size:
+                batches.put(batch)
+                batch = list([])
+        if len(batch) > 0:
+            batches.put(batch)
+        batches.put(_END)
+
+    def _dispatch(self, batches: queue.Queue) -> bool:
+        """ Sends batches (requeued items first) to the workers asking for them, returns whether all items are fed """
+        is_fed = False
+        for num in range(self.concurrency):
+            while self._wants[num] > 0:
+                if len(self._retry) > 0:
+                    batch = list(map(lambda _: self._retry.popleft(), range(min(self.batch_size, len(self._retry)))))
+                else:
+                    try:
+                        batch = batches.get_nowait()
+                    except queue.Empty:
+                        return is_fed
+                    if batch is _END:
+                        # Keep the end marker for the following dispatches
+                        batches.put(_END)
+                        return True
+                batch_id = next(self._batch_ids)
+                self._batches[batch_id] = (num, batch, set(range(len(batch))))
+                self._assigned[num].append(batch_id)
+                self._wants[num] -= 1
+                self._tasks[num].put((batch_id, list(map(lambda b: b[0], batch))))
+        return is_fed
+
+    def _receive(self, num: int) -> Iterator[Tuple[Any, Any]]:
+        """ Handles the messages the worker sent so far """
+        try:
+            while self._messages[num].poll():
+                kind, _, payload = self._messages[num].recv()
+                if kind == "ready":
+                    self._wants[num] += 1
+                elif kind == "results":
+                    yield from self._on_results(*payload)
+        except (EOFError, OSError):
+            # Worker is gone, handled by the liveness check
+            pass
+
+    def _on_results(self, batch_id: int, results: List[Tuple[int, Any]]) -> Iterator[Tuple[Any, Any]]:
+        if batch_id not in self._batches:
+            # Late results of an item requeued after its worker was killed
+            return
+        num, batch, unfinished = self._batches[batch_id]
+        for index, result in results:
+            if index in unfinished:
+                unfinished.discard(index)
+                yield batch[index][0], result
+        if len(unfinished) == 0:
+            del self._batches[batch_id]
+            self._assigned[num].remove(batch_id)
+
+    def _check_workers(self) -> Iterator[Tuple[Any, Any]]:
+        now = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.set_gauge("download_workers_alive", sum(map(lambda p: p.is_alive(), self._processes)), stage=self.stage)
+        for num, process in enumerate(self._processes):
+            started_at = self._started_at[num]
+            if not process.is_alive():
+                reason = f"died (exit code: {process.exitcode})"
+            elif self.task_timeout is not None and started_at > 0 and now - started_at > self.task_timeout:
+                reason = f"timed out after {self.task_timeout}s"
+                self.stats["timeouts"] += 1
+                process.kill()
+            else:
+                continue
+            process.join()
+            self._reclaim(num, process.pid)
+            # Results sent before dying are as good
+            yield from self._receive(num)
+            print(f"P{num + 1}: Worker {reason}, restarting it.")
+            self.logger.warning(f"P{num + 1}: Worker {reason}, restarting it.")
+            yield from self._requeue(num, (self._current[2 * num], self._current[2 * num + 1]) if started_at > 0 else None)
+            self.stats["restarts"] += 1
+            if self.metrics is not None:
+                self.metrics.inc("download_worker_restarts_total", stage=self.stage)
+            self._start(num)
+
+    def _reclaim(self, num: int, pid: int) -> None:
+        """ Frees the concurrency limiter slots the killed worker held (in the middle of its requests) """
+        num_slots = reclaim_slots(pid)
+        if num_slots > 0:
+            self.logger.warning(f"P{num + 1}: Reclaimed {num_slots} concurrency slots of the worker.")
+
+    def _requeue(self, num: int, culprit: Tuple[int, int] | None) -> Iterator[Tuple[Any, Any]]:
+        """ Requeues the unfinished items of the worker, gives up the culprit item after too many attempts """
+        for batch_id in self._assigned[num]:
+            _, batch, unfinished = self._batches.pop(batch_id)
+            for index in sorted(unfinished):
+                item, attempts = batch[index]
+                if culprit == (batch_id, index):
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        self.stats["given_up"] += 1
+                        self.logger.warning(f"P{num + 1}: Gave up {self.stage} item {item} after {attempts} attempts.")
+                        yield item, None
+                        continue
+                self.stats["requeued"] += 1
+                self._retry.append((item, attempts))
+        self._assigned[num].clear()
+        self._wants[num] = 0
+
+    def _start(self, num: int) -> None:
+        # Fresh tasks queue and messages pipe, the batches left in the old queue are requeued
+        if self._messages[num] is not None:
+            self._messages[num].close()
+        self._tasks[num] = multiprocessing.Queue()
+        self._messages[num], messages = multiprocessing.Pipe(duplex=False)
+        self._started_at[num] = 0.
+        self._processes[num] = multiprocessing.Process(
+            target=_supervised_worker, name=f"{self.stage}-P{num + 1}",
+            args=(self.fn, self._tasks[num], num, messages, self.stage, self.batch_size, self.logger,
+                  self._current, self._started_at))
+        with _START_LOCK:
+            self._processes[num].start()
+            # Only the worker writes, so its death closes the pipe
+            messages.close()
+
+    def _stop(self) -> None:
+        for num, process in enumerate(self._processes):
+            if process.is_alive():
+                self._tasks[num].put(None)
+        for num, process in enumerate(self._processes):
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+                process.join()
+                self._reclaim(num, process.pid)
+            self._messages[num].close()
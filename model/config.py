@@ -8,14 +8,44 @@ class AppConfig(BaseModel):
     interval: str
     start_date: str
     website_url: str
+    api_url: str
+    record_cassette: str | None
+    replay_cassette: str | None
+    replay_latency_scale: float
+    faults: str | None
+    retries: int
+    backoff_factor: float
     reddits_folder_pattern: str
     authors_folder_pattern: str
+    journal_folder_pattern: str
+    profile_folder_pattern: str
+    ledger_file_pattern: str
     reddits_file_pattern: str
     authors_file_pattern: str
     is_no_authors_download: bool
     is_today_included: bool
+    is_no_journal_used: bool
     is_no_multiprocessing_used: bool
     num_processes: int
+    executor: str
+    details_concurrency: int | None
+    authors_concurrency: int | None
+    batch_size: int
+    task_timeout: float | None
+    is_curated_user_agents_used: bool
+    rate_limit: float | None
+    is_auto_concurrency_used: bool
+    progress_interval: float
+    metrics_port: int | None
+    is_profiling_used: bool
+    is_memory_tracking_used: bool
+    log_format: str
+    log_rate_limit: float | None
+    phrases_concurrency: int
+    min_poll_interval: float
+    max_poll_interval: float
+    poll_jitter: float
+    lease_seconds: float
 
     class ConfigDict:
         frozen = True
@@ -1,5 +1,6 @@
 import argparse
 import datetime as dt
+from typing import Any, Dict
 from pydantic import BaseModel
 
 from model import AppConfig
@@ -12,16 +13,48 @@ class DownloadParams(BaseModel):
     default_start_date: dt.datetime
     output_reddits_folder: str
     output_authors_folder: str
+    output_journal_folder: str
+    output_profile_folder: str
     output_reddits_file_pattern: str
     output_authors_file_pattern: str
     is_author_downloaded: bool
     is_date_to_previous_day: bool
+    is_journal_used: bool
     is_multiprocessing_used: bool
     num_processes: int
+    executor: str
+    details_concurrency: int
+    authors_concurrency: int
+    batch_size: int
+    task_timeout: float | None
+    is_curated_user_agents_used: bool
+    rate_limit: float | None
+    is_auto_concurrency_used: bool
+    progress_interval: float
+    metrics_port: int | None
+    is_profiling_used: bool
+    is_memory_tracking_used: bool
+    api_url: str
+    record_cassette: str | None
+    replay_cassette: str | None
+    replay_latency_scale: float
+    faults: str | None
+    retries: int
+    backoff_factor: float
 
     class ConfigDict:
         frozen = True
 
+    def journal_fingerprint(self) -> Dict[str, Any]:
+        """ Parameters a resumed run has to share with the interrupted one """
+        return {
+            "phrase": self.phrase,
+            "limit": self.limit,
+            "date_interval": self.date_interval,
+            "default_start_date": self.default_start_date.isoformat(),
+            "is_author_downloaded": self.is_author_downloaded,
+        }
+
     @staticmethod
     def from_argparse_namespace_and_config(args: argparse.Namespace, config: AppConfig) -> 'DownloadParams':
         return DownloadParams(
@@ -31,10 +64,32 @@ class DownloadParams(BaseModel):
             default_start_date=dt.datetime.strptime(args.start_date, "%Y-%m-%d"),
             output_reddits_folder=config.reddits_folder_pattern.format(phrase=args.phrase),
             output_authors_folder=config.authors_folder_pattern.format(phrase=args.phrase),
+            output_journal_folder=config.journal_folder_pattern.format(phrase=args.phrase),
+            output_profile_folder=config.profile_folder_pattern.format(phrase=args.phrase),
             output_reddits_file_pattern=config.reddits_file_pattern.format(phrase=args.phrase),
             output_authors_file_pattern=config.authors_file_pattern.format(phrase=args.phrase),
             is_author_downloaded=not args.no_authors_download,
             is_date_to_previous_day = not args.include_today,
+            is_journal_used=not args.no_journal,
             is_multiprocessing_used = not args.no_multiprocessing,
-            num_processes = 1 if args.no_multiprocessing else args.num_processes
+            num_processes = 1 if args.no_multiprocessing else args.num_processes,
+            executor=args.executor,
+            details_concurrency=1 if args.no_multiprocessing else args.details_concurrency or args.num_processes,
+            authors_concurrency=1 if args.no_multiprocessing else args.authors_concurrency or args.num_processes,
+            batch_size=args.batch_size,
+            task_timeout=args.task_timeout,
+            is_curated_user_agents_used=args.curated_user_agents,
+            rate_limit=args.rate_limit,
+            is_auto_concurrency_used=args.auto_concurrency,
+            progress_interval=args.progress_interval,
+            metrics_port=args.metrics_port,
+            is_profiling_used=args.profile,
+            is_memory_tracking_used=args.track_memory,
+            api_url=args.api_url,
+            record_cassette=args.record_cassette,
+            replay_cassette=args.replay_cassette,
+            replay_latency_scale=args.replay_latency_scale,
+            faults=args.faults,
+            retries=args.retries,
+            backoff_factor=args.backoff_factor
         )
\ No newline at end of file
@@ -14,11 +14,18 @@ class LoadParams(BaseModel):
         frozen = True
 
     @staticmethod
-    def from_download_params(download_params: DownloadParams):
+    def from_download_params(download_params: DownloadParams, is_last_interval_complete: bool = False):
+        """ Load params of the missing periods, ending with the last complete interval if requested (daemon polls) """
         recent_date = util.get_recent_file_date(download_params.output_reddits_folder)
+        now = dt.datetime.now()
+        if is_last_interval_complete:
+            date_to = next(util.date_range(now, now, interval=download_params.date_interval))[0].replace(microsecond=0) \
+                - dt.timedelta(seconds=1)
+        else:
+            date_to = now if not download_params.is_date_to_previous_day \
+                else now.replace(hour=0, minute=0, second=0, microsecond=0) - dt.timedelta(seconds=1)
         return LoadParams(
             load_type=EloadType.HISTORICAL if recent_date is None else EloadType.INCREMENTAL,
             date_from=download_params.default_start_date if recent_date is None else recent_date,
-            date_to=dt.datetime.now() if not download_params.is_date_to_previous_day \
-                else dt.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - dt.timedelta(seconds=1)
+            date_to=date_to
         )
@@ -0,0 +1,117 @@
+import argparse
+import logging
+import datetime as dt
+from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+
+import util
+from download import SharedResults
+from model import AppConfig, DownloadParams
+from run_download_reddits import add_download_arguments, add_plan_arguments, create_downloader, download, plan, \
+    start_metrics
+
+
+def parse_args(defaults: AppConfig) -> argparse.Namespace:
+    """ Parses command line arguments """
+    parser = argparse.ArgumentParser(description="Batch reddits downloader Python 3.11 application.")
+
+    parser.add_argument("phrases_file", type=str,
+                        help="file with phrases to search for reddits, one per line (blank lines and '#' comments are skipped)")
+    parser.add_argument("--phrases_concurrency", type=int, required=False, default=defaults.phrases_concurrency,
+                        help=f"number of phrases downloaded at once, default: {defaults.phrases_concurrency}")
+    add_download_arguments(parser, defaults)
+    add_plan_arguments(parser)
+
+    return parser.parse_args()
+
+
+def show_plans_summary(phrases: List[str], plans: List[Dict[str, Any] | None], logger: logging.Logger) -> None:
+    """ Shows the estimated cost of downloading every phrase and of all of them """
+    print("\nPlan summary:")
+    logger.info("Plan summary:")
+    for phrase, download_plan in zip(phrases, plans):
+        summary = "skipped" if download_plan is None \
+            else f"reddits: {download_plan['reddits']}, requests: up to {download_plan['requests']}, " \
+                 f"size: up to {util.format_bytes(download_plan['bytes'][1])}, " \
+                 f"time: up to {dt.timedelta(seconds=round(download_plan['wall_time']))}"
+        print(f"{phrase}: {summary}")
+        logger.info(f"{phrase}: {summary}")
+
+    plans = list(filter(lambda p: p is not None, plans))
+    # Phrases share the rate limit and the results of the common reddits and authors, hence the upper bounds
+    summary = f"reddits: {sum(map(lambda p: p['reddits'], plans))}, " \
+              f"requests: up to {sum(map(lambda p: p['requests'], plans))}, " \
+              f"size: up to {util.format_bytes(sum(map(lambda p: p['bytes'][1], plans)))}, " \
+              f"time (phrases one by one): up to {dt.timedelta(seconds=round(sum(map(lambda p: p['wall_time'], plans))))}"
+    print(f"Total: {summary}")
+    logger.info(f"Total: {summary}")
+
+
+def main():
+    config = AppConfig.from_json()
+    args = parse_args(config)
+    util.configure_logging(args.log_format, rate_limit=args.log_rate_limit)
+    phrases = util.read_phrases(args.phrases_file)
+
+    timestamp = dt.datetime.now().isoformat()
+    logger = util.setup_logger(name="download_batch", log_file=f"logs/download/batch/download_batch_{timestamp}.log")
+    yars_logger = util.setup_logger(name="yars_batch", log_file=f"logs/yars/batch/yars_batch_{timestamp}.log")
+
+    print("---- Batch reddits downloader app ----\n")
+    logger.info("---- Batch reddits downloader app ----")
+    print(f"Phrases ({len(phrases)}):", ", ".join(phrases))
+    print("Phrases concurrency:", args.phrases_concurrency, "\n")
+    logger.info(f"Phrases ({len(phrases)}): {', '.join(phrases)}")
+    logger.info(f"Phrases concurrency: {args.phrases_concurrency}")
+    if len(phrases) == 0:
+        print("No phrases to download.")
+        logger.info("No phrases to download.")
+        return
+
+    all_download_params = list(map(
+        lambda phrase: DownloadParams.from_argparse_namespace_and_config(argparse.Namespace(**vars(args), phrase=phrase), config),
+        phrases))
+
+    # One downloader (connection pool, rate limiter) and one results cache shared by all the phrases
+    downloader = create_downloader(all_download_params[0], logger=yars_logger,
+                                   num_phrases=min(args.phrases_concurrency, len(phrases)))
+    shared = SharedResults()
+    metrics = None if args.plan else start_metrics(all_download_params[0], downloader, logger=logger)
+
+    def download_phrase(download_params: DownloadParams):
+        phrase_logger = util.setup_logger(name=f"download_{download_params.phrase}",
+                                          log_file=f"logs/download/{download_params.phrase}/download_{download_params.phrase}_{timestamp}.log")
+        try:
+            if args.plan:
+                return plan(download_params, downloader, config.website_url, logger=phrase_logger, max_pages=args.plan_pages)
+            return download(download_params, downloader, config.website_url, logger=phrase_logger, shared=shared,
+                            metrics=metrics)
+        except Exception as e:
+            print(f"Phrase '{download_params.phrase}' skipped: {e}")
+            logger.warning(f"Phrase '{download_params.phrase}' skipped: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=args.phrases_concurrency) as pool:
+        all_stats = list(pool.map(download_phrase, all_download_params))
+
+    if args.plan:
+        show_plans_summary(phrases, all_stats, logger=logger)
+        print("\nDone.")
+        logger.info("Done.")
+        return
+
+    print("\nSummary:")
+    logger.info("Summary:")
+    for phrase, stats in zip(phrases, all_stats):
+        summary = "skipped" if stats is None \
+            else f"reddits: {stats['downloaded']}, failed: {stats['failed']}, authors: {stats['authors']}, reused from other phrases: {stats['shared']}"
+        print(f"{phrase}: {summary}")
+        logger.info(f"{phrase}: {summary}")
+    print(f"Reused results across phrases: {shared.stats['hits']}.")
+    logger.info(f"Reused results across phrases: {shared.stats['hits']}.")
+    print("\nDone.")
+    logger.info("Done.")
+
+
+if __name__ == "__main__":
+    main()
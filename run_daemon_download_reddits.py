@@ -0,0 +1,135 @@
+import time
+import signal
+import argparse
+import logging
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Tuple
+
+import util
+from download import MetricsCollector, PollScheduler, SharedResults
+from model import AppConfig, DownloadParams, LoadParams
+from run_download_reddits import add_download_arguments, create_downloader, create_folders, download, start_metrics
+
+
+def parse_args(defaults: AppConfig) -> argparse.Namespace:
+    """ Parses command line arguments """
+    parser = argparse.ArgumentParser(description="Reddits downloader daemon Python 3.11 application.")
+
+    parser.add_argument("phrases_file", type=str,
+                        help="file with phrases to search for reddits, one per line (blank lines and '#' comments are skipped)")
+    parser.add_argument("--phrases_concurrency", type=int, required=False, default=defaults.phrases_concurrency,
+                        help=f"number of phrases polled at once, default: {defaults.phrases_concurrency}")
+    parser.add_argument("--min_poll_interval", type=float, required=False, default=defaults.min_poll_interval,
+                        help=f"seconds between polls of the most active phrases, default: {defaults.min_poll_interval}")
+    parser.add_argument("--max_poll_interval", type=float, required=False, default=defaults.max_poll_interval,
+                        help=f"seconds between polls of the quietest phrases, default: {defaults.max_poll_interval}")
+    parser.add_argument("--poll_jitter", type=float, required=False, default=defaults.poll_jitter,
+                        help=f"random spread of the poll times (fraction of the poll interval), default: {defaults.poll_jitter}")
+    add_download_arguments(parser, defaults)
+
+    return parser.parse_args()
+
+
+def poll_phrase(download_params: DownloadParams, downloader, website_url: str, logger: logging.Logger,
+                shared: SharedResults, metrics: MetricsCollector | None = None) -> Tuple[int | None, float]:
+    """
+    Downloads the intervals of the phrase completed since its last poll, returns the number of found
+    reddits (None if no new interval is complete yet) and the seconds until the next interval completes
+    """
+    create_folders(download_params)
+    load_params = LoadParams.from_download_params(download_params, is_last_interval_complete=True)
+    next_date_from = load_params.date_from if load_params.date_from > load_params.date_to \
+        else load_params.date_to + dt.timedelta(seconds=1)
+    _, next_complete = next(util.date_range(next_date_from, next_date_from, interval=download_params.date_interval))
+    ready_delay = (next_complete - dt.datetime.now()).total_seconds()
+    if load_params.date_from > load_params.date_to:
+        return None, ready_delay
+
+    stats = download(download_params, downloader, website_url, logger=logger, shared=shared, load_params=load_params,
+                     metrics=metrics)
+    return stats["found"], ready_delay
+
+
+def main():
+    config = AppConfig.from_json()
+    args = parse_args(config)
+    util.configure_logging(args.log_format, rate_limit=args.log_rate_limit)
+    phrases = util.read_phrases(args.phrases_file)
+
+    timestamp = dt.datetime.now().isoformat()
+    logger = util.setup_logger(name="download_daemon", log_file=f"logs/download/daemon/download_daemon_{timestamp}.log")
+    yars_logger = util.setup_logger(name="yars_daemon", log_file=f"logs/yars/daemon/yars_daemon_{timestamp}.log")
+
+    print("---- Reddits downloader daemon ----\n")
+    logger.info("---- Reddits downloader daemon ----")
+    print(f"Phrases ({len(phrases)}):", ", ".join(phrases))
+    print("Phrases concurrency:", args.phrases_concurrency)
+    print(f"Poll interval: {args.min_poll_interval}s -- {args.max_poll_interval}s (jitter: {args.poll_jitter})\n")
+    logger.info(f"Phrases ({len(phrases)}): {', '.join(phrases)}")
+    logger.info(f"Phrases concurrency: {args.phrases_concurrency}")
+    logger.info(f"Poll interval: {args.min_poll_interval}s -- {args.max_poll_interval}s (jitter: {args.poll_jitter})")
+    if len(phrases) == 0:
+        print("No phrases to poll.")
+        logger.info("No phrases to poll.")
+        return
+
+    all_download_params = dict(map(
+        lambda phrase: (phrase, DownloadParams.from_argparse_namespace_and_config(argparse.Namespace(**vars(args), phrase=phrase), config)),
+        phrases))
+    phrase_loggers = dict(map(
+        lambda phrase: (phrase, util.setup_logger(name=f"download_{phrase}",
+                                                  log_file=f"logs/download/{phrase}/download_{phrase}_{timestamp}.log")),
+        phrases))
+
+    # Client (connection pool, rate limiter) and results cache stay warm between the polls
+    downloader = create_downloader(all_download_params[phrases[0]], logger=yars_logger,
+                                   num_phrases=min(args.phrases_concurrency, len(phrases)))
+    shared = SharedResults()
+    metrics = start_metrics(all_download_params[phrases[0]], downloader, logger=logger)
+    scheduler = PollScheduler(args.min_poll_interval, args.max_poll_interval, jitter=args.poll_jitter)
+    for phrase in phrases:
+        scheduler.add(phrase)
+
+    # Stop gracefully (finishing the running polls) on SIGTERM as on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    polls = {}
+    with ThreadPoolExecutor(max_workers=args.phrases_concurrency) as pool:
+        try:
+            while True:
+                for phrase in scheduler.pop_due():
+                    polls[pool.submit(poll_phrase, all_download_params[phrase], downloader, config.website_url,
+                                      phrase_loggers[phrase], shared, metrics)] = phrase
+                if len(polls) == 0:
+                    time.sleep(scheduler.wait_time())
+                    continue
+
+                done, _ = wait(polls, timeout=scheduler.wait_time(), return_when=FIRST_COMPLETED)
+                for poll in done:
+                    phrase = polls.pop(poll)
+                    if metrics is not None:
+                        metrics.inc("download_polls_total", phrase=phrase)
+                    try:
+                        num_found, ready_delay = poll.result()
+                    except Exception as e:
+                        delay = scheduler.report(phrase, 0, is_failed=True)
+                        print(f"Poll of '{phrase}' failed: {e}. Next poll in {delay:.0f}s.")
+                        logger.warning(f"Poll of '{phrase}' failed: {e}. Next poll in {delay:.0f}s.")
+                        continue
+                    if num_found is None:
+                        delay = scheduler.defer(phrase, ready_delay)
+                        logger.info(f"No new complete interval of '{phrase}'. Next poll in {delay:.0f}s.")
+                    else:
+                        delay = scheduler.report(phrase, num_found)
+                        print(f"Poll of '{phrase}' found {num_found} new reddits. Next poll in {delay:.0f}s.")
+                        logger.info(f"Poll of '{phrase}' found {num_found} new reddits. Next poll in {delay:.0f}s.")
+        except KeyboardInterrupt:
+            print(f"\nStopping, waiting for {len(polls)} running polls.")
+            logger.info(f"Stopping, waiting for {len(polls)} running polls.")
+
+    print("\nDone.")
+    logger.info("Done.")
+
+
+if __name__ == "__main__":
+    main()
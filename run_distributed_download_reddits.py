@@ -0,0 +1,150 @@
+import os
+import socket
+import argparse
+import datetime as dt
+
+import util
+import yars
+from download import EXECUTORS, LedgerCoordinator, LedgerWorker, ProgressTracker, TaskLedger, create_executor
+from model import AppConfig, DownloadParams, LoadParams
+from run_download_reddits import add_cassette_arguments, add_download_arguments, add_fault_arguments, add_log_arguments, create_downloader, create_folders, show_load_params, show_params
+
+
+def parse_args(defaults: AppConfig) -> argparse.Namespace:
+    """ Parses command line arguments """
+    parser = argparse.ArgumentParser(description="Distributed reddits downloader Python 3.11 application.")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="search reddits into the task ledger, wait for the workers and save the results")
+    coordinator_parser.add_argument("phrase", type=str, help="phrase to search for reddits")
+    coordinator_parser.add_argument("--ledger", type=str, required=False, default=None,
+                                    help=f"task ledger file (on a filesystem shared by all nodes), default: {defaults.ledger_file_pattern}")
+    coordinator_parser.add_argument("--lease_seconds", type=float, required=False, default=defaults.lease_seconds,
+                                    help=f"seconds a worker holds a claimed task before it is reclaimed, default: {defaults.lease_seconds}")
+    add_download_arguments(coordinator_parser, defaults)
+
+    worker_parser = subparsers.add_parser("worker", help="download the reddits and authors claimed from the task ledger")
+    worker_parser.add_argument("ledger", type=str, help="task ledger file (on a filesystem shared by all nodes)")
+    worker_parser.add_argument("--worker_id", type=str, required=False, default=f"{socket.gethostname()}-{os.getpid()}",
+                               help="worker identifier, default: host name and process id")
+    worker_parser.add_argument("--executor", type=str, required=False, choices=list(EXECUTORS), default=defaults.executor,
+                               help=f"concurrency backend used for downloading reddits and authors, default: {defaults.executor}")
+    worker_parser.add_argument("--concurrency", type=int, required=False, default=defaults.num_processes,
+                               help=f"number of reddits or authors downloaded concurrently, default: {defaults.num_processes}")
+    worker_parser.add_argument("--batch_size", type=int, required=False, default=defaults.batch_size,
+                               help=f"number of reddits or authors a process worker pulls from the shared queue at a time, default: {defaults.batch_size}")
+    worker_parser.add_argument("--task_timeout", type=float, required=False, default=defaults.task_timeout,
+                               help=f"seconds after which a process worker stuck on one reddit or author is replaced, default: {defaults.task_timeout}")
+    worker_parser.add_argument("--curated_user_agents", required=False, default=defaults.is_curated_user_agents_used,
+                               help=f"flag whether to pin the random user agents to a small curated subset, default: {defaults.is_curated_user_agents_used}",
+                               action="store_true")
+    worker_parser.add_argument("--rate_limit", type=float, required=False, default=defaults.rate_limit,
+                               help=f"max number of requests per second (of this worker), default: {defaults.rate_limit or 'unlimited'}")
+    worker_parser.add_argument("--auto_concurrency", required=False, default=defaults.is_auto_concurrency_used,
+                               help=f"flag whether to adapt the number of in-flight requests to the latency and 429 responses (up to the concurrency), default: {defaults.is_auto_concurrency_used}",
+                               action="store_true")
+    worker_parser.add_argument("--progress_interval", type=float, required=False, default=defaults.progress_interval,
+                               help=f"seconds between the progress reports (rates and ETA of the claimed tasks), default: {defaults.progress_interval}")
+    worker_parser.add_argument("--api_url", type=str, required=False, default=defaults.api_url,
+                               help=f"URL of the Reddit API the requests are sent to (eg. a local mock server), default: {defaults.api_url}")
+    add_cassette_arguments(worker_parser, defaults)
+    add_fault_arguments(worker_parser, defaults)
+    add_log_arguments(worker_parser, defaults)
+
+    return parser.parse_args()
+
+
+def run_coordinator(args: argparse.Namespace, config: AppConfig) -> None:
+    logger = util.setup_logger(name=f"coordinator_{args.phrase}",
+                               log_file=f"logs/download/{args.phrase}/coordinator_{args.phrase}_{dt.datetime.now().isoformat()}.log")
+    yars_logger = util.setup_logger(name=f"yars_{args.phrase}",
+                                    log_file=f"logs/yars/{args.phrase}/yars_{args.phrase}_{dt.datetime.now().isoformat()}.log")
+
+    print("---- Distributed reddits downloader coordinator ----\n")
+    logger.info("---- Distributed reddits downloader coordinator ----")
+
+    download_params = DownloadParams.from_argparse_namespace_and_config(args, config)
+    ledger_file = args.ledger or config.ledger_file_pattern.format(phrase=args.phrase)
+    show_params(download_params, logger=logger)
+    print("Task ledger:", ledger_file, "\n")
+    logger.info(f"Task ledger: {ledger_file}")
+    create_folders(download_params)
+    os.makedirs(os.path.dirname(ledger_file) or ".", exist_ok=True)
+
+    load_params = LoadParams.from_download_params(download_params)
+    show_load_params(load_params, logger=logger)
+    if load_params.date_from > load_params.date_to:
+        logger.info("Recent (start) file date is bigger than end date. Nothing to download. Finishing.")
+        raise Exception("Recent (start) file date is bigger than end date. Nothing to download.")
+
+    ledger = TaskLedger(ledger_file)
+    ledger.set_meta("lease_seconds", args.lease_seconds)
+    coordinator = LedgerCoordinator(create_downloader(download_params, logger=yars_logger), download_params, load_params,
+                                    config.website_url, ledger, logger=logger)
+
+    print(f"Searching reddits with phrase '{download_params.phrase}'.\n")
+    logger.info(f"Searching reddits with phrase '{download_params.phrase}'.")
+    coordinator.search()
+    print(f"Waiting for the workers: python run_distributed_download_reddits.py worker {ledger_file}\n")
+    logger.info(f"Waiting for the workers of ledger {ledger_file}.")
+    counts = coordinator.wait()
+
+    num_saved = coordinator.save()
+    num_failed = sum(map(lambda c: c.get(TaskLedger.FAILED, 0), counts.values()))
+    if num_failed > 0:
+        print(f"Failed to download {num_failed} reddits and authors.")
+        logger.warning(f"Failed to download {num_failed} reddits and authors.")
+    print(f"Reddit details downloaded. Total: {num_saved}. Authors downloaded: {counts.get('author', {}).get(TaskLedger.DONE, 0)}.")
+    logger.info(f"Reddit details downloaded. Total: {num_saved}. Authors downloaded: {counts.get('author', {}).get(TaskLedger.DONE, 0)}.")
+    ledger.close()
+
+
+def run_worker(args: argparse.Namespace) -> None:
+    logger = util.setup_logger(name=f"worker_{args.worker_id}",
+                               log_file=f"logs/download/workers/worker_{args.worker_id}_{dt.datetime.now().isoformat()}.log")
+    yars_logger = util.setup_logger(name=f"yars_{args.worker_id}",
+                                    log_file=f"logs/yars/workers/yars_{args.worker_id}_{dt.datetime.now().isoformat()}.log")
+
+    print(f"---- Distributed reddits downloader worker {args.worker_id} ----\n")
+    logger.info(f"---- Distributed reddits downloader worker {args.worker_id} ----")
+
+    ledger = TaskLedger(args.ledger)
+    ledger.lease_seconds = ledger.get_meta("lease_seconds", ledger.lease_seconds)
+    downloader = yars.YARS(logger=yars_logger, user_agents="curated" if args.curated_user_agents else None,
+                           pool_maxsize=args.concurrency, base_url=args.api_url, record_cassette=args.record_cassette,
+                           replay_cassette=args.replay_cassette, replay_latency_scale=args.replay_latency_scale,
+                           faults=args.faults, retries=args.retries, backoff_factor=args.backoff_factor,
+                           rate_limiter=yars.RateLimiter(args.rate_limit) if args.rate_limit else None,
+                           concurrency_limiter=yars.AIMDLimiter(args.concurrency, initial_limit=min(2, args.concurrency))
+                           if args.auto_concurrency else None)
+    executor = create_executor(args.executor, args.concurrency, batch_size=args.batch_size, logger=logger,
+                               task_timeout=args.task_timeout)
+    print(f"Downloading tasks of ledger {args.ledger} ({executor.name} executor, concurrency: {executor.concurrency}).")
+    logger.info(f"Downloading tasks of ledger {args.ledger} ({executor.name} executor, concurrency: {executor.concurrency}).")
+
+    progress = ProgressTracker(["reddits", "authors"], logger=logger, interval=args.progress_interval)
+    downloader.session.hooks["response"].append(progress.on_response)
+    stats = LedgerWorker(downloader, ledger, executor, args.worker_id, logger=logger, progress=progress).run()
+    print(f"Reddits downloaded: {stats['reddits']}. Authors downloaded: {stats['authors']}. Failed: {stats['failed']}.")
+    logger.info(f"Reddits downloaded: {stats['reddits']}. Authors downloaded: {stats['authors']}. Failed: {stats['failed']}.")
+    if downloader.session.concurrency_limiter is not None:
+        print(f"Auto concurrency: {downloader.session.concurrency_limiter.stats}.")
+        logger.info(f"Auto concurrency: {downloader.session.concurrency_limiter.stats}.")
+    ledger.close()
+
+
+def main():
+    config = AppConfig.from_json()
+    args = parse_args(config)
+    util.configure_logging(args.log_format, rate_limit=args.log_rate_limit)
+
+    if args.role == "coordinator":
+        run_coordinator(args, config)
+    else:
+        run_worker(args)
+
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,15 @@
-import multiprocessing
+from __future__ import annotations
 import os
 import logging
 import argparse
 import datetime as dt
-from multiprocessing import Queue
-from typing import List
-from tqdm import tqdm
+from typing import Any, Dict
 
 import util
 import yars
-from model import EloadType, AppConfig, DownloadParams, LoadParams
+from download import EXECUTORS, DownloadPipeline, DownloadPlanner, MemoryTracker, MetricsCollector, MetricsServer, \
+    ProgressTracker, RunJournal, RunProfiler, SharedResults
+from model import AppConfig, DownloadParams, LoadParams
 
 
 def parse_args(defaults: AppConfig) -> argparse.Namespace:
@@ -17,6 +17,14 @@ def parse_args(defaults: AppConfig) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Reddits downloader Python 3.11 application.")
 
     parser.add_argument("phrase", type=str, help="phrase to search for reddits")
+    add_download_arguments(parser, defaults)
+    add_plan_arguments(parser)
+
+    return parser.parse_args()
+
+
+def add_download_arguments(parser: argparse.ArgumentParser, defaults: AppConfig) -> None:
+    """ Adds the download options (shared with the batch downloader) to the parser """
     parser.add_argument("-l", "--limit", type=int, required=False, default=defaults.limit,
                         help=f"limit of searched reddits, default: {defaults.limit}")
     parser.add_argument("-i", "--interval", type=str, required=False, choices=["h", "d", "m", "y"], default=defaults.interval,
@@ -29,13 +37,85 @@ def parse_args(defaults: AppConfig) -> argparse.Namespace:
     parser.add_argument("--include_today", required=False, default=defaults.is_today_included,
                         help=f"flag whether to download reddits until the current datetime, ie. moment of script launch, default: {defaults.is_today_included}",
                         action="store_true")
+    parser.add_argument("--no_journal", required=False, default=defaults.is_no_journal_used,
+                        help=f"flag whether not to keep the checkpoint journal (to resume an interrupted run from), default: {defaults.is_no_journal_used}",
+                        action="store_true")
     parser.add_argument("--no_multiprocessing", required=False, default=defaults.is_no_multiprocessing_used,
                         help=f"flag whether not to use multiprocessing while downloading reddits and authors, default: {defaults.is_no_multiprocessing_used}",
                         action="store_true")
     parser.add_argument("--num_processes", type=int, required=False, default=defaults.num_processes,
                         help=f"number of processes if multiprocessing is used, default: {defaults.num_processes}")
-
-    return parser.parse_args()
+    parser.add_argument("--executor", type=str, required=False, choices=list(EXECUTORS), default=defaults.executor,
+                        help=f"concurrency backend used for downloading reddits and authors, default: {defaults.executor}")
+    parser.add_argument("--details_concurrency", type=int, required=False, default=defaults.details_concurrency,
+                        help=f"number of reddits downloaded concurrently, default: {defaults.details_concurrency or 'number of processes'}")
+    parser.add_argument("--authors_concurrency", type=int, required=False, default=defaults.authors_concurrency,
+                        help=f"number of authors downloaded concurrently, default: {defaults.authors_concurrency or 'number of processes'}")
+    parser.add_argument("--batch_size", type=int, required=False, default=defaults.batch_size,
+                        help=f"number of reddits or authors a process worker pulls from the shared queue at a time, default: {defaults.batch_size}")
+    parser.add_argument("--task_timeout", type=float, required=False, default=defaults.task_timeout,
+                        help=f"seconds after which a process worker stuck on one reddit or author is replaced, default: {defaults.task_timeout}")
+    parser.add_argument("--curated_user_agents", required=False, default=defaults.is_curated_user_agents_used,
+                        help=f"flag whether to pin the random user agents to a small curated subset, default: {defaults.is_curated_user_agents_used}",
+                        action="store_true")
+    parser.add_argument("--rate_limit", type=float, required=False, default=defaults.rate_limit,
+                        help=f"max number of requests per second (shared by all threads and processes), default: {defaults.rate_limit or 'unlimited'}")
+    parser.add_argument("--auto_concurrency", required=False, default=defaults.is_auto_concurrency_used,
+                        help=f"flag whether to adapt the number of in-flight requests to the latency and 429 responses (up to the reddits and authors concurrency), default: {defaults.is_auto_concurrency_used}",
+                        action="store_true")
+    parser.add_argument("--progress_interval", type=float, required=False, default=defaults.progress_interval,
+                        help=f"seconds between the progress reports (rates and ETA of the reddits and authors), default: {defaults.progress_interval}")
+    parser.add_argument("--metrics_port", type=int, required=False, default=defaults.metrics_port,
+                        help=f"local port of the Prometheus metrics endpoint (http://127.0.0.1:PORT/metrics), default: {defaults.metrics_port or 'disabled'}")
+    parser.add_argument("--profile", required=False, default=defaults.is_profiling_used,
+                        help=f"flag whether to profile every stage and worker into merged pstats and collapsed stacks files, default: {defaults.is_profiling_used}",
+                        action="store_true")
+    parser.add_argument("--track_memory", required=False, default=defaults.is_memory_tracking_used,
+                        help=f"flag whether to track the memory of every stage and worker (tracemalloc peaks and top allocation sites, peak RSS) into a merged report, default: {defaults.is_memory_tracking_used}",
+                        action="store_true")
+    parser.add_argument("--api_url", type=str, required=False, default=defaults.api_url,
+                        help=f"URL of the Reddit API the requests are sent to (eg. a local mock server), default: {defaults.api_url}")
+    add_cassette_arguments(parser, defaults)
+    add_fault_arguments(parser, defaults)
+    add_log_arguments(parser, defaults)
+
+
+def add_cassette_arguments(parser: argparse.ArgumentParser, defaults: AppConfig) -> None:
+    """ Adds the record and replay options (shared with the distributed worker) to the parser """
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record_cassette", type=str, required=False, default=defaults.record_cassette,
+                          help=f"gzip file to record every request and response into (to replay them offline), default: {defaults.record_cassette or 'none'}")
+    cassette.add_argument("--replay_cassette", type=str, required=False, default=defaults.replay_cassette,
+                          help=f"recorded gzip file to serve the responses from instead of the API (offline), default: {defaults.replay_cassette or 'none'}")
+    parser.add_argument("--replay_latency_scale", type=float, required=False, default=defaults.replay_latency_scale,
+                        help=f"factor of the recorded latencies of the replayed responses, 1 as recorded, 0 no delays, default: {defaults.replay_latency_scale}")
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser, defaults: AppConfig) -> None:
+    """ Adds the retry and fault injection options (shared with the distributed worker) to the parser """
+    parser.add_argument("--retries", type=int, required=False, default=defaults.retries,
+                        help=f"max number of retries of a request (429 and 5xx responses, timeouts and connection errors), default: {defaults.retries}")
+    parser.add_argument("--backoff_factor", type=float, required=False, default=defaults.backoff_factor,
+                        help=f"factor of the exponential backoff between the retries in seconds (unless told by Retry-After), default: {defaults.backoff_factor}")
+    parser.add_argument("--faults", type=str, required=False, default=defaults.faults,
+                        help=f"faults injected into the requests, comma separated KIND:RATE or KIND:RATExBURST of kinds {', '.join(yars.faults.FAULTS)} (eg. 429:0.05x3,reset:0.01), default: {defaults.faults or 'none'}")
+
+
+def add_log_arguments(parser: argparse.ArgumentParser, defaults: AppConfig) -> None:
+    """ Adds the logging options (shared with all the applications) to the parser """
+    parser.add_argument("--log_format", type=str, required=False, choices=util.LOG_FORMATS, default=defaults.log_format,
+                        help=f"format of the log files, one line of text or one JSON object per record, default: {defaults.log_format}")
+    parser.add_argument("--log_rate_limit", type=float, required=False, default=defaults.log_rate_limit,
+                        help=f"max number of info records per second logged from one place (eg. per downloaded reddit), the others are suppressed, default: {defaults.log_rate_limit or 'unlimited'}")
+
+
+def add_plan_arguments(parser: argparse.ArgumentParser) -> None:
+    """ Adds the dry run options (shared with the batch downloader) to the parser """
+    parser.add_argument("--plan", required=False, default=False,
+                        help="flag whether only to search the reddits and estimate the requests, files, bytes and time of the download, default: False",
+                        action="store_true")
+    parser.add_argument("--plan_pages", type=int, required=False, default=None,
+                        help="number of search pages the estimate is extrapolated from, default: all")
 
 
 def show_params(download_params: DownloadParams, logger: logging.Logger) -> None:
@@ -47,8 +127,28 @@ def show_params(download_params: DownloadParams, logger: logging.Logger) -> None
     print("Authors folder:", download_params.output_authors_folder)
     print("Download author details:", download_params.is_author_downloaded)
     print("Search until previous day:", download_params.is_date_to_previous_day)
+    print("Use checkpoint journal:", download_params.is_journal_used)
     print("Use multiprocessing:", download_params.is_multiprocessing_used)
-    print("Number of processes:", download_params.num_processes, "\n")
+    print("Number of processes:", download_params.num_processes)
+    print("Executor:", download_params.executor)
+    print("Reddits concurrency:", download_params.details_concurrency)
+    print("Authors concurrency:", download_params.authors_concurrency)
+    print("Batch size:", download_params.batch_size)
+    print("Task timeout:", download_params.task_timeout)
+    print("Curated user agents:", download_params.is_curated_user_agents_used)
+    print("Rate limit:", download_params.rate_limit or "unlimited")
+    print("Auto concurrency:", download_params.is_auto_concurrency_used)
+    print("Progress interval:", download_params.progress_interval)
+    print("Metrics port:", download_params.metrics_port or "disabled")
+    print("Profile:", download_params.is_profiling_used)
+    print("Track memory:", download_params.is_memory_tracking_used)
+    print("API URL:", download_params.api_url)
+    print("Record cassette:", download_params.record_cassette or "none")
+    print("Replay cassette:", download_params.replay_cassette or "none")
+    print("Replay latency scale:", download_params.replay_latency_scale)
+    print("Retries:", download_params.retries)
+    print("Backoff factor:", download_params.backoff_factor)
+    print("Faults:", download_params.faults or "none", "\n")
 
     logger.info(f"Searched phrase: {download_params.phrase}")
     logger.info(f"Max searched: {download_params.limit}")
@@ -57,8 +157,28 @@ def show_params(download_params: DownloadParams, logger: logging.Logger) -> None
     logger.info(f"Authors folder: {download_params.output_authors_folder}")
     logger.info(f"Download author details: {download_params.is_author_downloaded}")
     logger.info(f"Search until previous day: {download_params.is_date_to_previous_day}")
+    logger.info(f"Use checkpoint journal: {download_params.is_journal_used}")
     logger.info(f"Use multiprocessing: {download_params.is_multiprocessing_used}")
     logger.info(f"Number of processes: {download_params.num_processes}")
+    logger.info(f"Executor: {download_params.executor}")
+    logger.info(f"Reddits concurrency: {download_params.details_concurrency}")
+    logger.info(f"Authors concurrency: {download_params.authors_concurrency}")
+    logger.info(f"Batch size: {download_params.batch_size}")
+    logger.info(f"Task timeout: {download_params.task_timeout}")
+    logger.info(f"Curated user agents: {download_params.is_curated_user_agents_used}")
+    logger.info(f"Rate limit: {download_params.rate_limit or 'unlimited'}")
+    logger.info(f"Auto concurrency: {download_params.is_auto_concurrency_used}")
+    logger.info(f"Progress interval: {download_params.progress_interval}")
+    logger.info(f"Metrics port: {download_params.metrics_port or 'disabled'}")
+    logger.info(f"Profile: {download_params.is_profiling_used}")
+    logger.info(f"Track memory: {download_params.is_memory_tracking_used}")
+    logger.info(f"API URL: {download_params.api_url}")
+    logger.info(f"Record cassette: {download_params.record_cassette or 'none'}")
+    logger.info(f"Replay cassette: {download_params.replay_cassette or 'none'}")
+    logger.info(f"Replay latency scale: {download_params.replay_latency_scale}")
+    logger.info(f"Retries: {download_params.retries}")
+    logger.info(f"Backoff factor: {download_params.backoff_factor}")
+    logger.info(f"Faults: {download_params.faults or 'none'}")
 
 
 def create_folders(download_params: DownloadParams):
@@ -79,59 +199,143 @@ def show_load_params(load_params: LoadParams, logger: logging.Logger):
     logger.info(f"End date: {load_params.date_to}")
 
 
-def _download_reddits_details(downloader: yars.YARS, permalinks: List[str], num: int,
-                              queue: Queue, logger: logging.Logger) -> None:
-    """ Partially downloads reddits details (utilizes multiprocessing) """
-    print(f"P{num + 1}: Starting downloading reddits details.")
-    logger.info(f"P{num + 1}: Starting downloading reddits details.")
-
-    details = list([])
-    for i, permalink in enumerate(permalinks):
-        result = downloader.scrape_post_details(permalink)
-        if isinstance(result, dict):
-            details.append(result)
-        else:
-            print(f"P{num + 1}: Something went wrong.")
-            logger.warning(f"P{num + 1}: Something went wrong.")
-
-        if len(details) % 10 == 0 and len(details) > 0:
-            print(f"P{num + 1}: Downloaded {len(details)} out of {len(permalinks)} reddits.")
-            logger.info(f"P{num + 1}: Downloaded {len(details)} out of {len(permalinks)} reddits.")
-
-    print(f"P{num + 1}: Finished downloading reddits details. Downloaded: {len(details)}.")
-    logger.info(f"P{num + 1}: Finished downloading reddits details. Downloaded: {len(details)}.")
-
-    queue.put((details, num))
+def create_downloader(download_params: DownloadParams, logger: logging.Logger, num_phrases: int = 1) -> yars.YARS:
+    """ Creates the reddits downloader (shared by all the phrases downloaded at once) """
+    max_concurrency = num_phrases * (download_params.details_concurrency + download_params.authors_concurrency)
+    return yars.YARS(logger=logger, base_url=download_params.api_url, record_cassette=download_params.record_cassette,
+                     replay_cassette=download_params.replay_cassette,
+                     replay_latency_scale=download_params.replay_latency_scale, faults=download_params.faults,
+                     retries=download_params.retries, backoff_factor=download_params.backoff_factor,
+                     user_agents="curated" if download_params.is_curated_user_agents_used else None,
+                     pool_maxsize=num_phrases * max(download_params.details_concurrency, download_params.authors_concurrency),
+                     rate_limiter=yars.RateLimiter(download_params.rate_limit) if download_params.rate_limit else None,
+                     # Stage concurrencies are the upper bounds, the limiter finds the number Reddit tolerates
+                     concurrency_limiter=yars.AIMDLimiter(max_concurrency, initial_limit=min(2, max_concurrency))
+                     if download_params.is_auto_concurrency_used else None)
+
+
+def start_metrics(download_params: DownloadParams, downloader: yars.YARS, logger: logging.Logger) -> MetricsCollector | None:
+    """ Starts collecting the metrics of the downloader and serving them (if the metrics port is set) """
+    if download_params.metrics_port is None:
+        return None
+    metrics = MetricsCollector()
+    # Requests of the worker processes are collected too (the hook goes with the session, forked or spawned)
+    downloader.session.hooks["response"].append(metrics.on_response)
+    server = MetricsServer(metrics, download_params.metrics_port, logger=logger).start()
+    print(f"Serving metrics at http://127.0.0.1:{server.port}/metrics.\n")
+    logger.info(f"Serving metrics at http://127.0.0.1:{server.port}/metrics.")
+    return metrics
+
+
+def download(download_params: DownloadParams, downloader: yars.YARS, website_url: str, logger: logging.Logger,
+             shared: SharedResults | None = None, load_params: LoadParams | None = None,
+             metrics: MetricsCollector | None = None) -> Dict[str, int]:
+    """ Downloads reddits (and its authors) of the phrase, returns the download statistics """
+    # Show parameters
+    show_params(download_params, logger=logger)
 
+    # Create folders if not exist
+    create_folders(download_params)
 
-def _download_authors_details(downloader: yars.YARS, names: List[str], num: int,
-                              queue: Queue, logger: logging.Logger) -> None:
-    """ Partially downloads authors details (utilizes multiprocessing) """
-    print(f"P{num + 1}: Starting downloading authors details.")
-    logger.info(f"P{num + 1}: Starting downloading authors details.")
+    if load_params is None:
+        load_params = LoadParams.from_download_params(download_params)
 
-    details = list([])
-    for i, name in enumerate(names):
-        result = downloader.scrape_user_data(name, limit=1)
-        if isinstance(result, list):
-            details.append(result)
-        else:
-            print(f"P{num + 1}: Something went wrong.")
-            logger.warning(f"P{num + 1}: Something went wrong.")
+    # Show load params
+    show_load_params(load_params, logger=logger)
 
-        if len(details) % 10 == 0 and len(details) > 0:
-            print(f"P{num + 1}: Downloaded {len(details)} out of {len(names)} authors.")
-            logger.info(f"P{num + 1}: Downloaded {len(details)} out of {len(names)} authors.")
+    if load_params.date_from > load_params.date_to:
+        logger.info("Recent (start) file date is bigger than end date. Nothing to download. Finishing.")
+        raise Exception("Recent (start) file date is bigger than end date. Nothing to download.")
 
-    print(f"P{num + 1}: Finished downloading authors details. Downloaded: {len(details)}.")
-    logger.info(f"P{num + 1}: Finished downloading authors details. Downloaded: {len(details)}.")
+    # Searching, downloading reddits and authors details and saving them into separate JSONs as a streaming pipeline
+    print(f"Searching reddits with phrase '{download_params.phrase}'.\n")
+    logger.info(f"Searching reddits with phrase '{download_params.phrase}'.")
+    journal = None
+    if download_params.is_journal_used:
+        journal = RunJournal(download_params.output_journal_folder, download_params.journal_fingerprint(), logger=logger)
+        if journal.num_resumed > 0:
+            print(f"Resuming interrupted run, {journal.num_resumed} reddits and authors already downloaded.")
+            logger.info(f"Resuming interrupted run, {journal.num_resumed} reddits and authors already downloaded.")
+    progress = ProgressTracker(["reddits", "authors"] if download_params.is_author_downloaded else ["reddits"],
+                               logger=logger, interval=download_params.progress_interval)
+    profiler = RunProfiler(os.path.join(download_params.output_profile_folder,
+                                        f"profile_{download_params.phrase}_{dt.datetime.now().isoformat()}")) \
+        if download_params.is_profiling_used else None
+    memory = MemoryTracker(os.path.join(download_params.output_profile_folder,
+                                        f"memory_{download_params.phrase}_{dt.datetime.now().isoformat()}")) \
+        if download_params.is_memory_tracking_used else None
+    # Requests of the worker processes are counted too (the hook goes with the session, forked or spawned)
+    downloader.session.hooks["response"].append(progress.on_response)
+    try:
+        stats = DownloadPipeline(downloader, download_params, load_params, website_url, logger=logger, journal=journal,
+                                 shared=shared, progress=progress, metrics=metrics, profiler=profiler, memory=memory).run()
+    finally:
+        downloader.session.hooks["response"].remove(progress.on_response)
+    if profiler is not None:
+        stats_file, stacks_file = profiler.merge()
+        print(f"Profile saved: {stats_file} (pstats), {stacks_file} (collapsed stacks).")
+        logger.info(f"Profile saved: {stats_file} (pstats), {stacks_file} (collapsed stacks).")
+    if memory is not None:
+        memory_file, report_file = memory.merge()
+        print(f"Memory report saved: {report_file} (text), {memory_file} (JSON).")
+        logger.info(f"Memory report saved: {report_file} (text), {memory_file} (JSON).")
+    if journal is not None:
+        journal.close(is_completed=True)
+
+    if stats["failed"] > 0:
+        print(f"Failed to download {stats['failed']} reddits.")
+        logger.warning(f"Failed to download {stats['failed']} reddits.")
+    print(f"Reddit details downloaded. Total: {stats['downloaded']}. Authors downloaded: {stats['authors']}.")
+    logger.info(f"Reddit details downloaded. Total: {stats['downloaded']}. Authors downloaded: {stats['authors']}.")
+    limiter = downloader.session.concurrency_limiter
+    if limiter is not None:
+        print(f"Auto concurrency: {limiter.stats}.")
+        logger.info(f"Auto concurrency: {limiter.stats}.")
+    return stats
+
+
+def plan(download_params: DownloadParams, downloader: yars.YARS, website_url: str, logger: logging.Logger,
+         max_pages: int | None = None) -> Dict[str, Any]:
+    """ Estimates the cost of downloading reddits (and its authors) of the phrase without downloading them """
+    show_params(download_params, logger=logger)
+    load_params = LoadParams.from_download_params(download_params)
+    show_load_params(load_params, logger=logger)
+    if load_params.date_from > load_params.date_to:
+        logger.info("Recent (start) file date is bigger than end date. Nothing to download. Finishing.")
+        raise Exception("Recent (start) file date is bigger than end date. Nothing to download.")
 
-    queue.put((details, num))
+    print(f"Planning download of reddits with phrase '{download_params.phrase}'.\n")
+    logger.info(f"Planning download of reddits with phrase '{download_params.phrase}'.")
+    download_plan = DownloadPlanner(downloader, download_params, load_params, website_url,
+                                    logger=logger, max_pages=max_pages).plan()
+    show_plan(download_plan, logger=logger)
+    return download_plan
+
+
+def show_plan(download_plan: Dict[str, Any], logger: logging.Logger) -> None:
+    """ Shows the estimated cost of the download """
+    lines = [
+        f"Search pages: {download_plan['search_pages']} ({download_plan['searched']} results"
+        + (", sampled, extrapolated to the limit)" if download_plan['is_sampled'] else ")"),
+        f"Reddits to download: {download_plan['reddits']} (comments: {download_plan['comments']})",
+        f"Detail requests: {download_plan['detail_requests']}",
+        "Author requests: {} -- {}".format(*download_plan['author_requests']),
+        f"Total requests: up to {download_plan['requests']}",
+        f"Output intervals: {download_plan['intervals']} (files: {download_plan['files']})",
+        "Output size: {} -- {}".format(*map(util.format_bytes, download_plan['bytes'])),
+        f"Request latency: {download_plan['latency']:.3f}s",
+        f"Estimated time: up to {dt.timedelta(seconds=round(download_plan['wall_time']))}",
+    ]
+    for line in lines:
+        print(line)
+        logger.info(line)
+    print()
 
 
 def main():
     config = AppConfig.from_json()
     args = parse_args(config)
+    util.configure_logging(args.log_format, rate_limit=args.log_rate_limit)
 
     logger = util.setup_logger(name=f"download_{args.phrase}",
                                log_file=f"logs/download/{args.phrase}/download_{args.phrase}_{dt.datetime.now().isoformat()}.log")
@@ -144,98 +348,12 @@ def main():
 
     download_params = DownloadParams.from_argparse_namespace_and_config(args, config)
 
-    # Show parameters
-    show_params(download_params, logger=logger)
-
-    # Create folders if not exist
-    create_folders(download_params)
-
-    load_params = LoadParams.from_download_params(download_params)
-
-    # Show load params
-    show_load_params(load_params, logger=logger)
-
-    if load_params.date_from > load_params.date_to:
-        logger.info("Recent (start) file date is bigger than end date. Nothing to download. Finishing.")
-        raise Exception("Recent (start) file date is bigger than end date. Nothing to download.")
-
-    downloader = yars.YARS(logger=yars_logger)
-
-    # Getting posts headers
-    print(f"Searching reddits with phrase '{download_params.phrase}'.\n")
-    logger.info(f"Searching reddits with phrase '{download_params.phrase}'.")
-    reddit_headers = downloader.search_reddit(query=download_params.phrase, limit=download_params.limit)
-
-    # Restriction to the newest only for INCREMENTAL load
-    if load_params.load_type == EloadType.INCREMENTAL:
-        reddit_headers = list(filter(lambda rh: load_params.date_to > dt.datetime.fromtimestamp(rh['created_utc']) >= load_params.date_from, reddit_headers))
-
-    # Getting posts details
-    permalinks = list(map(lambda rh: rh['link'].split(config.website_url)[1], reddit_headers))
-    print(f"Found {len(permalinks)} results.")
-    logger.info(f"Found {len(permalinks)} results.")
-
-    print("Downloading reddits.")
-    logger.info("Downloading reddits.")
-    # Using multiprocessing only if applicable and number of reddits to download is >= quadratic number of processes
-    if download_params.is_multiprocessing_used and len(permalinks) >= download_params.num_processes ** 2:
-        reddit_details = list([])
-        queue = multiprocessing.Queue()
-        for i, chunk in enumerate(util.chunk_list(permalinks, download_params.num_processes)):
-            p = multiprocessing.Process(target=_download_reddits_details, args=(downloader, chunk, i, queue, logger))
-            p.start()
-
-        for i in range(download_params.num_processes):
-            results, num = queue.get()
-            if isinstance(results, list):
-                reddit_details.extend(results)
-
+    downloader = create_downloader(download_params, logger=yars_logger)
+    if args.plan:
+        plan(download_params, downloader, config.website_url, logger=logger, max_pages=args.plan_pages)
     else:
-        reddit_details = list(map(lambda pl: downloader.scrape_post_details(pl), tqdm(permalinks)))
-    print(f"Reddit details downloaded. Total: {len(reddit_details)}.")
-    logger.info(f"Reddit details downloaded. Total: {len(reddit_details)}.")
-
-
-    # Saving into separate JSONs
-    for sd, ed in util.date_range(load_params.date_from, load_params.date_to, interval=download_params.date_interval):
-        # Filtering reddits details by dates interval
-        reddits_interval = util.filter_reddits_by_dates(reddit_details, sd, ed)
-
-        # Saving reddits details into JSON file
-        util.save_jsons(reddits_interval,
-                        download_params.output_reddits_folder, download_params.output_reddits_file_pattern,
-                        sd, ed, logger=logger)
-
-        if download_params.is_author_downloaded:
-            # Getting posts authors
-            authors = util.collect_authors(reddits_interval)
-
-            print(f"\nFound {len(authors)} different authors for period {sd} -- {ed}.")
-            logger.info(f"Found {len(authors)} different authors for period {sd} -- {ed}.")
-            print(f"Downloading authors details for period {sd} -- {ed}.")
-            logger.info(f"Downloading authors details for period {sd} -- {ed}.")
-            # Using multiprocessing only if applicable and number of authors to download is >= quadratic number of processes
-            if download_params.is_multiprocessing_used and len(authors) >= download_params.num_processes ** 2:
-                author_details = list([])
-                queue = multiprocessing.Queue()
-                for i, chunk in enumerate(util.chunk_list(authors, download_params.num_processes)):
-                    p = multiprocessing.Process(target=_download_authors_details, args=(downloader, chunk, i, queue, logger))
-                    p.start()
-
-                for i in range(download_params.num_processes):
-                    results, num = queue.get()
-                    if isinstance(results, list):
-                        author_details.extend(results)
-
-            else:
-                author_details = list(map(lambda a: downloader.scrape_user_data(a, limit=1), tqdm(authors)))
-            print(f"Downloading authors details for period {sd} -- {ed} finished.")
-            logger.info(f"Downloading authors details for period {sd} -- {ed} finished.")
-
-            # Saving authors details into JSON file
-            util.save_jsons(author_details,
-                            download_params.output_authors_folder, download_params.output_authors_file_pattern,
-                            sd, ed, logger=logger)
+        metrics = start_metrics(download_params, downloader, logger=logger)
+        download(download_params, downloader, config.website_url, logger=logger, metrics=metrics)
 
     print("\nDone.")
     logger.info("Done.")
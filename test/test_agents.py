@@ -0,0 +1,39 @@
+import pytest
+from typing import List, Tuple
+
+from yars import agents
+
+
+def test_load_agents() -> None:
+    # Arrange
+    # Act
+    pool = agents.load_agents()
+
+    # Assert
+    assert len(pool) == 7500
+    assert all(len(agent) > 0 and agent == agent.strip() for agent in pool)
+    assert set(agents.CURATED_AGENTS).issubset(pool)
+
+
+@pytest.mark.parametrize("pinned, expected_pool", [
+    (None, agents.CURATED_AGENTS),
+    (["agent-1", "agent-2"], ("agent-1", "agent-2")),
+])
+def test_pin_agents(pinned: List[str] | None, expected_pool: Tuple[str, ...]) -> None:
+    # Arrange
+    agents.pin_agents(pinned)
+
+    # Act
+    drawn = {agents.get_agent() for _ in range(200)}
+
+    # Assert
+    agents.unpin_agents()
+    assert drawn.issubset(expected_pool)
+
+
+def test_pin_agents_empty() -> None:
+    # Arrange
+    # Act
+    # Assert
+    with pytest.raises(ValueError):
+        agents.pin_agents([])
@@ -0,0 +1,130 @@
+import os
+import logging
+import multiprocessing
+import pytest
+import requests
+from typing import Any, Dict, List
+
+import yars
+from yars.cassette import CassettePlayer, interaction_key, load_cassette
+from benchmark.mock_reddit_server import MockRedditServer
+
+
+def download(downloader: yars.YARS, limit: int) -> Dict[str, Any]:
+    """ Searches the posts, downloads the first post and its author """
+    pages = list(downloader.search_reddit_pages("corgi", limit=limit, page_size=10))
+    details = downloader.scrape_post_details(pages[0][0]["link"].split("www.reddit.com")[1])
+    return {"pages": pages, "details": details, "user_data": downloader.scrape_user_data(details["author"], limit=5)}
+
+
+def _record_post(cassette_file: str, api_url: str, permalink: str) -> None:
+    downloader = yars.YARS(logger=logging.getLogger("test_cassette"), base_url=api_url, record_cassette=cassette_file)
+    assert downloader.scrape_post_details(permalink) is not None
+
+
+@pytest.mark.parametrize("limit, expected_requests", [
+    (10, 3),
+    (35, 6),
+])
+def test_cassette_replay(tmp_path: str, limit: int, expected_requests: int) -> None:
+    # Arrange
+    cassette_file = os.path.join(tmp_path, "cassettes", "corgi.jsonl.gz")
+    server = MockRedditServer(latency=0., num_posts=100).start()
+    recorder = yars.YARS(logger=logging.getLogger("test_cassette"), base_url=server.url, record_cassette=cassette_file)
+    recorded = download(recorder, limit)
+    server.stop()
+
+    # Act
+    player = yars.YARS(logger=logging.getLogger("test_cassette"), replay_cassette=cassette_file, replay_latency_scale=0.)
+    replayed = download(player, limit)
+
+    # Assert
+    interactions = yars.load_cassette(cassette_file)
+    assert replayed == recorded
+    assert len(interactions) == expected_requests
+    assert all(map(lambda i: i["response"]["status"] == 200 and "User-Agent" in i["request"]["headers"], interactions))
+    assert all(map(lambda i: i["response"]["headers"]["Content-Type"].startswith("application/json"), interactions))
+
+
+def test_cassette_record_forked(tmp_path: str) -> None:
+    # Arrange
+    cassette_file = os.path.join(tmp_path, "corgi.jsonl.gz")
+    server = MockRedditServer(latency=0., num_posts=20).start()
+    downloader = yars.YARS(logger=logging.getLogger("test_cassette"), base_url=server.url, record_cassette=cassette_file)
+    permalinks = list(map(lambda h: h["link"].split("www.reddit.com")[1], downloader.search_reddit("corgi", limit=20)))
+
+    # Act
+    workers = list(map(lambda p: multiprocessing.get_context("fork").Process(
+        target=_record_post, args=(cassette_file, server.url, p)), permalinks[:4]))
+    for worker in workers:
+        worker.start()
+    for permalink in permalinks[4:8]:
+        downloader.scrape_post_details(permalink)
+    for worker in workers:
+        worker.join()
+    server.stop()
+
+    # Assert
+    keys = list(map(lambda i: i["key"], yars.load_cassette(cassette_file)))
+    assert all(map(lambda w: w.exitcode == 0, workers))
+    assert len(keys) == 9
+    assert set(map(lambda p: f"GET {p}.json", permalinks[:8])) < set(keys)
+
+
+@pytest.mark.parametrize("latency_scale", [0., 1., 0.5])
+def test_cassette_replay_timing(tmp_path: str, latency_scale: float) -> None:
+    # Arrange
+    cassette_file = os.path.join(tmp_path, "corgi.jsonl.gz")
+    server = MockRedditServer(latency=0.2, num_posts=10).start()
+    recorder = yars.YARS(logger=logging.getLogger("test_cassette"), base_url=server.url, record_cassette=cassette_file)
+    recorder.search_reddit("corgi")
+    server.stop()
+    recorded_latencies = list(map(lambda i: i["latency"], load_cassette(cassette_file)))
+    delays: List[float] = list([])
+    player = yars.YARS(logger=logging.getLogger("test_cassette"), replay_cassette=cassette_file)
+    adapter = CassettePlayer(cassette_file, latency_scale=latency_scale, sleep=delays.append)
+    player.session.mount("https://", adapter)
+
+    # Act
+    results = player.search_reddit("corgi")
+
+    # Assert
+    assert len(results) == 10
+    assert min(recorded_latencies) >= 0.2
+    # Every response delayed by its recorded latency times the scale, no delays at all with 0
+    expected_delays = list(map(lambda latency: latency * latency_scale, recorded_latencies)) \
+        if latency_scale > 0 else list([])
+    assert delays == expected_delays
+
+
+def test_cassette_replay_errors(tmp_path: str) -> None:
+    # Arrange
+    cassette_file = os.path.join(tmp_path, "corgi.jsonl.gz")
+    recorder = yars.YARS(logger=logging.getLogger("test_cassette"), base_url="http://127.0.0.1:9", timeout=1,
+                         record_cassette=cassette_file)
+    recorder.session.adapters["http://"].max_retries.total = 0
+    recorder.search_reddit("corgi")
+    player = yars.YARS(logger=logging.getLogger("test_cassette"), replay_cassette=cassette_file, replay_latency_scale=0.)
+
+    # Act
+    # Assert
+    with pytest.raises(requests.exceptions.ConnectionError):
+        player.session.get("https://www.reddit.com/search.json",
+                           params={"q": "corgi", "limit": 10, "sort": "relevance", "type": "link"})
+    with pytest.raises(yars.CassetteMiss):
+        player.session.get("https://www.reddit.com/r/corgi/comments/abc/corgi.json")
+    assert player.scrape_post_details("/r/corgi/comments/abc/corgi") is None
+
+
+@pytest.mark.parametrize("method, url, expected_key", [
+    ("get", "https://www.reddit.com/search.json?q=corgi&limit=10", "GET /search.json?limit=10&q=corgi"),
+    ("GET", "http://127.0.0.1:8080/search.json?limit=10&q=corgi", "GET /search.json?limit=10&q=corgi"),
+    ("GET", "https://www.reddit.com/user/corgi/.json", "GET /user/corgi/.json"),
+])
+def test_interaction_key(method: str, url: str, expected_key: str) -> None:
+    # Arrange
+    # Act
+    key = interaction_key(method, url)
+
+    # Assert
+    assert key == expected_key
@@ -0,0 +1,224 @@
+import os
+import time
+import signal
+import threading
+import multiprocessing
+import pytest
+from typing import List
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+from yars import AIMDLimiter
+from yars.concurrency import reclaim_slots
+from yars.sessions import BaseSession
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeAdapter(BaseAdapter):
+    """ Adapter answering with the given status codes in turn """
+
+    def __init__(self, status_codes: List[int]) -> None:
+        super().__init__()
+        self.status_codes = status_codes
+        self.num_sent = 0
+
+    def send(self, request, **kwargs) -> Response:
+        response = Response()
+        response.status_code = self.status_codes[self.num_sent % len(self.status_codes)]
+        response.request = request
+        self.num_sent += 1
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.mark.parametrize("num_requests, expected_limit", [
+    (0, 2),
+    (3, 3),
+    (6, 4),
+    (1000, 10),
+])
+def test_aimd_limiter_increase(num_requests: int, expected_limit: int) -> None:
+    # Arrange
+    limiter = AIMDLimiter(10, initial_limit=2)
+
+    # Act
+    for _ in range(num_requests):
+        limiter.acquire()
+        limiter.release(0.1)
+
+    # Assert
+    assert limiter.limit == expected_limit
+
+
+@pytest.mark.parametrize("elapsed, expected_limits", [
+    (0., [8, 8]),
+    (0.5, [8, 8]),
+    (1., [8, 4]),
+])
+def test_aimd_limiter_decrease(elapsed: float, expected_limits: List[int]) -> None:
+    # Arrange
+    clock = FakeClock()
+    limiter = AIMDLimiter(16, initial_limit=16, cooldown=1., clock=clock)
+
+    # Act
+    limits = list([])
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(0.1, is_congested=True)
+        limits.append(limiter.limit)
+        clock.now += elapsed
+
+    # Assert
+    assert limits == expected_limits
+    assert limiter.stats["cuts"] == len(set(expected_limits))
+
+
+def test_aimd_limiter_bounds() -> None:
+    # Arrange
+    clock = FakeClock()
+    limiter = AIMDLimiter(4, min_limit=2, initial_limit=4, clock=clock)
+
+    # Act
+    for _ in range(5):
+        clock.now += 10.
+        limiter.acquire()
+        limiter.release(0.1, is_congested=True)
+
+    # Assert
+    assert limiter.limit == 2
+
+
+def test_aimd_limiter_latency_stops_increase() -> None:
+    # Arrange
+    limiter = AIMDLimiter(100, initial_limit=2, latency_tolerance=2.)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.1)
+    limit = limiter.limit
+
+    # Act
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(1.)
+
+    # Assert
+    assert limiter.limit - limit < 5
+
+
+@pytest.mark.parametrize("min_limit, max_limit, decrease", [
+    (0, 4, 0.5),
+    (5, 4, 0.5),
+    (1, 4, 1.),
+])
+def test_aimd_limiter_invalid(min_limit: int, max_limit: int, decrease: float) -> None:
+    # Arrange
+    # Act
+    # Assert
+    with pytest.raises(ValueError):
+        AIMDLimiter(max_limit, min_limit=min_limit, decrease=decrease)
+
+
+def test_aimd_limiter_blocks() -> None:
+    # Arrange
+    limiter = AIMDLimiter(2, initial_limit=2)
+    in_flight, max_in_flight, lock = list([0]), list([0]), threading.Lock()
+
+    def request() -> None:
+        limiter.acquire()
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        limiter.release(0.01)
+
+    # Act
+    threads = list(map(lambda _: threading.Thread(target=request), range(8)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert
+    assert max_in_flight[0] == 2
+
+
+def test_aimd_limiter_lease_expires() -> None:
+    # Arrange
+    clock = FakeClock()
+    limiter = AIMDLimiter(1, initial_limit=1, lease_timeout=10., clock=clock)
+    lost = limiter.acquire()
+
+    # Act
+    clock.now += 11.
+    token = limiter.acquire()
+    # The late release of the expired request leaves the new one in flight
+    limiter.release(0.1, token=lost)
+
+    # Assert
+    assert limiter.stats["expired"] == 1
+    assert limiter.in_flight == 1
+    limiter.release(0.1, token=token)
+    assert limiter.in_flight == 0
+
+
+def hold_slot(limiter: AIMDLimiter, is_locking: bool) -> None:
+    """ Holds a slot (and the lock of the limiter) until killed """
+    limiter.acquire()
+    if is_locking:
+        limiter._lock_acquire()
+    time.sleep(60)
+
+
+@pytest.mark.parametrize("is_locking", [False, True])
+def test_aimd_limiter_reclaims_killed_process(is_locking: bool) -> None:
+    # Arrange
+    limiter = AIMDLimiter(2, initial_limit=2, lock_timeout=60.)
+    process = multiprocessing.Process(target=hold_slot, args=(limiter, is_locking))
+    process.start()
+    while limiter.in_flight == 0 or (is_locking and limiter._holder.value != process.pid):
+        time.sleep(0.01)
+    os.kill(process.pid, signal.SIGKILL)
+    process.join()
+
+    # Act
+    start = time.monotonic()
+    num_reclaimed = reclaim_slots(process.pid)
+    tokens = list(map(lambda _: limiter.acquire(), range(2)))
+
+    # Assert
+    assert num_reclaimed == 1
+    assert time.monotonic() - start < 5.
+    assert limiter.in_flight == 2 and limiter.stats["reclaimed"] == 1
+    for token in tokens:
+        limiter.release(0.1, token=token)
+
+
+@pytest.mark.parametrize("status_codes, expected_cuts", [
+    ([200], 0),
+    ([429], 1),
+])
+def test_session_reports_congestion(status_codes: List[int], expected_cuts: int) -> None:
+    # Arrange
+    limiter = AIMDLimiter(8, initial_limit=8)
+    session = BaseSession(concurrency_limiter=limiter)
+    session.mount("http://", FakeAdapter(status_codes))
+
+    # Act
+    for _ in range(3):
+        session.get("http://reddit.test/r/corgi")
+
+    # Assert
+    assert limiter.stats["cuts"] == expected_cuts
+    assert limiter.limit == (8 if expected_cuts == 0 else 4)
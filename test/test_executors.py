@@ -0,0 +1,92 @@
+import logging
+import multiprocessing
+import pytest
+
+import yars
+from benchmark.mock_reddit_server import MockRedditServer
+from download import create_executor, SerialExecutor, ThreadExecutor, AsyncExecutor, ProcessExecutor, MetricsCollector, \
+    ProgressTracker
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+@pytest.mark.parametrize("name", ["thread", "process", "async"])
+def test_executor_run(name: str) -> None:
+    # Arrange
+    executor = create_executor(name, concurrency=3, num_items=20, batch_size=2)
+
+    # Act
+    results = executor.run(square, list(range(20)), stage="test")
+
+    # Assert
+    assert executor.name == name
+    assert sorted(results) == [x * x for x in range(20)]
+
+
+@pytest.mark.parametrize("name", ["thread", "process", "async"])
+def test_executor_map_streams_pairs(name: str) -> None:
+    # Arrange
+    executor = create_executor(name, concurrency=2, num_items=20, batch_size=3)
+
+    # Act
+    pairs = list(executor.map(square, iter(range(20)), stage="test"))
+
+    # Assert
+    assert sorted(pairs) == [(x, x * x) for x in range(20)]
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "forkserver"])
+def test_process_executor_start_methods(start_method: str) -> None:
+    # Arrange
+    previous_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method(start_method, force=True)
+    server = MockRedditServer(latency=0., num_posts=6, num_comments=2).start()
+    try:
+        downloader = yars.YARS(logger=logging.getLogger("test_executors"), base_url=server.url)
+        permalinks = list(map(lambda h: h["link"].split("www.reddit.com")[1],
+                              [hit for page in downloader.search_reddit_pages("corgi", limit=6) for hit in page]))
+        # The hooks go with the pickled downloader
+        progress, metrics = ProgressTracker(["reddits"], logger=logging.getLogger("test_executors")), MetricsCollector()
+        downloader.session.hooks["response"].extend([progress.on_response, metrics.on_response])
+
+        # Act
+        results = dict(ProcessExecutor(concurrency=2).map(downloader.scrape_post_details, permalinks, "reddits"))
+    finally:
+        server.stop()
+        multiprocessing.set_start_method(previous_method, force=True)
+
+    # Assert
+    assert sorted(results) == sorted(permalinks) and all(map(lambda r: isinstance(r, dict), results.values()))
+    assert progress.snapshot()["requests"] == 6
+    assert 'yars_requests_total{endpoint="post_details",code="200"} 6' in metrics.render()
+
+
+@pytest.mark.parametrize("name, concurrency, num_items, expected_type, expected_concurrency", [
+    ("thread", 8, 100, ThreadExecutor, 8),
+    ("thread", 8, 3, ThreadExecutor, 3),
+    ("async", 8, 5, AsyncExecutor, 5),
+    ("process", 8, 100, ProcessExecutor, 8),
+    ("process", 8, 63, SerialExecutor, 1),
+    ("process", 8, None, ThreadExecutor, 8),
+    ("async", 8, None, AsyncExecutor, 8),
+    ("thread", 1, 100, SerialExecutor, 1),
+])
+def test_create_executor(name: str, concurrency: int, num_items: int | None, expected_type: type,
+                         expected_concurrency: int) -> None:
+    # Arrange
+    # Act
+    executor = create_executor(name, concurrency, num_items)
+
+    # Assert
+    assert type(executor) is expected_type
+    assert executor.concurrency == expected_concurrency
+
+
+def test_create_executor_unknown() -> None:
+    # Arrange
+    # Act
+    # Assert
+    with pytest.raises(ValueError):
+        create_executor("fiber", 8, 100)
@@ -0,0 +1,139 @@
+import time
+import logging
+import pytest
+import requests
+from collections import Counter
+from typing import Dict, Tuple
+from urllib3.util.retry import Retry
+
+import yars
+from benchmark.mock_reddit_server import MockRedditServer
+from benchmark import bench_faults
+
+
+@pytest.fixture(scope="module")
+def server() -> MockRedditServer:
+    server = MockRedditServer(latency=0., num_posts=20, num_comments=10).start()
+    yield server
+    server.stop()
+
+
+def create_session(faults: str, retries: int = 0) -> requests.Session:
+    session = requests.Session()
+    session.mount("http://", yars.FaultInjector(faults, max_retries=Retry(total=retries, backoff_factor=0.,
+                                                                           status_forcelist=[429, 500, 502, 503, 504]),
+                                                retry_after=0, drip_rate=200000., seed=0))
+    return session
+
+
+@pytest.mark.parametrize("spec, expected_faults", [
+    ("", {}),
+    ("429:0.1", {"429": (0.1, 1)}),
+    ("429:0.05x3, reset:0.01,drip:1e-2x2", {"429": (0.05, 3), "reset": (0.01, 1), "drip": (0.01, 2)}),
+    ("5xx:0.5,timeout:0.5", {"5xx": (0.5, 1), "timeout": (0.5, 1)}),
+])
+def test_parse_faults(spec: str, expected_faults: Dict[str, Tuple[float, int]]) -> None:
+    # Act
+    faults = yars.parse_faults(spec)
+
+    # Assert
+    assert faults == expected_faults
+
+
+@pytest.mark.parametrize("spec", ["404:0.1", "429", "429:a", "429:0.1x", "429:1.5", "429:0.1x0", "5xx:0.6,reset:0.6"])
+def test_parse_faults_invalid(spec: str) -> None:
+    # Act & Assert
+    with pytest.raises(ValueError):
+        yars.parse_faults(spec)
+
+
+@pytest.mark.parametrize("fault, expected_error, expected_injected", [
+    ("429", requests.exceptions.RetryError, 2),
+    ("429_retry_after", requests.exceptions.RetryError, 2),
+    ("5xx", requests.exceptions.RetryError, 2),
+    ("timeout", requests.exceptions.ConnectionError, 2),
+    # Read by requests after the retries of urllib3
+    ("truncated", requests.exceptions.ChunkedEncodingError, 1),
+    ("reset", requests.exceptions.ConnectionError, 2),
+])
+def test_fault_injected(server: MockRedditServer, fault: str, expected_error: type, expected_injected: int) -> None:
+    # Arrange
+    session = create_session(f"{fault}:1", retries=1)
+
+    # Act
+    with pytest.raises(expected_error):
+        session.get(f"{server.url}/search.json", params={"q": "corgi", "limit": 5}, timeout=0.2)
+
+    # Assert
+    assert session.adapters["http://"].injected == {fault: expected_injected}
+    # The connections are still usable once the faults stop
+    session.adapters["http://"].faults = {}
+    assert len(session.get(f"{server.url}/search.json", params={"q": "corgi", "limit": 5}, timeout=1).json()["data"]["children"]) == 5
+
+
+def test_fault_drip(server: MockRedditServer) -> None:
+    # Arrange
+    expected = requests.get(f"{server.url}/search.json", params={"q": "corgi", "limit": 20}).content
+    session = create_session("drip:1")
+    session.adapters["http://"].drip_rate = len(expected) / 0.2
+
+    # Act
+    start = time.perf_counter()
+    response = session.get(f"{server.url}/search.json", params={"q": "corgi", "limit": 20})
+    elapsed = time.perf_counter() - start
+
+    # Assert
+    assert response.status_code == 200 and response.content == expected
+    assert elapsed >= 0.2
+
+
+@pytest.mark.parametrize("faults, expected_burst", [
+    ({"429": (0.1, 5)}, 5),
+    ({"reset": (0.2, 1), "drip": (0.1, 3)}, 1),
+    ({"5xx": (1., 1)}, 1),
+])
+def test_fault_bursts(faults: Dict[str, Tuple[float, int]], expected_burst: int) -> None:
+    # Arrange
+    injector = yars.FaultInjector(faults, seed=1)
+    same_seed = yars.FaultInjector(faults, seed=1)
+
+    # Act
+    draws = list(map(lambda _: injector.draw(), range(200)))
+
+    # Assert
+    assert draws == list(map(lambda _: same_seed.draw(), range(200)))
+    assert injector.injected == Counter(filter(None, draws))
+    assert 0 < sum(injector.injected.values()) and set(injector.injected) <= set(faults)
+    # Bursts in a row make up runs of a multiple of the burst (but for the last one, cut off)
+    runs = "".join(map(lambda d: "x" if d == list(faults)[0] else ".", draws)).split(".")
+    assert all(map(lambda r: len(r) % expected_burst == 0, runs[:-1]))
+
+
+def test_yars_faults(server: MockRedditServer) -> None:
+    # Arrange
+    downloader = yars.YARS(logger=logging.getLogger("test_faults"), base_url=server.url, faults="reset:1",
+                           retries=1, backoff_factor=0.)
+
+    # Act
+    details = downloader.scrape_post_details("/r/corgi/comments/abc/x/")
+
+    # Assert
+    assert details is None
+    assert downloader.session.adapters["http://"].injected == {"reset": 2}
+
+
+def test_yars_faults_cassette(tmp_path: str) -> None:
+    # Act & Assert
+    with pytest.raises(ValueError):
+        yars.YARS(logger=logging.getLogger("test_faults"), faults="429:0.1", record_cassette=f"{tmp_path}/a.jsonl.gz")
+
+
+def test_bench_faults(server: MockRedditServer) -> None:
+    # Act
+    measurements = bench_faults.run(server, "5xx:0.2,reset:0.1", retries=[0, 3], backoff_factors=[0.], concurrencies=[4],
+                                    num_requests=20, timeout=1.)
+
+    # Assert
+    assert list(map(lambda m: (m["retries"], m["posts"] + m["failed"]), measurements)) == [(0, 20), (3, 20)]
+    assert measurements[0]["failed"] == sum(measurements[0]["injected"].values()) > measurements[1]["failed"]
+    assert all(map(lambda m: m["p50_ms"] <= m["p95_ms"] <= m["p99_ms"] <= m["max_ms"], measurements))
@@ -0,0 +1,54 @@
+import importlib
+import pytest
+from typing import Any, Dict, List
+
+from benchmark import bench_import_time
+
+
+@pytest.mark.parametrize("module", list(bench_import_time.APPLICATIONS.values()))
+def test_startup_deferred_modules(module: str) -> None:
+    # Act
+    times = bench_import_time.import_times(f"import {module}")
+
+    # Assert
+    assert module in times and bench_import_time.FLOOR_MODULE in times
+    assert times[module][1] >= times[bench_import_time.FLOOR_MODULE][1]
+    assert list(filter(lambda m: m in times, bench_import_time.DEFERRED_MODULES)) == []
+
+
+def test_yars_defers_cassettes_and_faults() -> None:
+    # Act
+    times = bench_import_time.import_times("import yars.yars")
+
+    # Assert
+    assert "yars.yars" in times
+    assert "yars.cassette" not in times and "yars.faults" not in times
+
+
+@pytest.mark.parametrize("package", ["yars", "download"])
+def test_lazy_exports(package: str) -> None:
+    # Arrange
+    module = importlib.import_module(package)
+
+    # Act
+    exported = list(map(lambda name: getattr(module, name), module.__all__))
+
+    # Assert
+    assert all(map(lambda e: e is not None, exported))
+    assert set(module.__all__) <= set(dir(module))
+    with pytest.raises(AttributeError):
+        getattr(module, "missing")
+
+
+@pytest.mark.parametrize("results, expected_violations", [
+    ({"download CLI": {"over_floor_ms": 40., "deferred": []}}, []),
+    ({"download CLI": {"over_floor_ms": 90., "deferred": []}}, ["download CLI: 90.0 ms over the config models, target 80 ms"]),
+    ({"download CLI": {"over_floor_ms": 40., "deferred": ["requests", "pygments"]},
+      "batch CLI": {"over_floor_ms": 40., "deferred": []}}, ["download CLI: imports requests, pygments at startup"]),
+])
+def test_check_target(results: Dict[str, Dict[str, Any]], expected_violations: List[str]) -> None:
+    # Act
+    violations = bench_import_time.check_target(results, target_ms=80.)
+
+    # Assert
+    assert violations == expected_violations
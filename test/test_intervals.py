@@ -0,0 +1,48 @@
+import datetime as dt
+from typing import List, Tuple
+
+from download import IntervalBuckets
+
+
+def ts(*args: int) -> float:
+    return dt.datetime(*args).timestamp()
+
+
+def test_interval_buckets_release_in_order() -> None:
+    # Arrange
+    buckets = IntervalBuckets(dt.datetime(2026, 1, 1), dt.datetime(2026, 1, 3, 12), "d")
+    assert buckets.expect("a", ts(2026, 1, 1, 10))
+    assert buckets.expect("b", ts(2026, 1, 2, 10))
+    assert buckets.expect("c", ts(2026, 1, 3, 10))
+    assert not buckets.expect("d", ts(2026, 1, 5, 10))
+
+    # Act
+    buckets.add("b", {"created_utc": ts(2026, 1, 2, 10)})
+    released_first = list(buckets.pop_completed())
+    buckets.add("a", None)
+    released_second = list(buckets.pop_completed())
+    buckets.add("c", {"created_utc": ts(2026, 1, 3, 10)})
+    released_third = list(buckets.pop_completed())
+
+    # Assert
+    assert released_first == []
+    assert [(sd, ed, len(items)) for sd, ed, items in released_second] == [
+        (dt.datetime(2026, 1, 1), dt.datetime(2026, 1, 2), 0),
+        (dt.datetime(2026, 1, 2), dt.datetime(2026, 1, 3), 1),
+    ]
+    assert [(sd, ed, len(items)) for sd, ed, items in released_third] == [
+        (dt.datetime(2026, 1, 3), dt.datetime(2026, 1, 4), 1),
+    ]
+    assert buckets.num_pending == 0
+
+
+def test_interval_buckets_empty_intervals() -> None:
+    # Arrange
+    buckets = IntervalBuckets(dt.datetime(2026, 1, 1), dt.datetime(2026, 3, 1), "m")
+
+    # Act
+    released: List[Tuple[dt.datetime, dt.datetime, list]] = list(buckets.pop_completed())
+
+    # Assert
+    assert [(sd, ed) for sd, ed, _ in released] == list(buckets.intervals)
+    assert len(released) == 3
@@ -0,0 +1,79 @@
+import os
+from typing import Any, Dict
+
+from download import RunJournal
+
+FINGERPRINT: Dict[str, Any] = {"phrase": "corgi", "limit": 100}
+
+
+def test_journal_resumes_recorded_results(tmp_path) -> None:
+    # Arrange
+    journal = RunJournal(str(tmp_path), FINGERPRINT, fsync_every=2)
+    journal.record("reddit", "/r/a/", {"id": "a", "comments": []})
+    journal.record("author", "bob", [{"author": "bob"}])
+    journal.close()
+
+    # Act
+    resumed = RunJournal(str(tmp_path), FINGERPRINT)
+
+    # Assert
+    assert resumed.num_resumed == 2
+    assert resumed.has("reddit", "/r/a/") and not resumed.has("reddit", "bob")
+    assert resumed.get("reddit", "/r/a/") == {"id": "a", "comments": []}
+    assert resumed.get("author", "bob") == [{"author": "bob"}]
+    resumed.close()
+
+
+def test_journal_reads_back_results_of_current_run(tmp_path) -> None:
+    # Arrange
+    journal = RunJournal(str(tmp_path), FINGERPRINT, fsync_every=100)
+    journal.record("author", "bob", [{"author": "bob"}])
+    journal.record("author", "alice", [{"author": "alice"}])
+
+    # Act
+    alice, bob = journal.get("author", "alice"), journal.get("author", "bob")
+
+    # Assert
+    assert (alice, bob) == ([{"author": "alice"}], [{"author": "bob"}])
+    assert journal.num_resumed == 0 and not journal.has("author", "bob")
+    journal.close()
+
+
+def test_journal_other_fingerprint_starts_anew(tmp_path) -> None:
+    # Arrange
+    journal = RunJournal(str(tmp_path), FINGERPRINT)
+    journal.record("reddit", "/r/a/", {"id": "a"})
+    journal.close()
+
+    # Act
+    other = RunJournal(str(tmp_path), FINGERPRINT | {"limit": 10})
+
+    # Assert
+    assert other.num_resumed == 0
+    other.close()
+
+
+def test_journal_tolerates_torn_lines(tmp_path) -> None:
+    # Arrange
+    journal = RunJournal(str(tmp_path), FINGERPRINT)
+    journal.record("reddit", "/r/a/", {"id": "a"})
+    journal.record("reddit", "/r/b/", {"id": "b"})
+    journal.close()
+    # Interrupted while writing: the last result and its journal line are torn
+    with open(os.path.join(tmp_path, RunJournal.RESULTS_FILE), "rb+") as f:
+        f.truncate(os.path.getsize(os.path.join(tmp_path, RunJournal.RESULTS_FILE)) - 3)
+    with open(os.path.join(tmp_path, RunJournal.JOURNAL_FILE), "ab") as f:
+        f.write(b'{"kind": "reddit", "key": "/r/c/", "off')
+
+    # Act
+    resumed = RunJournal(str(tmp_path), FINGERPRINT)
+    resumed.record("reddit", "/r/d/", {"id": "d"})
+    resumed.close()
+    resumed_again = RunJournal(str(tmp_path), FINGERPRINT)
+
+    # Assert
+    assert resumed.num_resumed == 1
+    assert resumed_again.num_resumed == 2
+    assert resumed_again.get("reddit", "/r/d/") == {"id": "d"}
+    resumed_again.close(is_completed=True)
+    assert os.listdir(tmp_path) == []
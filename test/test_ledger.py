@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import datetime as dt
+import threading
+import pytest
+from typing import Any, Dict, Iterator, List, Tuple
+
+from download import LedgerCoordinator, LedgerWorker, TaskLedger, ThreadExecutor
+from model import EloadType, LoadParams
+from test.test_pipeline import FakeYARS, create_params
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_task_ledger_leases() -> None:
+    # Arrange
+    clock = FakeClock()
+    ledger = TaskLedger(":memory:", lease_seconds=60., max_attempts=2, clock=clock)
+    ledger.add("reddit", [("a", 3.), ("b", 1.), ("c", 2.)])
+
+    # Act
+    first_claim = ledger.claim("reddit", "w1", 2)
+    second_claim = ledger.claim("reddit", "w2", 2)
+    ledger.complete("reddit", "b", {"title": "b"})
+    clock.now += 61.
+    reclaimed = ledger.claim("reddit", "w3", 1)
+    ledger.fail("reddit", "c", "w1")
+    ledger.fail("reddit", "c", "w3")
+
+    # Assert
+    assert first_claim == ["b", "c"]
+    assert second_claim == ["a"]
+    assert reclaimed == ["c"]
+    assert ledger.counts() == {"reddit": {"done": 1, "failed": 1, "leased": 1}}
+    assert ledger.results("reddit", keys=["b", "c"]) == [{"title": "b"}]
+
+
+def test_task_ledger_gives_up_expired_leases() -> None:
+    # Arrange
+    clock = FakeClock()
+    ledger = TaskLedger(":memory:", lease_seconds=60., max_attempts=2, clock=clock)
+    ledger.add("reddit", [("a", 1.)])
+
+    # Act
+    claims = [ledger.claim("reddit", "w1", 1)]
+    clock.now += 61.
+    claims.append(ledger.claim("reddit", "w2", 1))
+    clock.now += 61.
+    claims.append(ledger.claim("reddit", "w3", 1))
+
+    # Assert
+    assert claims == [["a"], ["a"], []]
+    assert ledger.counts() == {"reddit": {"failed": 1}}
+
+
+def test_task_ledger_renew() -> None:
+    # Arrange
+    clock = FakeClock()
+    ledger = TaskLedger(":memory:", lease_seconds=60., clock=clock)
+    ledger.add("reddit", [("a", 1.), ("b", 2.)])
+    ledger.claim("reddit", "w1", 2)
+
+    # Act
+    clock.now += 40.
+    num_renewed = ledger.renew("reddit", ["a", "b"], "w1")
+    num_renewed_by_other = ledger.renew("reddit", ["a"], "w2")
+    clock.now += 40.
+    claimed_renewed = ledger.claim("reddit", "w2", 2)
+    clock.now += 21.
+    claimed_expired = ledger.claim("reddit", "w2", 2)
+
+    # Assert
+    assert (num_renewed, num_renewed_by_other) == (2, 0)
+    assert claimed_renewed == []
+    assert claimed_expired == ["a", "b"]
+
+
+def test_task_ledger_is_finished() -> None:
+    # Arrange
+    ledger = TaskLedger(":memory:")
+    ledger.add("author", [("op0", None)])
+
+    # Act
+    finished_before_search: List[bool] = [ledger.is_finished()]
+    ledger.set_meta("is_search_done", True)
+    finished_before_search.append(ledger.is_finished())
+    ledger.claim("author", "w1", 10)
+    ledger.complete("author", "op0", [{"author": "op0"}])
+
+    # Assert
+    assert finished_before_search == [False, False]
+    assert ledger.is_finished()
+
+
+def test_task_ledger_complete_with_children() -> None:
+    # Arrange
+    ledger = TaskLedger(":memory:")
+    ledger.add("reddit", [("a", 1.), ("b", 2.)])
+
+    def broken_children() -> Iterator[Tuple[str, float | None]]:
+        yield "op1", None
+        raise RuntimeError("crashed")
+
+    # Act
+    num_added = ledger.complete_with_children("reddit", "a", {"title": "a"}, "author", [("op0", None), ("op1", None)])
+    with pytest.raises(RuntimeError):
+        ledger.complete_with_children("reddit", "b", {"title": "b"}, "author", broken_children())
+
+    # Assert
+    assert num_added == 2
+    assert ledger.counts() == {"reddit": {"done": 1, "pending": 1}, "author": {"pending": 2}}
+
+
+def test_ledger_coordinator_resume(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    ledger = TaskLedger(os.path.join(str(tmp_path), "ledger.sqlite"))
+    logger = logging.getLogger("test_ledger")
+    LedgerCoordinator(FakeYARS(num_reddits=1), download_params, LoadParams(
+        load_type=EloadType.INCREMENTAL, date_from=dt.datetime(2026, 1, 1), date_to=dt.datetime(2026, 1, 10)),
+        "www.reddit.com", ledger, logger=logger)
+
+    # Act
+    resumed = LedgerCoordinator(FakeYARS(num_reddits=1), download_params, LoadParams(
+        load_type=EloadType.INCREMENTAL, date_from=dt.datetime(2026, 1, 1), date_to=dt.datetime(2026, 1, 12)),
+        "www.reddit.com", ledger, logger=logger)
+
+    # Assert
+    assert resumed.load_params.date_to == dt.datetime(2026, 1, 10)
+    with pytest.raises(ValueError):
+        LedgerCoordinator(FakeYARS(num_reddits=1), download_params.model_copy(update={"phrase": "shiba"}),
+                          resumed.load_params, "www.reddit.com", ledger, logger=logger)
+
+
+def test_distributed_download(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    ledger_file = os.path.join(str(tmp_path), "ledger.sqlite")
+    logger = logging.getLogger("test_ledger")
+    downloader = FakeYARS(num_reddits=30)
+    coordinator = LedgerCoordinator(downloader, download_params, load_params, "www.reddit.com",
+                                    TaskLedger(ledger_file), logger=logger)
+    workers = [LedgerWorker(downloader, TaskLedger(ledger_file, max_attempts=1), ThreadExecutor(concurrency=2),
+                            f"w{i}", logger=logger, idle_interval=0.01) for i in range(3)]
+    threads = [threading.Thread(target=worker.run) for worker in workers]
+
+    # Act
+    for thread in threads:
+        thread.start()
+    coordinator.search()
+    counts = coordinator.wait(poll_interval=0.01)
+    for thread in threads:
+        thread.join()
+    num_saved = coordinator.save()
+
+    # Assert
+    assert counts == {"reddit": {"done": 23, "failed": 1}, "author": {"done": 8}}
+    assert num_saved == 23
+    assert sorted(downloader.fetched_reddits) == sorted(set(downloader.fetched_reddits))
+    assert sorted(downloader.fetched_authors) == sorted(set(downloader.fetched_authors))
+    assert sum(map(lambda w: w.stats["reddits"], workers)) == 23
+    assert len(os.listdir(download_params.output_reddits_folder)) == len(os.listdir(download_params.output_authors_folder)) == 10
+
+
+def test_ledger_worker_renews_leases(tmp_path) -> None:
+    # Arrange
+    ledger_file = os.path.join(str(tmp_path), "ledger.sqlite")
+    ledger = TaskLedger(ledger_file, lease_seconds=0.3)
+    ledger.add("reddit", [("/r/x/comments/1/", 1.)])
+    ledger.set_meta("is_author_downloaded", False)
+    ledger.set_meta("is_search_done", True)
+    claims: List[List[str]] = list([])
+
+    class SlowYARS(FakeYARS):
+        def scrape_post_details(self, permalink: str) -> Dict[str, Any] | None:
+            time.sleep(0.6)
+            claims.append(TaskLedger(ledger_file).claim("reddit", "w2", 1))
+            return super().scrape_post_details(permalink)
+
+    worker = LedgerWorker(SlowYARS(num_reddits=1), ledger, ThreadExecutor(concurrency=1), "w1",
+                          logger=logging.getLogger("test_ledger"), idle_interval=0.01, renew_interval=0.05)
+
+    # Act
+    stats = worker.run()
+
+    # Assert
+    assert claims == [[]]
+    assert stats["reddits"] == 1
+    assert ledger.counts() == {"reddit": {"done": 1}}
@@ -0,0 +1,130 @@
+import os
+import logging
+import pytest
+from typing import Any, Dict, List
+
+from yars.media import MediaDownloader, media_urls
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str] | None = None) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise IOError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+class FakeSession:
+    """ Serves given contents by URL (with their ETags), honouring the Range and If-Range headers """
+    def __init__(self, contents: Dict[str, bytes], etag: str = '"v1"') -> None:
+        self.contents = contents
+        self.etag = etag
+        self.requests = list([])
+
+    def get(self, url: str, stream: bool = False, timeout: int | None = None, headers: Dict[str, str] | None = None):
+        self.requests.append((url, headers))
+        content = self.contents[url]
+        if headers and "Range" in headers and headers.get("If-Range") == self.etag:
+            offset = int(headers["Range"].split("=")[1].rstrip("-"))
+            return FakeResponse(206, content[offset:]) if offset < len(content) else FakeResponse(416, b"")
+        return FakeResponse(200, content, headers={"ETag": self.etag})
+
+
+@pytest.mark.parametrize("posts, expected_urls", [
+    ([{"image_url": "https://i.redd.it/a.jpg", "thumbnail_url": "https://b.thumbs.redditmedia.com/a.jpg"}],
+     ["https://i.redd.it/a.jpg", "https://b.thumbs.redditmedia.com/a.jpg"]),
+    ([{"image_url": "https://i.redd.it/a.jpg"}, {"image_url": "https://i.redd.it/a.jpg", "thumbnail_url": "nsfw"}],
+     ["https://i.redd.it/a.jpg"]),
+    ([{"title": "no media", "thumbnail_url": "default"}], []),
+])
+def test_media_urls(posts: List[Dict[str, Any]], expected_urls: List[str]) -> None:
+    # Arrange
+    # Act
+    urls = list(media_urls(posts))
+
+    # Assert
+    assert urls == expected_urls
+
+
+def test_download_skips_present_files(tmp_path) -> None:
+    # Arrange
+    (tmp_path / "a.jpg").write_bytes(b"present")
+    session = FakeSession({"https://i.redd.it/a.jpg": b"remote"})
+    downloader = MediaDownloader(str(tmp_path), session=session, logger=logging.getLogger("test_media"))
+
+    # Act
+    results = downloader.download(["https://i.redd.it/a.jpg"])
+
+    # Assert
+    assert results == {"https://i.redd.it/a.jpg": os.path.join(str(tmp_path), "a.jpg")}
+    assert session.requests == []
+    assert downloader.stats["skipped"] == 1
+
+
+@pytest.mark.parametrize("validator, expected_headers, expected_stat", [
+    ('"v1"', {"Range": "bytes=4-", "If-Range": '"v1"'}, "resumed"),
+    # Changed since the partial download
+    ('"v0"', {"Range": "bytes=4-", "If-Range": '"v0"'}, "downloaded"),
+    (None, {}, "downloaded"),
+])
+def test_download_resumes_partial_files(tmp_path, validator: str | None, expected_headers: Dict[str, str],
+                                        expected_stat: str) -> None:
+    # Arrange
+    (tmp_path / "a.jpg.part").write_bytes(b"0123" if validator == '"v1"' else b"abcd")
+    if validator is not None:
+        (tmp_path / "a.jpg.part.validator").write_text(validator)
+    session = FakeSession({"https://i.redd.it/a.jpg": b"0123456789"})
+    downloader = MediaDownloader(str(tmp_path), session=session, logger=logging.getLogger("test_media"))
+
+    # Act
+    downloader.download(["https://i.redd.it/a.jpg"])
+
+    # Assert
+    assert (tmp_path / "a.jpg").read_bytes() == b"0123456789"
+    assert sorted(os.listdir(tmp_path)) == [".media_index.json", "a.jpg"]
+    assert session.requests == [("https://i.redd.it/a.jpg", expected_headers)]
+    assert downloader.stats[expected_stat] == 1
+
+
+def test_download_deduplicates_same_content(tmp_path) -> None:
+    # Arrange
+    session = FakeSession({"https://i.redd.it/a.jpg": b"same", "https://i.redd.it/b.jpg": b"same",
+                           "https://i.redd.it/c.jpg": b"other"})
+    downloader = MediaDownloader(str(tmp_path), max_workers=1, session=session, logger=logging.getLogger("test_media"))
+
+    # Act
+    results = downloader.download(["https://i.redd.it/a.jpg", "https://i.redd.it/b.jpg", "https://i.redd.it/c.jpg"])
+    second_results = MediaDownloader(str(tmp_path), session=session,
+                                     logger=logging.getLogger("test_media")).download(["https://i.redd.it/b.jpg"])
+
+    # Assert
+    assert sorted(os.listdir(tmp_path)) == [".media_index.json", "a.jpg", "c.jpg"]
+    assert results["https://i.redd.it/b.jpg"] == results["https://i.redd.it/a.jpg"]
+    assert second_results["https://i.redd.it/b.jpg"] == results["https://i.redd.it/a.jpg"]
+    assert len(session.requests) == 3
+
+
+def test_download_unique_names(tmp_path) -> None:
+    # Arrange
+    urls = ["https://preview.redd.it/a.jpg?width=108", "https://preview.redd.it/a.jpg?width=640", "https://i.redd.it/a.jpg"]
+    session = FakeSession(dict(map(lambda url: (url, url.encode("utf-8")), urls)))
+    downloader = MediaDownloader(str(tmp_path), session=session, logger=logging.getLogger("test_media"))
+
+    # Act
+    results = downloader.download(urls)
+
+    # Assert
+    assert list(results) == urls
+    assert results[urls[0]] == os.path.join(str(tmp_path), "a.jpg")
+    assert len(set(results.values())) == 3
+    assert all(map(lambda url: open(results[url], "rb").read() == url.encode("utf-8"), urls))
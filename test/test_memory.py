@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import logging
+import datetime as dt
+import multiprocessing
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmark import bench_memory
+from download import DownloadPipeline, MemoryTracker
+from model import EloadType, LoadParams
+from test.test_pipeline import FakeYARS, create_params
+
+
+def allocate(size_mb: int) -> int:
+    """ Holds the memory a while, so the tracker takes its snapshot """
+    blocks = list(map(lambda _: bytearray(1024), range(size_mb * 1024)))
+    time.sleep(0.2)
+    return len(blocks)
+
+
+def test_memory_tracker_merges_threads_and_processes(tmp_path) -> None:
+    # Arrange
+    memory = MemoryTracker(os.path.join(str(tmp_path), "memory"), interval=0.01)
+    fn = memory.profiled(allocate, "details")
+    processes = list(map(lambda _: multiprocessing.Process(target=fn, args=(8,)), range(2)))
+
+    # Act
+    for process in processes:
+        process.start()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(fn, [2, 2]))
+    with memory.stage("serialization"):
+        allocate(1)
+    for process in processes:
+        process.join()
+    json_file, report_file = memory.merge()
+
+    # Assert
+    with open(json_file) as f:
+        report = json.load(f)
+    with open(report_file) as f:
+        text = f.read()
+    assert len(report["processes"]) == 3 and report["processes"][0]["is_main"]
+    assert all(map(lambda p: p["peak_rss_mb"] > 0 and p["peak_traced_mb"] > 0, report["processes"]))
+    assert set(report["stages"]) == {"details", "serialization"}
+    details = report["stages"]["details"]
+    assert details["process"] != "MainProcess" and 8 <= details["peak_mb"] < 12
+    assert 1 <= report["stages"]["serialization"]["peak_mb"] < details["peak_mb"]
+    assert "test_memory.py" in details["top"][0]["site"] and details["top"][0]["size_mb"] >= 8 / (1 + memory.growth)
+    assert "Top allocation sites of stages 'details'" in text
+    assert not os.path.exists(memory.parts_folder)
+
+
+def test_download_pipeline_memory(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    memory = MemoryTracker(os.path.join(download_params.output_profile_folder, "memory"))
+
+    # Act
+    DownloadPipeline(FakeYARS(num_reddits=30), download_params, load_params, "www.reddit.com",
+                     logger=logging.getLogger("test_memory"), memory=memory).run()
+    json_file, _ = memory.merge()
+
+    # Assert
+    with open(json_file) as f:
+        stages = json.load(f)["stages"]
+    assert {"search", "details", "authors", "reddits", "coordinator", "author collection", "serialization"} == set(stages)
+
+
+@pytest.mark.parametrize("peaks, budget_mb, expected_violations", [
+    ([90., 120.], 200., 0),
+    ([90., 210.], 200., 1),
+    ([250., 210.], 200., 2),
+])
+def test_check_budget(peaks: List[float], budget_mb: float, expected_violations: int) -> None:
+    # Arrange
+    measurements: List[Dict[str, Any]] = list(map(lambda p: {"executor": "thread", "concurrency": 4, "posts": 1000,
+                                                             "peak_rss_mb": p}, peaks))
+
+    # Act
+    violations = bench_memory.check_budget(measurements, budget_mb)
+
+    # Assert
+    assert len(violations) == expected_violations
+    assert all(map(lambda v: "over the budget of 200.0 MB" in v, violations))
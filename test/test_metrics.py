@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import datetime as dt
+import urllib.request
+import urllib.error
+import pytest
+from typing import List
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+from download import DownloadPipeline, MetricsCollector, MetricsServer
+from model import EloadType, LoadParams
+from yars.sessions import BaseSession
+from test.test_pipeline import FakeYARS, create_params
+
+
+class FakeAdapter(BaseAdapter):
+    """ Adapter answering every request with the given status code and body (after the latency) """
+
+    def __init__(self, status_code: int, body: bytes, latency: float = 0.) -> None:
+        super().__init__()
+        self.status_code = status_code
+        self.body = body
+        self.latency = latency
+
+    def send(self, request, **kwargs) -> Response:
+        time.sleep(self.latency)
+        response = Response()
+        response.status_code = self.status_code
+        response._content = self.body
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.mark.parametrize("url, status_code, expected_lines", [
+    ("https://www.reddit.com/search.json?q=corgi", 200,
+     ['yars_requests_total{endpoint="search",code="200"} 1', 'yars_response_bytes_total{endpoint="search"} 4']),
+    ("https://www.reddit.com/r/x/comments/abc/title/.json", 200,
+     ['yars_requests_total{endpoint="post_details",code="200"} 1']),
+    ("https://www.reddit.com/user/corgi_lover/.json?limit=1", 429,
+     ['yars_requests_total{endpoint="user_data",code="429"} 1']),
+    ("https://www.reddit.com/r/corgi/hot.json", 418,
+     ['yars_requests_total{endpoint="subreddit_listing",code="other"} 1']),
+    ("https://www.reddit.com/r/corgi/search.json?q=x", 200,
+     ['yars_requests_total{endpoint="search",code="200"} 1']),
+])
+def test_metrics_collector_requests(url: str, status_code: int, expected_lines: List[str]) -> None:
+    # Arrange
+    metrics = MetricsCollector()
+    session = BaseSession()
+    session.mount("https://", FakeAdapter(status_code, b"body"))
+    session.hooks["response"].append(metrics.on_response)
+
+    # Act
+    session.get(url)
+    text = metrics.render()
+
+    # Assert
+    for line in expected_lines:
+        assert line in text.splitlines()
+
+
+def test_metrics_collector_latency_histogram() -> None:
+    # Arrange
+    metrics = MetricsCollector()
+    session = BaseSession()
+    session.mount("https://", FakeAdapter(200, b"{}", latency=0.12))
+    session.hooks["response"].append(metrics.on_response)
+
+    # Act
+    for _ in range(3):
+        session.get("https://www.reddit.com/search.json")
+    lines = metrics.render().splitlines()
+
+    # Assert
+    assert 'yars_request_duration_seconds_bucket{endpoint="search",le="0.1"} 0' in lines
+    assert 'yars_request_duration_seconds_bucket{endpoint="search",le="0.25"} 3' in lines
+    assert 'yars_request_duration_seconds_bucket{endpoint="search",le="+Inf"} 3' in lines
+    assert 'yars_request_duration_seconds_count{endpoint="search"} 3' in lines
+
+
+def test_metrics_collector_local_metrics() -> None:
+    # Arrange
+    metrics = MetricsCollector()
+    depth = list([5])
+
+    # Act
+    metrics.set_gauge("download_queue_depth", lambda: depth[0], queue="details")
+    metrics.set_gauge("download_workers_alive", 4, stage="reddits")
+    metrics.inc("download_worker_restarts_total", stage="reddits")
+    metrics.inc("download_worker_restarts_total", stage="reddits")
+    for num_items in [0, 5, 50, 50]:
+        metrics.observe_interval_items("reddits", num_items)
+    depth[0] = 7
+    lines = metrics.render().splitlines()
+    metrics.remove_gauge("download_workers_alive", stage="reddits")
+
+    # Assert
+    assert 'download_queue_depth{queue="details"} 7' in lines
+    assert 'download_workers_alive{stage="reddits"} 4' in lines
+    assert 'download_worker_restarts_total{stage="reddits"} 2' in lines
+    assert 'download_interval_items_bucket{kind="reddits",le="0"} 1' in lines
+    assert 'download_interval_items_bucket{kind="reddits",le="10"} 2' in lines
+    assert 'download_interval_items_bucket{kind="reddits",le="100"} 4' in lines
+    assert 'download_interval_items_sum{kind="reddits"} 105.0' in lines
+    assert "download_workers_alive" not in metrics.render()
+
+
+@pytest.mark.parametrize("phrase, expected_label", [
+    ("corgi", 'phrase="corgi"'),
+    ('say "corgi"', 'phrase="say \\"corgi\\""'),
+    ("a\\b\nc", 'phrase="a\\\\b\\nc"'),
+])
+def test_metrics_collector_escapes_labels(phrase: str, expected_label: str) -> None:
+    # Arrange
+    metrics = MetricsCollector()
+
+    # Act
+    metrics.set_gauge("download_queue_depth", 3, phrase=phrase, queue="details")
+    lines = metrics.render().splitlines()
+
+    # Assert
+    assert f'download_queue_depth{{{expected_label},queue="details"}} 3' in lines
+
+
+def test_metrics_server() -> None:
+    # Arrange
+    metrics = MetricsCollector()
+    metrics.inc("download_polls_total", phrase="corgi")
+    server = MetricsServer(metrics, 0).start()
+
+    # Act
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            text = response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other")
+    finally:
+        server.stop()
+
+    # Assert
+    assert 'download_polls_total{phrase="corgi"} 1' in text.splitlines()
+
+
+def test_download_pipeline_metrics(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    metrics = MetricsCollector()
+
+    # Act
+    stats = DownloadPipeline(FakeYARS(num_reddits=30), download_params, load_params, "www.reddit.com",
+                             logger=logging.getLogger("test_metrics"), metrics=metrics).run()
+    lines = metrics.render().splitlines()
+
+    # Assert
+    assert f'download_interval_items_count{{kind="reddits"}} {stats["intervals"]}' in lines
+    assert f'download_interval_items_sum{{kind="reddits"}} {float(stats["downloaded"])}' in lines
+    assert not any(map(lambda line: line.startswith("download_queue_depth{"), lines))
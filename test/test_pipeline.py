@@ -0,0 +1,150 @@
+import os
+import json
+import logging
+import datetime as dt
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List
+
+import util
+from download import DownloadPipeline, RunJournal, SharedResults
+from model import DownloadParams, EloadType, LoadParams
+
+
+class FakeYARS:
+    """ Serves one reddit every 10 hours, each with its author and two commenters """
+    def __init__(self, num_reddits: int) -> None:
+        self.num_reddits = num_reddits
+        self.start = dt.datetime(2026, 1, 1).timestamp()
+        self.fetched_reddits: List[str] = list([])
+        self.fetched_authors: List[str] = list([])
+
+    def search_reddit_pages(self, query: str, limit: int = 10, page_size: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        headers = [{"link": f"https://www.reddit.com/r/x/comments/{i}/", "author": f"op{i % 3}", "num_comments": 2,
+                    "created_utc": self.start + i * 36000}
+                   for i in range(min(limit, self.num_reddits))]
+        for i in range(0, len(headers), page_size):
+            yield headers[i:i + page_size]
+
+    def scrape_post_details(self, permalink: str) -> Dict[str, Any] | None:
+        self.fetched_reddits.append(permalink)
+        i = int(permalink.split("/")[4])
+        if i == 3:
+            return None
+        return {"permalink": permalink, "author": f"op{i % 3}", "created_utc": self.start + i * 36000,
+                "comments": [{"author": f"c{i % 5}", "replies": [{"author": "[deleted]", "replies": []}]}]}
+
+    def scrape_user_data(self, username: str, limit: int = 10) -> List[Dict[str, Any]]:
+        self.fetched_authors.append(username)
+        return [{"author": username}]
+
+
+def create_params(tmp_path: str, executor: str) -> DownloadParams:
+    return DownloadParams(phrase="corgi", limit=1000, date_interval="d", default_start_date=dt.datetime(2026, 1, 1),
+                          output_reddits_folder=os.path.join(tmp_path, "reddits"),
+                          output_authors_folder=os.path.join(tmp_path, "authors"),
+                          output_journal_folder=os.path.join(tmp_path, "journal"),
+                          output_profile_folder=os.path.join(tmp_path, "profiles"),
+                          output_reddits_file_pattern="reddits_corgi_{start_date}_{end_date}.json",
+                          output_authors_file_pattern="authors_corgi_{start_date}_{end_date}.json",
+                          is_author_downloaded=True, is_date_to_previous_day=True, is_journal_used=True, is_multiprocessing_used=True,
+                          num_processes=4, is_curated_user_agents_used=False, executor=executor,
+                          details_concurrency=4, authors_concurrency=2, batch_size=1, task_timeout=None, rate_limit=None,
+                          is_auto_concurrency_used=False, progress_interval=10., metrics_port=None,
+                          is_profiling_used=False, is_memory_tracking_used=False, api_url="https://www.reddit.com", record_cassette=None,
+                          replay_cassette=None, replay_latency_scale=1., faults=None, retries=5, backoff_factor=2.)
+
+
+@pytest.mark.parametrize("executor", ["thread", "async"])
+def test_download_pipeline(tmp_path, executor: str) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), executor)
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    downloader = FakeYARS(num_reddits=30)
+
+    # Act
+    stats = DownloadPipeline(downloader, download_params, load_params, "www.reddit.com",
+                             logger=logging.getLogger("test_pipeline")).run()
+
+    # Assert
+    reddit_files = sorted(os.listdir(download_params.output_reddits_folder))
+    author_files = sorted(os.listdir(download_params.output_authors_folder))
+    saved_reddits = [r for f in reddit_files for r in json.load(open(os.path.join(download_params.output_reddits_folder, f)))]
+    assert stats == {"found": 24, "downloaded": 23, "failed": 1, "authors": 8, "intervals": 10, "resumed": 0, "shared": 0}
+    assert len(reddit_files) == len(author_files) == 10
+    assert len(saved_reddits) == 23
+    assert sorted(downloader.fetched_authors) == sorted(set(downloader.fetched_authors))
+    for reddit_file, author_file in zip(reddit_files, author_files):
+        reddits = json.load(open(os.path.join(download_params.output_reddits_folder, reddit_file)))
+        authors = json.load(open(os.path.join(download_params.output_authors_folder, author_file)))
+        assert sorted(map(lambda a: a[0]["author"], authors)) == sorted(util.collect_authors(reddits))
+
+
+def test_download_pipeline_resumes_from_journal(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    downloader = FakeYARS(num_reddits=30)
+    # Interrupted run: 5 reddits and 2 authors completed
+    journal = RunJournal(download_params.output_journal_folder, download_params.journal_fingerprint())
+    for i in range(5):
+        journal.record("reddit", f"/r/x/comments/{i}/", downloader.scrape_post_details(f"/r/x/comments/{i}/"))
+    for name in ["op0", "c0"]:
+        journal.record("author", name, downloader.scrape_user_data(name))
+    journal.close()
+    downloader = FakeYARS(num_reddits=30)
+
+    # Act
+    journal = RunJournal(download_params.output_journal_folder, download_params.journal_fingerprint())
+    pipeline = DownloadPipeline(downloader, download_params, load_params, "www.reddit.com",
+                                logger=logging.getLogger("test_pipeline"), journal=journal)
+    stats = pipeline.run()
+    journal.close(is_completed=True)
+
+    # Assert
+    # Written authors are kept in the journal only
+    assert pipeline._author_results == {} and len(pipeline._author_references) == 0
+    assert len(pipeline._released_authors) == 8
+    author_files = sorted(os.listdir(download_params.output_authors_folder))
+    saved_authors = [a[0]["author"] for f in author_files for a in json.load(open(os.path.join(download_params.output_authors_folder, f)))]
+    assert len(author_files) == 10 and set(saved_authors) == set(downloader.fetched_authors) | {"op0", "c0"}
+    assert stats["resumed"] == 7
+    assert stats["downloaded"] == 23
+    assert len(downloader.fetched_reddits) == 19
+    assert "op0" not in downloader.fetched_authors and "c0" not in downloader.fetched_authors
+    assert os.listdir(download_params.output_journal_folder) == []
+
+
+def test_download_pipelines_share_results(tmp_path) -> None:
+    # Arrange
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    downloader = FakeYARS(num_reddits=30)
+    shared = SharedResults()
+    pipelines = list([])
+    for phrase in ["corgi", "dog"]:
+        download_params = create_params(os.path.join(str(tmp_path), phrase), "thread")
+        os.makedirs(download_params.output_reddits_folder)
+        os.makedirs(download_params.output_authors_folder)
+        pipelines.append(DownloadPipeline(downloader, download_params, load_params, "www.reddit.com",
+                                          logger=logging.getLogger("test_pipeline"), shared=shared))
+
+    # Act
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        all_stats = list(pool.map(lambda p: p.run(), pipelines))
+
+    # Assert
+    # Only the failed reddit may be downloaded again (if it failed before the other phrase claimed it)
+    downloaded_reddits = list(filter(lambda r: r != "/r/x/comments/3/", downloader.fetched_reddits))
+    assert len(downloaded_reddits) == len(set(downloaded_reddits)) == 23
+    assert sorted(downloader.fetched_authors) == sorted(set(downloader.fetched_authors))
+    for stats, pipeline in zip(all_stats, pipelines):
+        assert stats["downloaded"] == 23 and stats["authors"] == 8
+        assert len(os.listdir(pipeline.download_params.output_authors_folder)) == 10
+    assert sum(map(lambda s: s["shared"], all_stats)) >= 23 + 8
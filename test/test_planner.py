@@ -0,0 +1,66 @@
+import os
+import json
+import logging
+import datetime as dt
+import pytest
+
+from download import DownloadPlanner
+from download.planner import REDDIT_BYTES, COMMENT_BYTES, AUTHOR_BYTES
+from model import EloadType, LoadParams
+from test.test_pipeline import FakeYARS, create_params
+
+
+@pytest.mark.parametrize("num_reddits, max_pages, expected_is_sampled, expected_reddits", [
+    (50, None, False, 50),
+    (250, None, False, 142),
+    (250, 1, True, 1000),
+    (50, 1, False, 50),
+])
+def test_download_planner(tmp_path, num_reddits: int, max_pages: int | None, expected_is_sampled: bool,
+                          expected_reddits: int) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 2, 28, 23, 59, 59))
+    downloader = FakeYARS(num_reddits)
+    planner = DownloadPlanner(downloader, download_params, load_params, "www.reddit.com",
+                              logger=logging.getLogger("test"), max_pages=max_pages)
+
+    # Act
+    download_plan = planner.plan()
+
+    # Assert
+    assert downloader.fetched_reddits == [] and downloader.fetched_authors == []
+    assert download_plan["is_sampled"] == expected_is_sampled
+    assert download_plan["reddits"] == expected_reddits
+    assert download_plan["comments"] == 2 * expected_reddits
+    assert download_plan["detail_requests"] == expected_reddits
+    assert download_plan["author_requests"][0] <= download_plan["author_requests"][1] == download_plan["author_requests"][0] + 2 * expected_reddits
+    assert download_plan["intervals"] == 59
+    assert download_plan["files"] == 2 * 59
+    assert download_plan["bytes"][0] == expected_reddits * (REDDIT_BYTES + 2 * COMMENT_BYTES) + download_plan["author_requests"][0] * AUTHOR_BYTES
+
+
+def test_download_planner_calibration(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 31, 23, 59, 59))
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    reddits_file = os.path.join(download_params.output_reddits_folder, "reddits_corgi_2025-12-01T00:00:00_2025-12-02T00:00:00.json")
+    authors_file = os.path.join(download_params.output_authors_folder, "authors_corgi_2025-12-01T00:00:00_2025-12-02T00:00:00.json")
+    with open(reddits_file, "w") as f:
+        json.dump([{"author": "op", "num_comments": 0, "body": "x" * 1000}] * 4, f, indent=4)
+    with open(authors_file, "w") as f:
+        json.dump([[{"author": "op", "body": "x" * 100}]] * 4, f, indent=4)
+    planner = DownloadPlanner(FakeYARS(10), download_params, load_params, "www.reddit.com", logger=logging.getLogger("test"))
+
+    # Act
+    download_plan = planner.plan()
+
+    # Assert
+    reddit_bytes = os.path.getsize(reddits_file) / 4
+    comment_bytes = reddit_bytes * COMMENT_BYTES / REDDIT_BYTES
+    author_bytes = os.path.getsize(authors_file) / 4
+    assert download_plan["bytes"][0] == pytest.approx(10 * (reddit_bytes + 2 * comment_bytes) + 3 * author_bytes)
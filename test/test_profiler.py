@@ -0,0 +1,183 @@
+import os
+import time
+import pstats
+import threading
+import logging
+import datetime as dt
+import multiprocessing
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from download import DownloadPipeline, RunProfiler, profiler as profiler_module
+from model import EloadType, LoadParams
+from test.test_pipeline import FakeYARS, create_params
+
+
+def busy_wait(seconds: float) -> float:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return seconds
+
+
+def read_stacks(stacks_file: str) -> Dict[str, int]:
+    """ Number of samples by stage (root of the stacks) """
+    samples: Dict[str, int] = {}
+    with open(stacks_file) as f:
+        for line in f:
+            stack, count = line.rsplit(" ", 1)
+            stage = stack.split(";")[0]
+            samples[stage] = samples.get(stage, 0) + int(count)
+    return samples
+
+
+def test_run_profiler_merges_threads_and_processes(tmp_path) -> None:
+    # Arrange
+    profiler = RunProfiler(os.path.join(str(tmp_path), "profile"), interval=0.001)
+    fn = profiler.profiled(busy_wait, "details")
+    processes = list(map(lambda _: multiprocessing.Process(target=fn, args=(0.1,)), range(2)))
+
+    # Act
+    for process in processes:
+        process.start()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(fn, [0.1, 0.1]))
+    with profiler.stage("serialization"):
+        busy_wait(0.05)
+    for process in processes:
+        process.join()
+    stats_file, stacks_file = profiler.merge()
+
+    # Assert
+    stats = pstats.Stats(stats_file)
+    calls = dict(map(lambda kv: (kv[0][2], kv[1][1]), stats.stats.items()))
+    samples = read_stacks(stacks_file)
+    assert calls["busy_wait"] == 5
+    assert set(samples) == {"details", "serialization"}
+    assert samples["details"] > samples["serialization"] > 0
+    assert not os.path.exists(profiler.parts_folder)
+
+
+class ExclusiveProfile:
+    """ Profile of which one can be enabled at a time in a process, as cProfile from Python 3.12 on """
+    num_enabled = 0
+    num_enables = 0
+
+    def enable(self) -> None:
+        if ExclusiveProfile.num_enabled > 0:
+            raise ValueError("Another profiling tool is already active")
+        ExclusiveProfile.num_enabled += 1
+        ExclusiveProfile.num_enables += 1
+
+    def disable(self) -> None:
+        ExclusiveProfile.num_enabled -= 1
+
+    def getstats(self) -> list:
+        return list([])
+
+
+def test_run_profiler_concurrent_stages_one_profile_per_process(tmp_path, monkeypatch) -> None:
+    # Arrange
+    monkeypatch.setattr(profiler_module, "IS_PROFILE_PER_THREAD", False)
+    monkeypatch.setattr(profiler_module.cProfile, "Profile", ExclusiveProfile)
+    monkeypatch.setattr(ExclusiveProfile, "num_enables", 0)
+    profiler = RunProfiler(os.path.join(str(tmp_path), "profile"), interval=0.001)
+    barrier = threading.Barrier(3)
+
+    def run_stage(name: str) -> None:
+        with profiler.stage(name):
+            barrier.wait()
+            busy_wait(0.02)
+            with profiler.stage("nested"):
+                barrier.wait()
+
+    # Act
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(run_stage, ["details", "authors", "details"]))
+    with profiler.stage("serialization"):
+        pass
+
+    # Assert
+    assert ExclusiveProfile.num_enables == 2 and ExclusiveProfile.num_enabled == 0
+    assert len(profiler._profiles) == 1 and profiler._num_active == 0
+    profiler._stopped.set()
+
+
+@pytest.mark.parametrize("is_exclusive", [False, True])
+def test_run_profiler_fork_in_stage(tmp_path, monkeypatch, is_exclusive: bool) -> None:
+    # Arrange
+    if is_exclusive:
+        monkeypatch.setattr(profiler_module, "IS_PROFILE_PER_THREAD", False)
+        monkeypatch.setattr(profiler_module.cProfile, "Profile", ExclusiveProfile)
+    profiler = RunProfiler(os.path.join(str(tmp_path), "profile"), interval=0.001)
+    process = multiprocessing.get_context("fork").Process(target=profiler.profiled(busy_wait, "details"), args=(0.05,))
+
+    # Act
+    with profiler.stage("reddits"):
+        process.start()
+        busy_wait(0.05)
+    process.join()
+    stats_file, stacks_file = profiler.merge()
+
+    # Assert
+    assert process.exitcode == 0
+    assert set(read_stacks(stacks_file)) == {"reddits", "details"}
+    if not is_exclusive:
+        calls = dict(map(lambda kv: (kv[0][2], kv[1][1]), pstats.Stats(stats_file).stats.items()))
+        assert calls["busy_wait"] == 2
+
+
+def test_run_profiler_concurrent_stages(tmp_path) -> None:
+    # Arrange
+    profiler = RunProfiler(os.path.join(str(tmp_path), "profile"), interval=0.001)
+    barrier = threading.Barrier(3)
+
+    def run_stage(seconds: float) -> float:
+        with profiler.stage("details"):
+            barrier.wait()
+            return busy_wait(seconds)
+
+    # Act
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(run_stage, [0.05, 0.05, 0.05]))
+    stats_file, stacks_file = profiler.merge()
+
+    # Assert
+    calls = dict(map(lambda kv: (kv[0][2], kv[1][1]), pstats.Stats(stats_file).stats.items()))
+    assert calls["busy_wait"] == 3
+    assert set(read_stacks(stacks_file)) == {"details"}
+
+
+def test_run_profiler_nested_stages(tmp_path) -> None:
+    # Arrange
+    profiler = RunProfiler(os.path.join(str(tmp_path), "profile"), interval=0.001)
+
+    # Act
+    with profiler.stage("coordinator"):
+        busy_wait(0.05)
+        with profiler.stage("author collection"):
+            busy_wait(0.05)
+    _, stacks_file = profiler.merge()
+
+    # Assert
+    assert set(read_stacks(stacks_file)) == {"coordinator", "author collection"}
+
+
+def test_download_pipeline_profile(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    profiler = RunProfiler(os.path.join(download_params.output_profile_folder, "profile"))
+
+    # Act
+    DownloadPipeline(FakeYARS(num_reddits=30), download_params, load_params, "www.reddit.com",
+                     logger=logging.getLogger("test_profiler"), profiler=profiler).run()
+    stats_file, _ = profiler.merge()
+
+    # Assert
+    functions = set(map(lambda f: f[2], pstats.Stats(stats_file).stats))
+    assert {"scrape_post_details", "scrape_user_data", "collect_authors", "save_jsons", "_search"} <= functions
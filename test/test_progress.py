@@ -0,0 +1,130 @@
+import os
+import logging
+import datetime as dt
+import multiprocessing
+import pytest
+from typing import Dict, List
+
+from download import DownloadPipeline, ProgressTracker
+from model import EloadType, LoadParams
+from test.test_pipeline import FakeYARS, create_params
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = {"Content-Length": str(len(content))}
+
+
+def report_responses(progress: ProgressTracker, num_responses: int) -> None:
+    for _ in range(num_responses):
+        progress.on_response(FakeResponse(200, b"x" * 100))
+
+
+@pytest.mark.parametrize("num_expected, num_done, num_failed, expected_rate, expected_eta", [
+    (100, 20, 0, 2., 40.),
+    (100, 20, 5, 2., 40.),
+    (100, 0, 0, 0., None),
+    (10, 10, 1, 1., 0.),
+])
+def test_progress_tracker(num_expected: int, num_done: int, num_failed: int, expected_rate: float,
+                          expected_eta: float | None) -> None:
+    # Arrange
+    clock = FakeClock()
+    progress = ProgressTracker(["reddits", "authors"], logger=logging.getLogger("test_progress"), clock=clock)
+    progress.snapshot()
+    progress.expect("reddits", num_expected)
+
+    # Act
+    for i in range(num_done):
+        progress.done("reddits", is_failed=i < num_failed)
+    clock.now += 10.
+    snapshot = progress.snapshot()
+
+    # Assert
+    assert snapshot["stages"]["reddits"] == {"expected": num_expected, "done": num_done, "failed": num_failed,
+                                             "rate": expected_rate, "eta": expected_eta}
+    assert snapshot["stages"]["authors"]["done"] == 0
+
+
+@pytest.mark.parametrize("responses, expected_requests, expected_errors, expected_bytes", [
+    ([], 0, 0, 0),
+    ([(200, b"abc"), (200, b"de")], 2, 0, 5),
+    ([(200, b"abc"), (429, b""), (404, b"not found")], 3, 2, 12),
+])
+def test_progress_tracker_responses(responses: List, expected_requests: int, expected_errors: int,
+                                    expected_bytes: int) -> None:
+    # Arrange
+    progress = ProgressTracker(["reddits"], logger=logging.getLogger("test_progress"))
+
+    # Act
+    for status_code, content in responses:
+        progress.on_response(FakeResponse(status_code, content))
+    snapshot = progress.snapshot()
+
+    # Assert
+    assert (snapshot["requests"], snapshot["request_errors"], snapshot["bytes"]) == (expected_requests, expected_errors, expected_bytes)
+
+
+def test_progress_tracker_counts_worker_processes() -> None:
+    # Arrange
+    progress = ProgressTracker(["reddits"], logger=logging.getLogger("test_progress"))
+    processes = list(map(lambda _: multiprocessing.Process(target=report_responses, args=(progress, 50)), range(4)))
+
+    # Act
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    snapshot = progress.snapshot()
+
+    # Assert
+    assert snapshot["requests"] == 200
+    assert snapshot["bytes"] == 200 * 100
+
+
+def test_progress_tracker_format() -> None:
+    # Arrange
+    clock = FakeClock()
+    progress = ProgressTracker(["reddits"], logger=logging.getLogger("test_progress"), clock=clock)
+    progress.snapshot()
+    progress.expect("reddits", 30)
+    for _ in range(10):
+        progress.done("reddits")
+    report_responses(progress, 10)
+    clock.now += 5.
+
+    # Act
+    line = progress.format(progress.snapshot())
+
+    # Assert
+    assert line == "reddits 10/30 (2.0/s, failed: 0, ETA: 0:00:10); requests 10 (2.0/s, errors: 0, 0.2 KB/s)"
+
+
+def test_download_pipeline_progress(tmp_path) -> None:
+    # Arrange
+    download_params = create_params(str(tmp_path), "thread")
+    os.makedirs(download_params.output_reddits_folder)
+    os.makedirs(download_params.output_authors_folder)
+    load_params = LoadParams(load_type=EloadType.HISTORICAL, date_from=dt.datetime(2026, 1, 1),
+                             date_to=dt.datetime(2026, 1, 10, 23, 59, 59))
+    progress = ProgressTracker(["reddits", "authors"], logger=logging.getLogger("test_progress"))
+
+    # Act
+    stats = DownloadPipeline(FakeYARS(num_reddits=30), download_params, load_params, "www.reddit.com",
+                             logger=logging.getLogger("test_progress"), progress=progress).run()
+    stages: Dict[str, Dict[str, float]] = progress.snapshot()["stages"]
+
+    # Assert
+    assert (stages["reddits"]["expected"], stages["reddits"]["done"], stages["reddits"]["failed"]) \
+        == (stats["found"], stats["found"], stats["failed"])
+    assert (stages["authors"]["expected"], stages["authors"]["done"]) == (stats["authors"], stats["authors"])
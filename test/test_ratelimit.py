@@ -0,0 +1,31 @@
+import time
+import pytest
+
+from yars import RateLimiter
+
+
+@pytest.mark.parametrize("rate, burst, num_requests, expected_min_time", [
+    (50., 1, 11, 0.2),
+    (50., 5, 15, 0.2),
+    (100., 10, 10, 0.),
+])
+def test_rate_limiter(rate: float, burst: int, num_requests: int, expected_min_time: float) -> None:
+    # Arrange
+    limiter = RateLimiter(rate, burst=burst)
+
+    # Act
+    start = time.monotonic()
+    for _ in range(num_requests):
+        limiter.acquire()
+    elapsed = time.monotonic() - start
+
+    # Assert
+    assert expected_min_time <= elapsed < expected_min_time + 0.1
+
+
+def test_rate_limiter_invalid_rate() -> None:
+    # Arrange
+    # Act
+    # Assert
+    with pytest.raises(ValueError):
+        RateLimiter(0)
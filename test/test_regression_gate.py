@@ -0,0 +1,66 @@
+import pytest
+from typing import Any, Dict, List
+
+from benchmark import regression_gate
+
+
+def create_baseline(values: Dict[str, float], tolerance: float = 0.2) -> Dict[str, Any]:
+    return {"settings": regression_gate.SETTINGS,
+            "metrics": dict(map(lambda kv: (kv[0], {"value": kv[1], "tolerance": tolerance}), values.items()))}
+
+
+@pytest.mark.parametrize("metrics, expected_statuses", [
+    ({"e2e/thread/posts_per_s": 100., "micro/save_jsons/1000/per_item_us": 40., "memory/thread/peak_rss_mb": 100.},
+     ["ok", "ok", "ok"]),
+    ({"e2e/thread/posts_per_s": 79., "micro/save_jsons/1000/per_item_us": 49., "memory/thread/peak_rss_mb": 121.},
+     ["regressed", "regressed", "regressed"]),
+    ({"e2e/thread/posts_per_s": 121., "micro/save_jsons/1000/per_item_us": 31., "memory/thread/peak_rss_mb": 79.},
+     ["improved", "improved", "improved"]),
+    ({"e2e/thread/posts_per_s": 90., "micro/save_jsons/1000/per_item_us": 45.},
+     ["ok", "ok"]),
+    ({"e2e/thread/posts_per_s": 90., "micro/save_jsons/1000/per_item_us": 45., "memory/async/peak_rss_mb": 100.},
+     ["ok", "ok", "missing"]),
+])
+def test_compare(metrics: Dict[str, float], expected_statuses: List[str]) -> None:
+    # Arrange
+    baseline = create_baseline({"e2e/thread/posts_per_s": 100., "micro/save_jsons/1000/per_item_us": 40.,
+                                "memory/thread/peak_rss_mb": 100.})
+
+    # Act
+    rows = regression_gate.compare(baseline, metrics)
+
+    # Assert
+    assert list(map(lambda r: r["status"], rows)) == expected_statuses
+    diff = regression_gate.format_diff(rows)
+    assert len(diff.splitlines()) == len(rows) + 1
+    assert all(map(lambda r: (r["status"] in ["regressed", "missing"]) == (f"! {r['metric']}" in diff), rows))
+
+
+def test_best_of_and_create_baseline() -> None:
+    # Arrange
+    first = {"e2e/thread/posts_per_s": 100., "latency/post_details/p95_ms": 120., "memory/thread/peak_rss_mb": 100.}
+    second = {"e2e/thread/posts_per_s": 110., "latency/post_details/p95_ms": 130., "micro/date_range/1000/peak_mb": 1.}
+    earlier = create_baseline({"e2e/thread/posts_per_s": 90.}, tolerance=0.4)
+
+    # Act
+    best = regression_gate.best_of(first, second)
+    baseline = regression_gate.create_baseline(best, earlier)
+
+    # Assert
+    assert best == {"e2e/thread/posts_per_s": 110., "latency/post_details/p95_ms": 120., "memory/thread/peak_rss_mb": 100.,
+                    "micro/date_range/1000/peak_mb": 1.}
+    assert baseline["metrics"]["e2e/thread/posts_per_s"] == {"value": 110., "tolerance": 0.4}
+    assert baseline["metrics"]["latency/post_details/p95_ms"]["tolerance"] == regression_gate.TOLERANCES["p95_ms"]
+    assert all(map(lambda r: r["status"] == "ok" and r["change"] == 0., regression_gate.compare(baseline, best)))
+
+
+def test_collect_latency() -> None:
+    # Arrange
+    settings = regression_gate.SETTINGS | {"latency": {"num_requests": 50, "num_comments": 10, "latency": 0.01, "concurrency": 4}}
+
+    # Act
+    metrics = regression_gate.collect(["latency"], settings)
+
+    # Assert
+    assert list(metrics) == ["latency/post_details/p50_ms", "latency/post_details/p95_ms", "latency/post_details/p99_ms"]
+    assert 10 <= metrics["latency/post_details/p50_ms"] <= metrics["latency/post_details/p95_ms"] <= metrics["latency/post_details/p99_ms"]
@@ -0,0 +1,86 @@
+import random
+import pytest
+from typing import List
+
+from download import PollScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_poll_scheduler_spreads_first_polls() -> None:
+    # Arrange
+    clock = FakeClock()
+    scheduler = PollScheduler(100., 1600., jitter=0.2, clock=clock, rng=random.Random(0))
+
+    # Act
+    for phrase in ["corgi", "husky", "shiba"]:
+        scheduler.add(phrase)
+    due_at_start = scheduler.pop_due()
+    clock.now = 20.
+    due_after_jitter = scheduler.pop_due()
+
+    # Assert
+    assert len(due_at_start) == 0
+    assert sorted(due_after_jitter) == ["corgi", "husky", "shiba"]
+    assert scheduler.wait_time() is None
+
+
+@pytest.mark.parametrize("results, expected_intervals", [
+    ([5, 5, 5], [100., 100., 100.]),
+    ([0, 0, 0, 0, 0], [200., 400., 800., 1600., 1600.]),
+    ([0, 0, 3, 0], [200., 400., 200., 400.]),
+])
+def test_poll_scheduler_adapts_interval(results: List[int], expected_intervals: List[float]) -> None:
+    # Arrange
+    clock = FakeClock()
+    scheduler = PollScheduler(100., 1600., jitter=0.1, clock=clock, rng=random.Random(0))
+    scheduler.add("corgi")
+
+    # Act
+    intervals = list([])
+    for num_new in results:
+        clock.now += scheduler.wait_time()
+        assert scheduler.pop_due() == ["corgi"]
+        delay = scheduler.report("corgi", num_new)
+        intervals.append(scheduler.interval("corgi"))
+        assert 0.9 * intervals[-1] <= delay <= 1.1 * intervals[-1]
+
+    # Assert
+    assert intervals == expected_intervals
+
+
+def test_poll_scheduler_backs_off_failures_and_defers() -> None:
+    # Arrange
+    clock = FakeClock()
+    scheduler = PollScheduler(100., 1600., jitter=0., clock=clock)
+    scheduler.add("corgi")
+    scheduler.add("husky")
+    scheduler.pop_due()
+
+    # Act
+    scheduler.report("corgi", 10, is_failed=True)
+    scheduler.defer("husky", 50.)
+    clock.now = 50.
+    due_first = scheduler.pop_due()
+    clock.now = 200.
+    due_second = scheduler.pop_due()
+
+    # Assert
+    assert due_first == ["husky"]
+    assert due_second == ["corgi"]
+    assert scheduler.interval("corgi") == 200. and scheduler.interval("husky") == 100.
+
+
+@pytest.mark.parametrize("min_interval, max_interval, jitter", [(0., 10., 0.1), (20., 10., 0.1), (10., 20., 1.)])
+def test_poll_scheduler_invalid(min_interval: float, max_interval: float, jitter: float) -> None:
+    # Arrange
+    # Act
+    # Assert
+    with pytest.raises(ValueError):
+        PollScheduler(min_interval, max_interval, jitter=jitter)
@@ -0,0 +1,54 @@
+from download import SharedResults
+
+
+def test_shared_results_claim_and_resolve() -> None:
+    # Arrange
+    shared = SharedResults()
+    results = list([])
+
+    # Act
+    owner_future, is_owner = shared.claim("reddit", "/r/x/1/")
+    waiter_future, is_waiter_owner = shared.claim("reddit", "/r/x/1/")
+    waiter_future.add_done_callback(lambda f: results.append(f.result()))
+    shared.resolve("reddit", "/r/x/1/", {"title": "x"})
+    shared.resolve("reddit", "/r/x/1/", {"title": "y"})
+
+    # Assert
+    assert is_owner and not is_waiter_owner
+    assert owner_future is waiter_future
+    assert results == [{"title": "x"}]
+    assert shared.stats == {"hits": 1, "misses": 1}
+
+
+def test_shared_results_failed_and_released() -> None:
+    # Arrange
+    shared = SharedResults()
+    failed_future, _ = shared.claim("author", "op0")
+    released_future, _ = shared.claim("author", "op1")
+
+    # Act
+    shared.resolve("author", "op0", None, is_failed=True)
+    shared.release([("author", "op1")])
+    _, is_failed_owner = shared.claim("author", "op0")
+    _, is_released_owner = shared.claim("author", "op1")
+
+    # Assert
+    assert failed_future.result() is None and released_future.result() is None
+    assert is_failed_owner and is_released_owner
+
+
+def test_shared_results_evicts_resolved_only() -> None:
+    # Arrange
+    shared = SharedResults(max_items=2)
+    shared.claim("reddit", "a")
+    shared.claim("reddit", "b")
+    shared.resolve("reddit", "b", {})
+
+    # Act
+    shared.claim("reddit", "c")
+    _, is_a_owner = shared.claim("reddit", "a")
+    _, is_b_owner = shared.claim("reddit", "b")
+
+    # Assert
+    assert not is_a_owner
+    assert is_b_owner
@@ -0,0 +1,92 @@
+import os
+import time
+import pytest
+from functools import partial
+from typing import Any, List
+
+from download.supervisor import WorkerSupervisor
+from yars import AIMDLimiter
+
+
+def flaky_fetch(item: str) -> str:
+    """ Kills its process on the first 'crash' item (marker file), always on 'poison', hangs on 'slow' """
+    if item.startswith("crash"):
+        marker = item.split(":", 1)[1]
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(1)
+    if item == "poison":
+        os._exit(1)
+    if item == "slow":
+        time.sleep(60)
+    return item.upper()
+
+
+def limited_fetch(limiter: AIMDLimiter, item: str) -> str:
+    """ Holds a concurrency slot while fetching, killed workers never release theirs """
+    token = limiter.acquire()
+    result = flaky_fetch(item)
+    limiter.release(0.01, token=token)
+    return result
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_worker_supervisor(batch_size: int) -> None:
+    # Arrange
+    items = [f"item{i}" for i in range(25)]
+    supervisor = WorkerSupervisor(flaky_fetch, 3, "items", batch_size=batch_size)
+
+    # Act
+    results = dict(supervisor.run(iter(items)))
+
+    # Assert
+    assert results == {item: item.upper() for item in items}
+    assert supervisor.stats["restarts"] == 0
+
+
+def test_worker_supervisor_requeues_after_crash(tmp_path) -> None:
+    # Arrange
+    crash_item = f"crash:{tmp_path / 'crashed'}"
+    items = [f"item{i}" for i in range(10)] + [crash_item] + [f"item{i}" for i in range(10, 20)]
+    supervisor = WorkerSupervisor(flaky_fetch, 2, "items", batch_size=2)
+
+    # Act
+    results = dict(supervisor.run(items))
+
+    # Assert
+    assert results == {item: item.upper() for item in items}
+    assert supervisor.stats["restarts"] == 1
+    assert supervisor.stats["given_up"] == 0
+
+
+@pytest.mark.parametrize("poison, task_timeout, expected_timeouts", [("poison", None, 0), ("slow", 0.5, 2)])
+def test_worker_supervisor_gives_up(poison: str, task_timeout: float | None, expected_timeouts: int) -> None:
+    # Arrange
+    items: List[Any] = [f"item{i}" for i in range(6)] + [poison] + [f"item{i}" for i in range(6, 12)]
+    supervisor = WorkerSupervisor(flaky_fetch, 2, "items", task_timeout=task_timeout, max_attempts=2)
+
+    # Act
+    results = dict(supervisor.run(items))
+
+    # Assert
+    assert results.pop(poison) is None
+    assert results == {item: item.upper() for item in items if item != poison}
+    assert supervisor.stats["restarts"] == 2
+    assert supervisor.stats["given_up"] == 1
+    assert supervisor.stats["timeouts"] == expected_timeouts
+
+
+def test_worker_supervisor_reclaims_slots() -> None:
+    # Arrange
+    limiter = AIMDLimiter(1, initial_limit=1)
+    items = [f"item{i}" for i in range(6)] + ["slow"] + [f"item{i}" for i in range(6, 12)]
+    supervisor = WorkerSupervisor(partial(limited_fetch, limiter), 2, "items", task_timeout=0.5, max_attempts=2)
+
+    # Act
+    results = dict(supervisor.run(items))
+
+    # Assert
+    assert results.pop("slow") is None
+    assert results == {item: item.upper() for item in items if item != "slow"}
+    assert limiter.stats["reclaimed"] == 2
+    assert limiter.in_flight == 0
@@ -0,0 +1,70 @@
+import pytest
+from collections import Counter
+from typing import Any, Dict, List
+
+import util
+from benchmark import bench_micro
+from benchmark.synthetic import SyntheticReddits
+
+
+def flatten(comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sum(map(lambda c: [c] + flatten(c["replies"]), comments), list([]))
+
+
+@pytest.mark.parametrize("num_comments, depth_weights, num_authors, author_skew", [
+    (1000, [1.], 10, 0.),
+    (5000, [0.5, 0.3, 0.2], 100, 1.),
+    (20000, [0.4, 0.25, 0.15, 0.1, 0.05, 0.05], 1000, 1.5),
+])
+def test_synthetic_thread(num_comments: int, depth_weights: List[float], num_authors: int, author_skew: float) -> None:
+    # Arrange
+    generator = SyntheticReddits(num_authors=num_authors, author_skew=author_skew, depth_weights=depth_weights,
+                                 deleted_ratio=0.1)
+
+    # Act
+    thread = generator.thread(num_comments)
+    comments = flatten(generator.reddits(num_comments, thread_size=num_comments)[0]["comments"])
+
+    # Assert
+    assert thread == generator.thread(num_comments)
+    assert len(comments) == num_comments
+    depths = Counter(map(lambda c: c["depth_level"], comments))
+    assert max(depths) == len(depth_weights) - 1
+    for depth, weight in enumerate(depth_weights):
+        assert depths[depth] / num_comments == pytest.approx(weight / sum(depth_weights), abs=0.02)
+    authors = Counter(map(lambda c: c["author"], comments))
+    assert authors["[deleted]"] / num_comments == pytest.approx(0.1, abs=0.02)
+    assert len(authors) <= num_authors + 1
+    assert len(util.collect_authors([{"author": "[deleted]", "comments": comments}])) == len(authors) - 1
+
+
+@pytest.mark.parametrize("num_comments, thread_size, expected_threads", [
+    (1000, 100, [100] * 10),
+    (250, 100, [100, 100, 50]),
+    (10, 100, [10]),
+])
+def test_synthetic_reddits(num_comments: int, thread_size: int, expected_threads: List[int]) -> None:
+    # Arrange
+    generator = SyntheticReddits(days=10)
+
+    # Act
+    reddits = generator.reddits(num_comments, thread_size)
+
+    # Assert
+    assert list(map(lambda r: len(flatten(r["comments"])), reddits)) == expected_threads
+    assert len(set(map(lambda r: r["id"], reddits))) == len(reddits)
+    created = list(map(lambda r: r["created_utc"], reddits))
+    assert created == sorted(created)
+    assert generator.start_date.timestamp() < created[0] and created[-1] < generator.start_date.timestamp() + 10 * 86400
+
+
+def test_bench_micro() -> None:
+    # Arrange
+    # Act
+    measurements = bench_micro.run(sizes=[100, 1000], repeats=2)
+
+    # Assert
+    assert list(map(lambda m: (m["benchmark"], m["size"]), measurements)) == \
+        list((name, size) for name in bench_micro.BENCHMARKS for size in [100, 1000])
+    assert all(map(lambda m: m["best_s"] <= m["median_s"] and m["peak_mb"] is not None, measurements))
+    assert measurements[1]["retained_blocks"] > 1000
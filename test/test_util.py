@@ -1,5 +1,8 @@
+import json
 import pytest
+import logging
 import datetime as dt
+import multiprocessing
 from typing import Any, List, Tuple
 
 import util
@@ -105,3 +108,96 @@ def test_chunk_list(elements: List[Any], number: int, expected_chunks: List[List
         assert len(chunk) == len(expected_chunk)
         for element, expected_element in zip(chunk, expected_chunk):
             assert element == expected_element
+
+
+@pytest.mark.parametrize("elements, size, expected_batches", [
+    ([0, 1, 2, 3, 4, 5, 6, 7, 8, 9], 3, [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]),
+    ([0, 1, 2, 3, 4, 5, 6, 7, 8, 9], 1, [[0], [1], [2], [3], [4], [5], [6], [7], [8], [9]]),
+    (["one", "two", "three"], 5, [["one", "two", "three"]]),
+    ([], 2, [])
+])
+def test_batch_list(elements: List[Any], size: int, expected_batches: List[List[Any]]) -> None:
+    # Arrange
+    # Act
+    batches = util.batch_list(elements, size)
+
+    # Assert
+    assert batches == expected_batches
+
+
+def test_read_phrases(tmp_path) -> None:
+    # Arrange
+    phrases_file = tmp_path / "phrases.txt"
+    phrases_file.write_text("corgi\n\n# dogs\n  husky \ncorgi\nshiba inu\n")
+
+    # Act
+    phrases = util.read_phrases(str(phrases_file))
+
+    # Assert
+    assert phrases == ["corgi", "husky", "shiba inu"]
+
+
+@pytest.mark.parametrize("num_bytes, expected_text", [
+    (0, "0.0 B"),
+    (1536, "1.5 KB"),
+    (3 * 1024 ** 3, "3.0 GB"),
+    (2 * 1024 ** 4, "2.0 TB"),
+])
+def test_format_bytes(num_bytes: float, expected_text: str) -> None:
+    # Arrange
+    # Act
+    text = util.format_bytes(num_bytes)
+
+    # Assert
+    assert text == expected_text
+
+
+@pytest.mark.parametrize("rate, burst, times, expected_messages", [
+    (1., 2., [0., 0., 0., 0., 1.], ["record", "record", "record (2 similar records suppressed)"]),
+    (10., None, [0.] * 12, ["record"] * 10),
+    (1., 1., [0., 0.5, 1., 1.5, 2.], ["record", "record (1 similar records suppressed)", "record (1 similar records suppressed)"]),
+])
+def test_log_rate_filter(rate: float, burst: float | None, times: List[float], expected_messages: List[str]) -> None:
+    # Arrange
+    clock = iter(times)
+    rate_filter = util.LogRateFilter(rate, burst, clock=lambda: next(clock))
+    records = list(map(lambda _: logging.LogRecord("test", logging.INFO, "test.py", 1, "record", None, None), times))
+
+    # Act
+    messages = list(map(lambda r: r.getMessage(), filter(rate_filter.filter, records)))
+
+    # Assert
+    assert messages == expected_messages
+
+
+def _log_from_worker(name: str) -> None:
+    logging.getLogger(name).warning("From worker.")
+
+
+@pytest.mark.parametrize("log_format", ["text", "json"])
+def test_setup_logger(tmp_path, log_format: str) -> None:
+    # Arrange
+    log_file = str(tmp_path / "logs" / "test.log")
+    name = f"test_setup_logger_{log_format}"
+
+    # Act
+    util.setup_logger(name, log_file=str(tmp_path / "logs" / "old.log"), log_format=log_format)
+    logger = util.setup_logger(name, log_file=log_file, log_format=log_format)
+    logger = util.setup_logger(name, log_file=log_file, log_format=log_format)
+    logger.info("From main.")
+    worker = multiprocessing.get_context("fork").Process(target=_log_from_worker, args=(name,))
+    worker.start()
+    worker.join()
+    util.stop_logging()
+
+    # Assert
+    assert len(logger.handlers) == 1
+    with open(log_file, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2
+    if log_format == "json":
+        entries = list(map(json.loads, lines))
+        assert list(map(lambda e: (e["level"], e["message"]), entries)) == [("INFO", "From main."), ("WARNING", "From worker.")]
+        assert entries[0]["process"] != entries[1]["process"]
+    else:
+        assert lines[0].endswith("INFO From main.") and lines[1].endswith("WARNING From worker.")
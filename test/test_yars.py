@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+import multiprocessing
+import pytest
+from typing import Any, Dict, List, Tuple
+
+import yars
+from benchmark.mock_reddit_server import MockRedditServer
+
+
+def fake_fetch_subreddit_page(self, subreddit: str, category: str, time_filter: str,
+                              batch_size: int, after: str | None) -> Tuple[List[Dict[str, Any]], str | None]:
+    """ Serves 3 pages of posts per subreddit, the last one without cursor """
+    page = 0 if after is None else int(after) + 1
+    posts = [{"title": f"{subreddit}-{page}-{i}", "permalink": f"/r/{subreddit}/{page}/{i}"} for i in range(batch_size)]
+    return posts, str(page) if page < 2 else None
+
+
+@pytest.mark.parametrize("subreddits, limit, categories, time_filters, expected_count", [
+    (["a", "b", "c"], 10, ["hot"], ["all"], 30),
+    (["a", "b"], 2, ["hot", "new"], ["all", "day"], 16),
+    (["a"], 250, ["top"], ["all"], 250),
+])
+def test_stream_subreddit_posts(monkeypatch: pytest.MonkeyPatch, subreddits: List[str], limit: int,
+                                categories: List[str], time_filters: List[str], expected_count: int) -> None:
+    # Arrange
+    monkeypatch.setattr(yars.YARS, "_fetch_subreddit_page", fake_fetch_subreddit_page)
+    downloader = yars.YARS(logger=logging.getLogger("test_yars"))
+
+    # Act
+    posts = list(downloader.stream_subreddit_posts(subreddits, limit=limit, categories=categories,
+                                                   time_filters=time_filters, max_workers=4, page_delay=(0, 0)))
+
+    # Assert
+    assert len(posts) == expected_count
+    for source in {(p["source"], p["category"], p["time_filter"]) for p in posts}:
+        assert len([p for p in posts if (p["source"], p["category"], p["time_filter"]) == source]) == min(limit, 300)
+
+
+def test_stream_subreddit_posts_concurrency(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Arrange
+    barrier = threading.Barrier(3, timeout=5)
+
+    def blocking_fetch_subreddit_page(self, subreddit, category, time_filter, batch_size, after):
+        barrier.wait()  # passes only if 3 sources are fetched at the same time
+        return [{"title": subreddit}], None
+
+    monkeypatch.setattr(yars.YARS, "_fetch_subreddit_page", blocking_fetch_subreddit_page)
+    downloader = yars.YARS(logger=logging.getLogger("test_yars"))
+
+    # Act
+    posts = list(downloader.stream_subreddit_posts(["a", "b", "c"], max_workers=3))
+
+    # Assert
+    assert sorted(p["title"] for p in posts) == ["a", "b", "c"]
+
+
+def test_stream_subreddit_posts_failed_source(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Arrange
+    def failing_fetch_subreddit_page(self, subreddit, category, time_filter, batch_size, after):
+        if subreddit == "b" and after is not None:
+            raise KeyError("data")
+        return fake_fetch_subreddit_page(self, subreddit, category, time_filter, batch_size, after)
+
+    monkeypatch.setattr(yars.YARS, "_fetch_subreddit_page", failing_fetch_subreddit_page)
+    downloader = yars.YARS(logger=logging.getLogger("test_yars"))
+
+    # Act
+    posts = list(downloader.stream_subreddit_posts(["a", "b", "c"], limit=250, max_workers=2, page_delay=(0, 0)))
+
+    # Assert
+    assert list(map(lambda s: len([p for p in posts if p["source"] == s]), ["a", "b", "c"])) == [250, 100, 250]
+
+
+def test_stream_subreddit_posts_unknown_category() -> None:
+    # Arrange
+    downloader = yars.YARS(logger=logging.getLogger("test_yars"))
+
+    # Act
+    # Assert
+    with pytest.raises(ValueError):
+        list(downloader.stream_subreddit_posts(["a"], categories=["best"]))
+
+
+@pytest.mark.parametrize("num_posts, page_size, limit, expected_pages", [
+    (250, 100, 1000, [100, 100, 50]),
+    (250, 40, 100, [40, 40, 20]),
+    (30, 100, 10, [10]),
+])
+def test_mock_reddit_server(num_posts: int, page_size: int, limit: int, expected_pages: List[int]) -> None:
+    # Arrange
+    server = MockRedditServer(latency=0., num_posts=num_posts, page_size=page_size, num_comments=15, max_depth=3).start()
+    downloader = yars.YARS(logger=logging.getLogger("test_yars"), base_url=server.url)
+
+    # Act
+    pages = list(downloader.search_reddit_pages("corgi", limit=limit))
+    permalink = pages[0][0]["link"].split("www.reddit.com")[1]
+    details = downloader.scrape_post_details(permalink)
+    start = time.monotonic()
+    user_data = downloader.scrape_user_data(details["author"], limit=1)
+    user_data_time = time.monotonic() - start
+    server.stop()
+
+    # Assert
+    assert list(map(len, pages)) == expected_pages
+    assert len(set(map(lambda h: h["link"], sum(pages, list([]))))) == sum(expected_pages)
+    assert details["permalink"] == permalink and details["author"] == pages[0][0]["author"]
+    assert len(details["comments"]) > 0
+
+    def count(comments: List[Dict[str, Any]], depth: int) -> int:
+        assert all(map(lambda c: c["depth_level"] == depth, comments))
+        return sum(map(lambda c: 1 + count(c["replies"], depth + 1), comments))
+    assert count(details["comments"], 0) == 15
+    assert len(user_data) == 1 and user_data[0]["author"] == details["author"]
+    # No sleep between pages after the last needed one
+    assert user_data_time < 0.5
+
+
+def _check_fresh_pools(downloader: yars.YARS, permalink: str) -> None:
+    assert len(downloader.session.adapters["http://"].poolmanager.pools) == 0
+    assert downloader.scrape_post_details(permalink)["permalink"] == permalink
+
+
+def test_session_pools_after_fork() -> None:
+    # Arrange
+    server = MockRedditServer(latency=0., num_posts=10).start()
+    downloader = yars.YARS(logger=logging.getLogger("test_yars"), base_url=server.url, timeout=2)
+    headers = downloader.search_reddit("corgi")
+    permalink = headers[0]["link"].split("www.reddit.com")[1]
+
+    # Act
+    worker = multiprocessing.get_context("fork").Process(target=_check_fresh_pools, args=(downloader, permalink))
+    worker.start()
+    worker.join()
+    details = downloader.scrape_post_details(permalink)
+    server.stop()
+
+    # Assert
+    assert worker.exitcode == 0
+    assert len(downloader.session.adapters["http://"].poolmanager.pools) == 1
+    assert details["permalink"] == permalink
@@ -1,27 +1,236 @@
 import os
+import time
+import queue
+import atexit
+import pickle
+import socket
 import logging
+import logging.handlers
+import threading
 import json
 import datetime as dt
-from dateutil.relativedelta import relativedelta
-from typing import List, Any, Dict
+from typing import List, Any, Callable, Dict, Tuple
 
 
-def setup_logger(name, log_file, level=logging.INFO):
-    """ Setup logger """
+# Text format of the log lines, the "json" format writes one JSON object per line instead
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+LOG_FORMATS = ["text", "json"]
+# Records sent by the worker processes are truncated to fit one datagram
+MAX_LOG_RECORD_BYTES = 65536
+
+
+class JsonFormatter(logging.Formatter):
+    """ Formats a log record as a JSON line (time, level, logger, process, thread and message) """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": dt.datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LogRateFilter(logging.Filter):
+    """
+    Rate limit of the records of every call site (logger, file and line): at most ``rate`` records per second
+    with bursts of up to ``burst`` records (``rate`` by default), the others are dropped before being formatted
+    or written. The next record let through tells how many similar ones were suppressed. Warnings and errors
+    are never suppressed. Counted without a lock (races only blur the counts), so logging calls never wait.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1., burst or rate)
+        self.clock = clock
+        # Call site -> (tokens, time of update, suppressed records)
+        self._sites: Dict[Tuple[str, str, int], Tuple[float, float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = self.clock()
+        tokens, updated_at, num_suppressed = self._sites.get(key, (self.burst, now, 0))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        if tokens < 1.:
+            self._sites[key] = (tokens, now, num_suppressed + 1)
+            return False
+        self._sites[key] = (tokens - 1., now, 0)
+        if num_suppressed > 0:
+            record.msg, record.args = f"{record.getMessage()} ({num_suppressed} similar records suppressed)", None
+        return True
+
+
+class _LogQueue:
+    """
+    Queue of the log records of a run, read by its listener. Records of the listener process are put in memory,
+    records of the (forked) worker processes are sent as datagrams, one send per record, so there is no lock a
+    killed worker could leave held, and are forwarded into the queue by a receiver thread.
+    """
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self._records: queue.SimpleQueue = queue.SimpleQueue()
+        self._receiving, self._sending = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver = threading.Thread(target=self._receive, name="log-receiver", daemon=True)
+        self._receiver.start()
+
+    def put_nowait(self, record: logging.LogRecord | None) -> None:
+        if os.getpid() == self.pid:
+            self._records.put_nowait(record)
+            return
+        data = pickle.dumps(record.__dict__)
+        if len(data) > MAX_LOG_RECORD_BYTES:
+            record.msg = record.message = f"{record.msg[:MAX_LOG_RECORD_BYTES // 8]} [truncated]"
+            data = pickle.dumps(record.__dict__)
+        self._sending.send(data)
+
+    def get(self, block: bool = True) -> logging.LogRecord | None:
+        return self._records.get(block)
+
+    def close(self) -> None:
+        """ Stops receiving once the records the workers have sent so far are forwarded """
+        self._sending.send(pickle.dumps(None))
+        self._receiver.join()
+        self._receiving.close()
+        self._sending.close()
+
+    def _receive(self) -> None:
+        while (entry := pickle.loads(self._receiving.recv(2 * MAX_LOG_RECORD_BYTES))) is not None:
+            self._records.put_nowait(logging.makeLogRecord(entry))
+
+
+class _LogQueueHandler(logging.handlers.QueueHandler):
+    """ Handler of a logger, putting its records (with the log file and format they go to) into the log queue of the run """
+
+    def __init__(self, log_file: str, log_format: str) -> None:
+        super().__init__(None)
+        self.log_file = log_file
+        self.log_format = log_format
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Listener of the run at the moment (restarted if stopped)
+        _get_listener().queue.put_nowait(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.log_file, record.log_format = self.log_file, self.log_format
+        return record
+
+
+class _LogRouter(logging.Handler):
+    """ Handler of the listener, writing the records into the files of their loggers """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._files: Dict[Tuple[str, str], logging.FileHandler] = {}
+
+    def open(self, log_file: str, log_format: str) -> None:
+        with self.lock:
+            if (log_file, log_format) not in self._files:
+                handler = logging.FileHandler(log_file, encoding="utf-8")
+                handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(LOG_FORMAT))
+                self._files[(log_file, log_format)] = handler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Loggers set up by the worker processes have their files opened here
+        self.open(record.log_file, record.log_format)
+        self._files[(record.log_file, record.log_format)].handle(record)
+
+    def close(self) -> None:
+        with self.lock:
+            for handler in self._files.values():
+                handler.close()
+            self._files.clear()
+        super().close()
+
+
+class _LogListener:
+    """ The one listener of a run: a thread writing the records of all the loggers (and processes) into their files """
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.queue = _LogQueue()
+        self.router = _LogRouter()
+        self._listener = logging.handlers.QueueListener(self.queue, self.router)
+        self._listener.start()
+
+    def stop(self) -> None:
+        self.queue.close()
+        self._listener.stop()
+        self.router.close()
+
+
+_LOGGING_LOCK = threading.Lock()
+_LOGGING: Dict[str, Any] = {"listener": None, "log_format": "text", "rate_limit": None, "is_stopped_at_exit": False}
+
+
+def configure_logging(log_format: str = "text", rate_limit: float | None = None) -> None:
+    """ Sets the log format ("text" or "json") and the rate limit (records per second of every call site) of the loggers set up next """
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format '{log_format}'. Should be one of {LOG_FORMATS}.")
+    _LOGGING["log_format"], _LOGGING["rate_limit"] = log_format, rate_limit
+
+
+def setup_logger(name, log_file, level=logging.INFO, log_format=None, rate_limit=None):
+    """
+    Setup logger writing into the log file through the log listener of the run (started by the first setup).
+    Idempotent: a logger set up again keeps one handler, writing into the latest log file only.
+    """
+    log_format = log_format or _LOGGING["log_format"]
+    rate_limit = rate_limit or _LOGGING["rate_limit"]
     log_file_folder = os.path.dirname(log_file)
-    if not os.path.exists(log_file_folder):
-        os.makedirs(log_file_folder)
+    if log_file_folder and not os.path.exists(log_file_folder):
+        os.makedirs(log_file_folder, exist_ok=True)
 
-    handler = logging.FileHandler(log_file)
-    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    listener = _get_listener()
+    if listener.pid == os.getpid():
+        listener.router.open(log_file, log_format)
+
+    handler = _LogQueueHandler(log_file, log_format)
+    if rate_limit:
+        handler.addFilter(LogRateFilter(rate_limit))
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
+    for old_handler in list(filter(lambda h: isinstance(h, _LogQueueHandler), logger.handlers)):
+        logger.removeHandler(old_handler)
     logger.addHandler(handler)
+    # Records are written once, not again by the handlers of the parent loggers
+    logger.propagate = False
 
     return logger
 
 
+def _get_listener() -> _LogListener:
+    """ Log listener of the run, started if there is none """
+    listener = _LOGGING["listener"]
+    if listener is not None:
+        return listener
+    with _LOGGING_LOCK:
+        if _LOGGING["listener"] is None:
+            _LOGGING["listener"] = _LogListener()
+            if not _LOGGING["is_stopped_at_exit"]:
+                atexit.register(stop_logging)
+                _LOGGING["is_stopped_at_exit"] = True
+        return _LOGGING["listener"]
+
+
+def stop_logging() -> None:
+    """ Stops the log listener of the run once all the queued records are written (run at exit too) """
+    with _LOGGING_LOCK:
+        listener, _LOGGING["listener"] = _LOGGING["listener"], None
+    if listener is not None and listener.pid == os.getpid():
+        listener.stop()
+
+
 def date_range(start_date, end_date=None, interval="d"):
     if end_date is None:
         end_date = dt.datetime.now()
@@ -39,12 +248,14 @@ def date_range(start_date, end_date=None, interval="d"):
             date = sd + dt.timedelta(days=i)
             yield date, sd + dt.timedelta(days=i+1)
     elif interval == "m":
+        from dateutil.relativedelta import relativedelta
         sd = start_date.replace(day=1, hour=0, minute=0, second=0)
         ed = end_date.replace(day=1, hour=0, minute=0, second=0)
         for i in range((ed.year - sd.year) * 12 + (ed.month - sd.month) + 1):
             date = sd + relativedelta(months=i)
             yield date, sd + relativedelta(months=i+1)
     elif interval == "y":
+        from dateutil.relativedelta import relativedelta
         sd = start_date.replace(month=1, day=1, hour=0, minute=0, second=0)
         ed = end_date.replace(month=1, day=1, hour=0, minute=0, second=0)
         for i in range(ed.year - sd.year + 1):
@@ -62,6 +273,29 @@ def chunk_list(elements: List[Any], number: int) -> List[List[Any]]:
     return chunks
 
 
+def batch_list(elements: List[Any], size: int) -> List[List[Any]]:
+    """ Returns consecutive batches of given size (the last one may be smaller) from elements list. """
+    if size < 1:
+        raise ValueError(f"Batch size should be positive, got {size}.")
+    return [elements[i:i + size] for i in range(0, len(elements), size)]
+
+
+def read_phrases(phrases_file: str) -> List[str]:
+    """ Returns unique phrases (one per line, skipping blank lines and '#' comments) from the file, in order. """
+    with open(phrases_file) as f:
+        lines = map(lambda line: line.strip(), f)
+        return list(dict.fromkeys(filter(lambda line: line and not line.startswith("#"), lines)))
+
+
+def format_bytes(num_bytes: float) -> str:
+    """ Returns human readable size of given number of bytes """
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
 def filter_reddits_by_dates(reddit_jsons: List[Dict[str, Any]],
                             start_date: dt.datetime, end_date: dt.datetime = None) -> List[Dict[str, Any]]:
     """ Filters the provided reddits JSON by provided dates interval """
@@ -70,6 +304,8 @@ def filter_reddits_by_dates(reddit_jsons: List[Dict[str, Any]],
 
 def get_recent_file_date(jsons_folder: str) -> dt.datetime | None:
     """ Returns the latest file date (in order to determine the missing periods for INCREMENTAL load) """
+    if not os.path.exists(jsons_folder):
+        return None
     file_names = os.listdir(jsons_folder)
     dates = list(sorted(map(get_file_date_from_file_name, file_names)))
     return None if len(dates) == 0 else dates[-1]
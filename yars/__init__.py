@@ -1,2 +1,40 @@
-from yars.yars import YARS
-from yars.utils import display_results, export_to_json, export_to_csv, download_image
\ No newline at end of file
+import importlib
+
+# Exported names by their submodules, imported on the first use so that importing ``yars`` does not load
+# requests, pygments and the rest before they are needed (the CLI and every spawned worker import it)
+_EXPORTS = {
+    "YARS": "yars",
+    "display_results": "utils",
+    "export_to_json": "utils",
+    "export_to_csv": "utils",
+    "download_image": "utils",
+    "MediaDownloader": "media",
+    "media_urls": "media",
+    "RateLimiter": "ratelimit",
+    "AIMDLimiter": "concurrency",
+    "CassettePlayer": "cassette",
+    "CassetteRecorder": "cassette",
+    "CassetteMiss": "cassette",
+    "load_cassette": "cassette",
+    "FaultInjector": "faults",
+    "parse_faults": "faults",
+}
+_SUBMODULES = ["agents", "cassette", "concurrency", "faults", "media", "ratelimit", "sessions", "utils", "yars"]
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f"{__name__}.{_EXPORTS[name]}"), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Later lookups do not get here
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
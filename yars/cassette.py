@@ -0,0 +1,167 @@
+import os
+import gzip
+import json
+import time
+import base64
+import threading
+import datetime as dt
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """ Request not found in the replayed cassette """
+
+
+def interaction_key(method: str, url: str) -> str:
+    """
+    Key a request is replayed by: its method, path and sorted query parameters. The scheme and host
+    are left out, so a cassette recorded against one server (eg. a local mock) replays for any API URL
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{method.upper()} {parts.path}{'?' + query if query else ''}"
+
+
+def load_cassette(cassette_file: str) -> List[Dict[str, Any]]:
+    """ Recorded interactions of the cassette, in the order they were recorded """
+    with gzip.open(cassette_file, "rt", encoding="utf-8") as f:
+        return list(map(json.loads, filter(lambda line: line.strip(), f)))
+
+
+class CassetteRecorder(HTTPAdapter):
+    """
+    Transport adapter (an ``HTTPAdapter`` taking the same options) recording every request and its
+    response (headers, body and latency) or error into a gzip compressed cassette of JSON lines.
+
+    Every interaction is appended as a separate gzip member with one write of a file opened for
+    appending, so the threads and the (forked) worker processes sharing the adapter record into one
+    cassette without a lock. Bodies are stored decoded (as text, base64 if not UTF-8), the recorded
+    headers are the ones of the wire (eg. ``Content-Encoding``).
+    """
+
+    def __init__(self, cassette_file: str, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.cassette_file = cassette_file
+        folder = os.path.dirname(cassette_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._fd = os.open(cassette_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._start = time.monotonic()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        offset = time.monotonic() - self._start
+        interaction = {
+            "key": interaction_key(request.method, request.url),
+            "recorded_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "offset": offset,
+            "pid": os.getpid(),
+            "request": {"method": request.method, "url": request.url, "headers": dict(request.headers)}
+            | _body(request.body),
+        }
+        start = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+            # Read streamed content too, the caller consumes it from the response afterwards
+            content = response.content
+        except requests.exceptions.RequestException as e:
+            interaction["latency"] = time.monotonic() - start
+            interaction["error"] = {"type": type(e).__name__, "message": str(e)}
+            self._write(interaction)
+            raise
+        interaction["latency"] = time.monotonic() - start
+        interaction["response"] = {"status": response.status_code, "reason": response.reason, "url": response.url,
+                                   "headers": dict(response.headers)} | _body(content)
+        self._write(interaction)
+        return response
+
+    def close(self) -> None:
+        super().close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _write(self, interaction: Dict[str, Any]) -> None:
+        os.write(self._fd, gzip.compress((json.dumps(interaction) + "\n").encode("utf-8")))
+
+
+class CassettePlayer(BaseAdapter):
+    """
+    Transport adapter serving the responses (or raising the errors) of a recorded cassette, offline.
+
+    Requests are matched by ``interaction_key``, the ones recorded several times are served in the
+    recorded order (the last one is repeated when they run out). Every response is delayed by its
+    recorded latency times ``latency_scale`` (1 replays the recorded timing, 0 no delays at all), so
+    replayed runs have deterministic timing (the delays are waited out by ``sleep``). An unrecorded
+    request raises ``CassetteMiss``.
+    """
+
+    def __init__(self, cassette_file: str, latency_scale: float = 1.,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        super().__init__()
+        if latency_scale < 0:
+            raise ValueError(f"Latency scale should not be negative, got {latency_scale}.")
+        self.cassette_file = cassette_file
+        self.latency_scale = latency_scale
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, Deque[Dict[str, Any]]] = {}
+        for interaction in load_cassette(cassette_file):
+            self._interactions.setdefault(interaction["key"], deque()).append(interaction)
+
+    def __len__(self) -> int:
+        return sum(map(len, self._interactions.values()))
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        key = interaction_key(request.method, request.url)
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise CassetteMiss(f"Request not recorded in cassette {self.cassette_file}: {key}", request=request)
+            interaction = interactions.popleft() if len(interactions) > 1 else interactions[0]
+
+        if self.latency_scale > 0:
+            self.sleep(interaction["latency"] * self.latency_scale)
+        if "error" in interaction:
+            error = getattr(requests.exceptions, interaction["error"]["type"], requests.exceptions.ConnectionError)
+            raise error(interaction["error"]["message"], request=request)
+
+        recorded = interaction["response"]
+        response = requests.Response()
+        response.status_code = recorded["status"]
+        response.reason = recorded["reason"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = _content(recorded)
+        response._content_consumed = True
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def _body(body: str | bytes | None) -> Dict[str, Any]:
+    """ Body field of a recorded request or response """
+    if body is None:
+        return {"body": None}
+    if isinstance(body, str):
+        return {"body": body}
+    try:
+        return {"body": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_base64": base64.b64encode(body).decode("ascii")}
+
+
+def _content(recorded: Dict[str, Any]) -> bytes:
+    if "body_base64" in recorded:
+        return base64.b64decode(recorded["body_base64"])
+    return (recorded["body"] or "").encode("utf-8")
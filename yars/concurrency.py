@@ -0,0 +1,166 @@
+import os
+import time
+import weakref
+import multiprocessing
+from typing import Callable, Dict
+
+# Limiters of the process, the slots a killed worker process held in them are reclaimed by its supervisor
+_LIMITERS = weakref.WeakSet()
+
+
+def reclaim_slots(pid: int) -> int:
+    """ Frees the slots the (dead) process held in the limiters, returns their number """
+    return sum(map(lambda limiter: limiter.reclaim(pid), list(_LIMITERS)))
+
+
+class AIMDLimiter:
+    """
+    Limits the number of in-flight requests, adapting the limit to the network and Reddit conditions
+    (additive increase, multiplicative decrease as in TCP congestion control).
+
+    Every healthy response grows the limit by ``increase / limit`` (ie. by ``increase`` per round of
+    ``limit`` requests), as long as the smoothed latency stays within ``latency_tolerance`` times its
+    best (lowest) value. A congestion signal (429 response, timeout or connection error) cuts the limit
+    by the ``decrease`` factor, at most once per ``cooldown`` seconds, so a burst of failing requests
+    sent at the same limit cuts it once. Its state lives in shared memory, so one limiter is shared by
+    all the threads and processes (started with it) of a run.
+
+    Every in-flight request holds a slot recording its process and start. The slots of a worker killed
+    in the middle of a request are reclaimed by its supervisor (see ``reclaim_slots``) and a slot held
+    for over ``lease_timeout`` seconds expires, so a lost release cannot stall the run. Waiting requests
+    check for a free slot every ``poll_interval`` seconds and the lock is held for a few operations only,
+    a lock left held (by a process killed in between) for over ``lock_timeout`` seconds is broken.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial_limit: int | None = None,
+                 increase: float = 1., decrease: float = 0.5, latency_tolerance: float = 3.,
+                 cooldown: float = 1., lease_timeout: float = 300., poll_interval: float = 0.01,
+                 lock_timeout: float = 5., clock: Callable[[], float] = time.monotonic) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Concurrency limits should be positive and ordered, got {min_limit} and {max_limit}.")
+        if not 0 < decrease < 1:
+            raise ValueError(f"Decrease factor should be within (0, 1), got {decrease}.")
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.lock_timeout = lock_timeout
+        self.clock = clock
+
+        # No condition variable: its notify waits for every sleeper to wake up, a killed one hangs it
+        self._lock = multiprocessing.Lock()
+        self._holder = multiprocessing.RawValue("i", 0)
+        # Process id (0 if free), token and lease start of every slot
+        self._owners = multiprocessing.RawArray("i", max_limit)
+        self._tokens = multiprocessing.RawArray("q", max_limit)
+        self._leased_at = multiprocessing.RawArray("d", max_limit)
+        self._num_leases = multiprocessing.RawValue("q", 0)
+        self._limit = multiprocessing.RawValue("d", min(max_limit, max(min_limit, initial_limit or min_limit)))
+        self._latency = multiprocessing.RawValue("d", 0.)
+        self._best_latency = multiprocessing.RawValue("d", 0.)
+        self._last_cut = multiprocessing.RawValue("d", float("-inf"))
+        self._peak = multiprocessing.RawValue("d", self._limit.value)
+        self._num_cuts = multiprocessing.RawValue("i", 0)
+        self._num_expired = multiprocessing.RawValue("i", 0)
+        self._num_reclaimed = multiprocessing.RawValue("i", 0)
+        _LIMITERS.add(self)
+
+    @property
+    def limit(self) -> int:
+        """ Current limit of in-flight requests """
+        return int(self._limit.value)
+
+    @property
+    def in_flight(self) -> int:
+        """ Current number of in-flight requests """
+        return sum(map(bool, self._owners))
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {"limit": self.limit, "peak": int(self._peak.value), "cuts": self._num_cuts.value,
+                "latency": round(self._latency.value, 3), "expired": self._num_expired.value,
+                "reclaimed": self._num_reclaimed.value}
+
+    def acquire(self) -> int:
+        """ Blocks until a request may be sent, returns the token of the slot it holds """
+        pid = os.getpid()
+        while True:
+            self._lock_acquire()
+            try:
+                now = self.clock()
+                free, in_flight = None, 0
+                for slot in range(self.max_limit):
+                    if self._owners[slot] != 0 and now - self._leased_at[slot] > self.lease_timeout:
+                        self._owners[slot] = 0
+                        self._num_expired.value += 1
+                    if self._owners[slot] != 0:
+                        in_flight += 1
+                    elif free is None:
+                        free = slot
+                if free is not None and in_flight < int(self._limit.value):
+                    self._num_leases.value += 1
+                    self._owners[free], self._tokens[free], self._leased_at[free] = pid, self._num_leases.value, now
+                    return self._num_leases.value
+            finally:
+                self._lock_release()
+            time.sleep(self.poll_interval)
+
+    def release(self, latency: float, is_congested: bool = False, token: int | None = None) -> None:
+        """
+        Reports the finished request (its latency and whether it signals congestion), frees its slot
+        (given by its token, any slot of the process otherwise) and adapts the limit
+        """
+        pid = os.getpid()
+        self._lock_acquire()
+        try:
+            # An expired (and maybe since reused) slot is not freed
+            slot = next(filter(lambda s: self._owners[s] == pid and token in (None, self._tokens[s]),
+                               range(self.max_limit)), None)
+            if slot is not None:
+                self._owners[slot] = 0
+            if is_congested:
+                now = self.clock()
+                if now - self._last_cut.value >= self.cooldown:
+                    self._limit.value = max(self.min_limit, self._limit.value * self.decrease)
+                    self._last_cut.value = now
+                    self._num_cuts.value += 1
+            else:
+                self._latency.value = latency if self._latency.value == 0. else 0.9 * self._latency.value + 0.1 * latency
+                if self._best_latency.value == 0. or self._latency.value < self._best_latency.value:
+                    self._best_latency.value = self._latency.value
+                if self._latency.value <= self.latency_tolerance * self._best_latency.value:
+                    self._limit.value = min(self.max_limit, self._limit.value + self.increase / self._limit.value)
+                    self._peak.value = max(self._peak.value, self._limit.value)
+        finally:
+            self._lock_release()
+
+    def reclaim(self, pid: int) -> int:
+        """ Frees the slots held by the (dead) process, returns their number """
+        self._lock_acquire(dead_pid=pid)
+        try:
+            slots = list(filter(lambda s: self._owners[s] == pid, range(self.max_limit)))
+            for slot in slots:
+                self._owners[slot] = 0
+            self._num_reclaimed.value += len(slots)
+        finally:
+            self._lock_release()
+        return len(slots)
+
+    def _lock_acquire(self, dead_pid: int | None = None) -> None:
+        start = time.monotonic()
+        while not self._lock.acquire(timeout=self.poll_interval):
+            if self._holder.value == dead_pid or time.monotonic() - start > self.lock_timeout:
+                # Left held by a process killed in between, a plain lock may be released by any process
+                try:
+                    self._lock.release()
+                except ValueError:
+                    pass
+        self._holder.value = os.getpid()
+
+    def _lock_release(self) -> None:
+        self._holder.value = 0
+        self._lock.release()
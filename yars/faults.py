@@ -0,0 +1,159 @@
+import io
+import os
+import json
+import time
+import errno
+import random
+import threading
+from collections import Counter
+from typing import Any, Dict, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.response import HTTPResponse
+from urllib3.util.timeout import Timeout
+
+FAULTS = ["429", "429_retry_after", "5xx", "timeout", "truncated", "drip", "reset"]
+
+
+def parse_faults(spec: str) -> Dict[str, Tuple[float, int]]:
+    """
+    Faults of a spec: comma separated ``KIND:RATE`` or ``KIND:RATExBURST`` (eg. ``429:0.05x3,reset:0.01``),
+    the rate of the requests a burst of the fault starts at and the number of requests in a row it hits
+    """
+    faults = {}
+    for item in filter(None, map(str.strip, spec.split(","))):
+        kind, _, rate = item.partition(":")
+        rate, is_burst, burst = rate.partition("x")
+        if kind not in FAULTS:
+            raise ValueError(f"Unknown fault {kind!r}, expected one of: {', '.join(FAULTS)}.")
+        try:
+            faults[kind] = (float(rate), int(burst if is_burst else 1))
+        except ValueError:
+            raise ValueError(f"Fault should be KIND:RATE or KIND:RATExBURST, got {item!r}.") from None
+        if not 0 <= faults[kind][0] <= 1 or faults[kind][1] < 1:
+            raise ValueError(f"Fault rate should be within 0 and 1 and its burst at least 1, got {item!r}.")
+    if sum(map(lambda f: f[0], faults.values())) > 1:
+        raise ValueError(f"Fault rates should sum up to 1 at most, got {spec!r}.")
+    return faults
+
+
+class FaultInjector(HTTPAdapter):
+    """
+    Transport adapter (an ``HTTPAdapter`` taking the same options) injecting faults into the requests:
+    429 responses without and with ``Retry-After`` (of ``retry_after`` seconds), 500, 502, 503 and 504
+    responses, read timeouts (after the read timeout of the request), truncated bodies (shorter than
+    their ``Content-Length``), slow drips (bodies sent at ``drip_rate`` bytes per second) and
+    connection resets.
+
+    ``faults`` maps a fault to the rate of the requests a burst of it starts at and the length of the
+    burst (``parse_faults`` of a spec). The faults are injected below the retries of the adapter, so
+    they are retried (and backed off) as the faults of the server would be. The threads share the
+    bursts, a forked worker process draws its own faults. The injected faults are counted by kind.
+    """
+
+    def __init__(self, faults: Dict[str, Tuple[float, int]] | str, *args, retry_after: int = 1,
+                 drip_rate: float = 20000., seed: int | None = None, **kwargs) -> None:
+        self.faults = parse_faults(faults) if isinstance(faults, str) else dict(faults)
+        self.retry_after = retry_after
+        self.drip_rate = drip_rate
+        self.seed = seed
+        self.injected: Counter = Counter()
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._burst: Tuple[str | None, int] = (None, 0)
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        # Also called for the fresh pools of a forked process
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("FaultyHTTPConnectionPool", (_FaultyPool, HTTPConnectionPool), {"injector": self}),
+            "https": type("FaultyHTTPSConnectionPool", (_FaultyPool, HTTPSConnectionPool), {"injector": self}),
+        }
+
+    def draw(self) -> str | None:
+        """ Fault of the next request (if any) """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._random = random.Random(f"{self.seed}/{self._pid}" if self.seed is not None else None)
+                self._burst = (None, 0)
+            kind, left = self._burst
+            if left == 0:
+                kind, left, draw = None, 0, self._random.random()
+                for fault, (rate, burst) in self.faults.items():
+                    if draw < rate:
+                        kind, left = fault, burst
+                        break
+                    draw -= rate
+            if kind is not None:
+                self._burst = (kind, left - 1)
+                self.injected[kind] += 1
+            return kind
+
+
+class _FaultyPool:
+    """ Connection pool making the requests with the faults drawn by the injector """
+    injector: FaultInjector
+
+    def _make_request(self, conn, method: str, url: str, *args, **kwargs) -> HTTPResponse:
+        fault = self.injector.draw()
+        if fault is None:
+            return super()._make_request(conn, method, url, *args, **kwargs)
+        if fault == "timeout":
+            timeout = kwargs.get("timeout")
+            read_timeout = timeout.read_timeout if isinstance(timeout, Timeout) else timeout
+            time.sleep(read_timeout if isinstance(read_timeout, (int, float)) else 0.)
+            raise ReadTimeoutError(self, url, f"Read timed out. (read timeout={read_timeout}, injected)")
+        if fault == "reset":
+            raise ConnectionResetError(errno.ECONNRESET, "Connection reset by peer (injected)")
+        if fault in ["429", "429_retry_after", "5xx"]:
+            status = 429 if fault != "5xx" else self.injector._random.choice([500, 502, 503, 504])
+            body = json.dumps({"message": "Too Many Requests" if status == 429 else "Server Error", "error": status}).encode()
+            headers = {"Content-Type": "application/json; charset=UTF-8", "Content-Length": str(len(body))} \
+                | ({"Retry-After": str(self.injector.retry_after)} if fault == "429_retry_after" else {})
+            return self._response(io.BytesIO(body), status, headers, method, kwargs)
+
+        response = super()._make_request(conn, method, url, *args, **kwargs | {"preload_content": False})
+        data = response.read(decode_content=False)
+        # The connection is back in the pool, the body is served from memory
+        response.release_conn()
+        kwargs["response_conn"] = None
+        headers = dict(response.headers) | {"Content-Length": str(len(data))}
+        if fault == "truncated":
+            # Read as a connection closed in the middle of the body
+            return self._response(io.BytesIO(data[:len(data) // 2]), response.status, headers, method, kwargs)
+        return self._response(_DripBody(data, self.injector.drip_rate), response.status, headers, method, kwargs)
+
+    def _response(self, body: Any, status: int, headers: Dict[str, str], method: str, kwargs: Dict[str, Any]) -> HTTPResponse:
+        response = HTTPResponse(body=body, headers=headers, status=status, request_method=method,
+                                preload_content=False, decode_content=kwargs.get("decode_content", True),
+                                enforce_content_length=kwargs.get("enforce_content_length", True),
+                                retries=kwargs.get("retries"))
+        # Owns the connection (released into the pool once read) as a response of the connection would
+        response._connection = kwargs.get("response_conn")
+        response._pool = self
+        if kwargs.get("preload_content", True):
+            response._body = response.read()
+        return response
+
+
+class _DripBody(io.RawIOBase):
+    """ Body read at most 1 KB at a time, at the rate (bytes per second) """
+
+    def __init__(self, data: bytes, rate: float) -> None:
+        super().__init__()
+        self._data = io.BytesIO(data)
+        self.rate = rate
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._data.read(min(len(buffer), 1024))
+        if len(chunk) > 0:
+            time.sleep(len(chunk) / self.rate)
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
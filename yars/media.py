@@ -0,0 +1,218 @@
+import os
+import json
+import hashlib
+import threading
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import requests
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+
+from util import setup_logger
+
+MEDIA_FIELDS = ("image_url", "thumbnail_url")
+
+
+@lru_cache(maxsize=None)
+def pooled_session(pool_maxsize=10):
+    """ Returns a shared (per pool size) session with pooled, retried connections """
+    session = requests.Session()
+    retries = Retry(total=5, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def media_urls(posts, fields=MEDIA_FIELDS):
+    """ Yields unique http(s) media URLs of given posts (as returned by ``fetch_subreddit_posts``) """
+    seen = set()
+    for post in posts:
+        for field in fields:
+            url = post.get(field)
+            # Thumbnails can also be placeholders like "default", "nsfw" or "spoiler"
+            if isinstance(url, str) and url.startswith(("http://", "https://")) and url not in seen:
+                seen.add(url)
+                yield url
+
+
+class MediaDownloader:
+    """
+    Concurrent bulk downloader of posts media.
+
+    Files already present in the output folder are skipped, interrupted transfers (``.part``
+    files) are resumed with HTTP Range requests if the file did not change meanwhile (If-Range
+    with its ETag or Last-Modified, kept in a ``.part.validator`` file) and files with the same
+    content (SHA-256) are stored once (later names become aliases of the first one); the content
+    index is kept in ``.media_index.json`` of the output folder. URLs of one batch with the same
+    file name get unique names (with a short hash of the URL).
+    """
+
+    INDEX_FILE = ".media_index.json"
+    PART_SUFFIX = ".part"
+    VALIDATOR_SUFFIX = ".validator"
+
+    def __init__(self, output_folder="images", max_workers=8, session=None, timeout=10,
+                 chunk_size=65536, logger=None):
+        self.output_folder = output_folder
+        self.max_workers = max_workers
+        self.session = session or pooled_session(max(10, max_workers))
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.logger = logger or setup_logger(name="yars",
+                                             log_file=f"logs/yars/YARS_{dt.datetime.now().isoformat()}.log")
+        self.stats = {"downloaded": 0, "resumed": 0, "skipped": 0, "deduplicated": 0, "failed": 0}
+
+        self._lock = threading.Lock()
+        os.makedirs(output_folder, exist_ok=True)
+        self._index = self._load_index()
+
+    def download_posts_media(self, posts, fields=MEDIA_FIELDS):
+        """ Downloads media of given posts, returns a dict of URL -> file path (None if failed) """
+        return self.download(media_urls(posts, fields))
+
+    def download(self, urls):
+        """ Downloads given URLs concurrently, returns a dict of URL -> file path (None if failed) """
+        results = {}
+        claimed_files = {}
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for url in urls:
+                file_name = self.file_name(url)
+                # Different URLs of the same file name would race for it, the later ones get unique names
+                if file_name in claimed_files:
+                    unique_name = self.unique_file_name(url)
+                    self.logger.info("File %s of %s is already claimed by %s, saving it as %s",
+                                     file_name, url, claimed_files[file_name], unique_name)
+                    file_name = unique_name
+                claimed_files[file_name] = url
+
+                if len(pending) >= 2 * self.max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                pending[executor.submit(self.download_one, url, file_name)] = url
+
+            for future, url in pending.items():
+                results[url] = future.result()
+
+        self._save_index()
+        self.logger.info("Media download finished: %s", self.stats)
+        return results
+
+    def download_one(self, url, file_name=None):
+        """ Downloads a single URL (skipping, resuming and deduplicating), returns its file path or None """
+        file_name = file_name or self.file_name(url)
+        file_path = os.path.join(self.output_folder, self._index["aliases"].get(file_name, file_name))
+        if os.path.exists(file_path):
+            self._count("skipped")
+            return file_path
+
+        part_path = file_path + self.PART_SUFFIX
+        validator = self._read_validator(part_path)
+        # A partial file without validator might be of another version of the file, it is downloaded from start
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) and validator is not None else 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset > 0 else {}
+
+        try:
+            response = self.session.get(url, stream=True, timeout=self.timeout, headers=headers)
+            if offset > 0 and response.status_code == 416:
+                # Nothing left to download, the partial file is complete already
+                response.close()
+            else:
+                response.raise_for_status()
+                if offset > 0 and response.status_code != 206:
+                    self.logger.info("File %s changed or the server ignored the Range request, downloading from start", url)
+                    offset = 0
+                if offset == 0:
+                    self._write_validator(part_path, response)
+                with open(part_path, "ab" if offset > 0 else "wb") as f:
+                    for chunk in response.iter_content(self.chunk_size):
+                        f.write(chunk)
+        except requests.RequestException as e:
+            self.logger.error("Failed to download %s: %s", url, e)
+            self._count("failed")
+            return None
+        except Exception as e:
+            self.logger.error("An error occurred while saving the image: %s", e)
+            self._count("failed")
+            return None
+
+        return self._finalize(url, part_path, file_path, is_resumed=offset > 0)
+
+    @staticmethod
+    def file_name(url):
+        """ Returns the file name of given media URL """
+        file_name = os.path.basename(urlparse(url).path)
+        return file_name or hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def unique_file_name(self, url):
+        """ Returns the file name of given media URL, unique by a short hash of the URL """
+        stem, extension = os.path.splitext(self.file_name(url))
+        return f"{stem}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{extension}"
+
+    def _read_validator(self, part_path):
+        """ Returns the ETag (or Last-Modified) the partial file was downloaded with, None if unknown """
+        validator_path = part_path + self.VALIDATOR_SUFFIX
+        if not os.path.exists(validator_path):
+            return None
+        with open(validator_path, encoding="utf-8") as f:
+            return f.read().strip() or None
+
+    def _write_validator(self, part_path, response):
+        """ Keeps the strong ETag (or Last-Modified) of the response, If-Range does not take weak ETags """
+        etag = response.headers.get("ETag")
+        validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+        validator_path = part_path + self.VALIDATOR_SUFFIX
+        if validator:
+            with open(validator_path, "w", encoding="utf-8") as f:
+                f.write(validator)
+        elif os.path.exists(validator_path):
+            os.remove(validator_path)
+
+    def _finalize(self, url, part_path, file_path, is_resumed):
+        if os.path.exists(part_path + self.VALIDATOR_SUFFIX):
+            os.remove(part_path + self.VALIDATOR_SUFFIX)
+        digest = self._file_digest(part_path)
+        with self._lock:
+            duplicate_name = self._index["contents"].get(digest)
+            if duplicate_name is not None and os.path.exists(os.path.join(self.output_folder, duplicate_name)):
+                os.remove(part_path)
+                self._index["aliases"][os.path.basename(file_path)] = duplicate_name
+                self.stats["deduplicated"] += 1
+                self.logger.info("Deduplicated: %s (same content as %s)", url, duplicate_name)
+                return os.path.join(self.output_folder, duplicate_name)
+
+            os.replace(part_path, file_path)
+            self._index["contents"][digest] = os.path.basename(file_path)
+            self.stats["resumed" if is_resumed else "downloaded"] += 1
+        self.logger.info("Downloaded: %s", file_path)
+        return file_path
+
+    def _file_digest(self, file_path):
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _load_index(self):
+        index_path = os.path.join(self.output_folder, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {"contents": {}, "aliases": {}}
+        with open(index_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_index(self):
+        index_path = os.path.join(self.output_folder, self.INDEX_FILE)
+        with self._lock:
+            with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(index_path + ".tmp", index_path)
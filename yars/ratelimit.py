@@ -0,0 +1,35 @@
+import time
+import multiprocessing
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the rate of requests (per second, with bursts of up to ``burst`` requests).
+
+    Its state lives in shared memory, so one limiter is shared by all the threads of a process and
+    by all the processes started (forked or spawned) with it, e.g. executor worker processes.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        if rate <= 0:
+            raise ValueError(f"Rate limit should be positive, got {rate}.")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._lock = multiprocessing.Lock()
+        self._tokens = multiprocessing.RawValue("d", self.burst)
+        self._updated = multiprocessing.RawValue("d", time.monotonic())
+
+    def acquire(self) -> float:
+        """ Blocks until a request is allowed, returns the time waited (in seconds) """
+        waited = 0.
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens.value = min(self.burst, self._tokens.value + (now - self._updated.value) * self.rate)
+                self._updated.value = now
+                if self._tokens.value >= 1:
+                    self._tokens.value -= 1
+                    return waited
+                wait = (1 - self._tokens.value) / self.rate
+            time.sleep(wait)
+            waited += wait
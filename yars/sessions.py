@@ -1,15 +1,98 @@
+import os
+import time
+import random
+import weakref
+# Imported by requests on the first request otherwise, a process forked in the middle of it deadlocks on the import lock
+import netrc  # noqa: F401
+
 from requests import Session
+from requests.adapters import HTTPAdapter
+
+from .agents import get_agent, CURATED_AGENTS
+
+# Sessions getting fresh connection pools in forked processes
+_SESSIONS = weakref.WeakSet()
+# Pools inherited by a forked process, kept (never closed) so the connections of the parent stay intact
+_INHERITED_POOLS = list([])
+
+
+class BaseSession(Session):
+    """
+    Session class (inherited from requests.Session) which optionally
+    passes each request through a (shared) rate limiter and a (shared)
+    concurrency limiter, reporting it the latency of the request and
+    whether it signals congestion (429 response, also one retried by
+    the adapter, timeout or connection error)
+    """
+
+    __attrs__ = Session.__attrs__ + ["rate_limiter", "concurrency_limiter"]
+
+    def __init__(self, rate_limiter=None, concurrency_limiter=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        _SESSIONS.add(self)
+
+    def request(self, *args, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self.concurrency_limiter is None:
+            return super().request(*args, **kwargs)
 
-from .agents import get_agent
+        token = self.concurrency_limiter.acquire()
+        start, is_congested = time.monotonic(), True
+        try:
+            response = super().request(*args, **kwargs)
+            is_congested = _is_throttled(response)
+            return response
+        finally:
+            # Raised requests (timeouts, connection errors) count as congestion
+            self.concurrency_limiter.release(time.monotonic() - start, is_congested=is_congested, token=token)
 
 
-class RandomUserAgentSession(Session):
+class RandomUserAgentSession(BaseSession):
     """
-    Session class (inherited from requests.Session) which passes
+    Session class (inherited from BaseSession) which passes
     a random user agent with each request
+
+    By default the agent is drawn from the full (lazily loaded) pool. Pass
+    ``agents="curated"`` to draw from the small curated subset only, or a
+    sequence of agents to draw from these.
     """
 
+    __attrs__ = BaseSession.__attrs__ + ["agents"]
+
+    def __init__(self, agents=None, rate_limiter=None, concurrency_limiter=None):
+        super().__init__(rate_limiter=rate_limiter, concurrency_limiter=concurrency_limiter)
+        self.agents = tuple(CURATED_AGENTS if agents == "curated" else agents) if agents else None
+
     def request(self, *args, **kwargs):
-        self.headers.update({"User-Agent": get_agent()})
+        # Per-request header (instead of mutating the shared session headers) keeps it thread-safe
+        kwargs["headers"] = (kwargs.get("headers") or {}) | {
+            "User-Agent": random.choice(self.agents) if self.agents else get_agent()
+        }
 
         return super().request(*args, **kwargs)
+
+
+def _reset_pools():
+    """
+    Gives the sessions of a forked process fresh connection pools. The inherited keep-alive
+    connections share their sockets with the parent, whose responses would get mixed up
+    """
+    for session in list(_SESSIONS):
+        # Other adapters (eg. a cassette player) have no connections
+        for adapter in filter(lambda a: isinstance(a, HTTPAdapter), session.adapters.values()):
+            _INHERITED_POOLS.append((adapter.poolmanager, adapter.proxy_manager))
+            adapter.init_poolmanager(adapter._pool_connections, adapter._pool_maxsize, block=adapter._pool_block)
+            adapter.proxy_manager = {}
+
+
+os.register_at_fork(after_in_child=_reset_pools)
+
+
+def _is_throttled(response):
+    """ Whether the response (or any of its retries) was a 429 """
+    retries = getattr(response.raw, "retries", None)
+    history = getattr(retries, "history", None) or ()
+    return response.status_code == 429 or any(map(lambda h: h.status == 429, history))
@@ -1,16 +1,14 @@
-import os
 import csv
 import json
-
-import requests
 import datetime as dt
-from urllib.parse import urlparse
-from pygments import formatters, highlight, lexers
 
 from util import setup_logger
+from .media import MediaDownloader
 
 
 def display_results(results, title, logger=None):
+    # Only needed for displaying, costs more than the rest of the module to import
+    from pygments import formatters, highlight, lexers
 
     if logger is None:
         logger = setup_logger(name="yars",
@@ -55,28 +53,9 @@ def download_image(image_url, output_folder="images", session=None, logger=None)
         logger = setup_logger(name="yars",
                               log_file=f"logs/yars/YARS_{dt.datetime.now().isoformat()}.log")
 
-    os.makedirs(output_folder, exist_ok=True)
-
-    filename = os.path.basename(urlparse(image_url).path)
-    filepath = os.path.join(output_folder, filename)
-
-    if session is None:
-        session = requests.Session()
-
-    try:
-        response = session.get(image_url, stream=True)
-        response.raise_for_status()
-        with open(filepath, "wb") as f:
-            for chunk in response.iter_content(8192):
-                f.write(chunk)
-        logger.info("Downloaded: %s", filepath)
-        return filepath
-    except requests.RequestException as e:
-        logger.error("Failed to download %s: %s", image_url, e)
-        return None
-    except Exception as e:
-        logger.error("An error occurred while saving the image: %s", e)
-        return None
+    # Shared pooled session (unless given), skipping already present and resuming partial files
+    downloader = MediaDownloader(output_folder=output_folder, max_workers=1, session=session, logger=logger)
+    return downloader.download([image_url]).get(image_url)
 
 
 def export_to_json(data, filename="output.json", logger=None):
@@ -1,37 +1,70 @@
 from __future__ import annotations
-from .sessions import RandomUserAgentSession
+from .sessions import BaseSession, RandomUserAgentSession
 import time
+import heapq
+import itertools
 import datetime as dt
 import random
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 
 from util import setup_logger
 
+# Links of the results point to Reddit, whichever server (eg. a local mock) the requests are sent to
+REDDIT_URL = "https://www.reddit.com"
 
-class YARS:
-    __slots__ = ("headers", "session", "proxy", "timeout", "logger")
 
-    def __init__(self, proxy=None, timeout=10, random_user_agent=True, logger=None):
-        self.session = RandomUserAgentSession() if random_user_agent else requests.Session()
+class YARS:
+    __slots__ = ("headers", "session", "proxy", "timeout", "logger", "base_url")
+
+    def __init__(self, proxy=None, timeout=10, random_user_agent=True, logger=None, user_agents=None, pool_maxsize=10,
+                 rate_limiter=None, concurrency_limiter=None, base_url=REDDIT_URL, record_cassette=None,
+                 replay_cassette=None, replay_latency_scale=1., faults=None, retries=5, backoff_factor=2.):
+        if record_cassette and replay_cassette:
+            raise ValueError("A cassette can be either recorded or replayed, not both.")
+        if faults and (record_cassette or replay_cassette):
+            raise ValueError("Faults are injected into the requests to the API, not into a cassette.")
+        self.session = RandomUserAgentSession(agents=user_agents, rate_limiter=rate_limiter,
+                                              concurrency_limiter=concurrency_limiter) if random_user_agent \
+            else BaseSession(rate_limiter=rate_limiter, concurrency_limiter=concurrency_limiter)
         self.proxy = proxy
         self.timeout = timeout
+        self.base_url = base_url.rstrip("/")
 
         self.logger = logger or setup_logger(name="yars",
                                              log_file=f"logs/yars/YARS_{dt.datetime.now().isoformat()}.log")
 
-        retries = Retry(
-            total=5,
-            backoff_factor=2,  # Exponential backoff
+        max_retries = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,  # Exponential backoff
             status_forcelist=[429, 500, 502, 503, 504],
         )
 
-        self.session.mount("https://", HTTPAdapter(max_retries=retries))
+        # Pool size should be at least the number of threads sharing the session concurrently,
+        # the cassettes and faults are imported by the runs using them only
+        if replay_cassette:
+            from .cassette import CassettePlayer
+            # Offline, the recorded responses come after their retries already
+            adapter = CassettePlayer(replay_cassette, latency_scale=replay_latency_scale)
+        elif record_cassette:
+            from .cassette import CassetteRecorder
+            adapter = CassetteRecorder(record_cassette, max_retries=max_retries, pool_maxsize=pool_maxsize)
+        elif faults:
+            from .faults import FaultInjector
+            adapter = FaultInjector(faults, max_retries=max_retries, pool_maxsize=pool_maxsize)
+        else:
+            adapter = HTTPAdapter(max_retries=max_retries, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
         if proxy:
             self.session.proxies.update({"http": proxy, "https": proxy})
     def handle_search(self,url, params, after=None, before=None):
+        results, _ = self.handle_search_page(url, params, after, before)
+        return results
+    def handle_search_page(self, url, params, after=None, before=None):
         if after:
             params["after"] = after
         if before:
@@ -41,15 +74,15 @@ class YARS:
         try:
             response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
-            self.logger.info("Search request successful")
+            self.logger.debug("Search request successful")
         except Exception as e:
             if response is not None:
                 if response.status_code != 200:
                     self.logger.info("Search request unsuccessful due to: %s", e)
-                    return []
+                    return [], None
             else:
                 self.logger.info("Search request unsuccessful due to: %s", e)
-                return []
+                return [], None
 
         data = response.json()
         results = []
@@ -59,31 +92,46 @@ class YARS:
                 {
                     "author": post_data["author"],
                     "title": post_data["title"],
-                    "link": f"https://www.reddit.com{post_data['permalink']}",
+                    "link": f"{REDDIT_URL}{post_data['permalink']}",
                     "description": post_data.get("selftext", "")[:269],
                     "created": post_data.get("created", 0.),
                     "created_utc": post_data.get("created_utc", 0.),
+                    "num_comments": post_data.get("num_comments", 0),
                 }
             )
         self.logger.info("Search Results Returned %d Results", len(results))
-        return results
+        return results, data["data"].get("after")
     def search_reddit(self, query, limit=10, after=None, before=None):
-        url = "https://www.reddit.com/search.json"
+        url = f"{self.base_url}/search.json"
         params = {"q": query, "limit": limit, "sort": "relevance", "type": "link"}
         return self.handle_search(url, params, after, before)
+    def search_reddit_pages(self, query, limit=10, page_size=100):
+        """ Yields search results page by page (following the ``after`` cursor) until ``limit`` results """
+        url = f"{self.base_url}/search.json"
+        after = None
+        total = 0
+        while total < limit:
+            params = {"q": query, "limit": min(page_size, limit - total), "sort": "relevance", "type": "link"}
+            results, after = self.handle_search_page(url, params, after)
+            results = results[:limit - total]
+            total += len(results)
+            if results:
+                yield results
+            if not results or not after:
+                break
     def search_subreddit(self, subreddit, query, limit=10, after=None, before=None, sort="relevance"):
-        url = f"https://www.reddit.com/r/{subreddit}/search.json"
+        url = f"{self.base_url}/r/{subreddit}/search.json"
         params = {"q": query, "limit": limit, "sort": "relevance", "type": "link","restrict_sr":"on"}
         return self.handle_search(url, params, after, before)
 
     def scrape_post_details(self, permalink):
-        url = f"https://www.reddit.com{permalink}.json"
+        url = f"{self.base_url}{permalink}.json"
 
         response = None
         try:
             response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
-            self.logger.info("Post details request successful : %s", url)
+            self.logger.debug("Post details request successful : %s", url)
         except Exception as e:
             self.logger.info("Post details request unsuccessful: %s", e)
             if response is not None:
@@ -94,7 +142,13 @@ class YARS:
                 self.logger.error(f"Failed to fetch post data: {e}")
                 return None
 
-        post_data = response.json()
+        details = self.parse_post_details(response.json())
+        if details is not None:
+            self.logger.info("Successfully scraped post: %s", details["title"])
+        return details
+
+    def parse_post_details(self, post_data):
+        """ Post details (with its comments tree) of the JSON answered for the post permalink """
         if not isinstance(post_data, list) or len(post_data) < 2:
             self.logger.info("Unexpected post data structre")
             self.logger.error("Unexpected post data structure")
@@ -110,8 +164,8 @@ class YARS:
         created = main_post.get("created", 0.)
         created_utc = main_post.get("created_utc", 0.)
         comments = self._extract_comments(post_data[1]["data"]["children"])
+        self.logger.debug("Extracted %d top level comments of post: %s", len(comments), title)
 
-        self.logger.info("Successfully scraped post: %s", title)
         return {
             "id": entry_id,
             "name": name,
@@ -134,7 +188,6 @@ class YARS:
         }
 
     def _extract_comments(self, comments):
-        self.logger.info("Extracting comments")
         extracted_comments = []
         for comment in comments:
             if isinstance(comment, dict) and comment.get("kind") == "t1":
@@ -167,12 +220,11 @@ class YARS:
                         replies.get("data", {}).get("children", [])
                     )
                 extracted_comments.append(extracted_comment)
-        self.logger.info("Successfully extracted comments")
         return extracted_comments
 
     def scrape_user_data(self, username, limit=10):
         self.logger.info("Scraping user data for %s, limit: %d", username, limit)
-        base_url = f"https://www.reddit.com/user/{username}/.json"
+        url = f"{self.base_url}/user/{username}/.json"
         params = {"limit": limit, "after": None}
         all_items = []
         count = 0
@@ -181,11 +233,11 @@ class YARS:
             response = None
             try:
                 response = self.session.get(
-                    base_url, params=params, timeout=self.timeout
+                    url, params=params, timeout=self.timeout
                 )
                 response.raise_for_status()
 
-                self.logger.info("User data request successful")
+                self.logger.debug("User data request successful")
             except Exception as e:
                 self.logger.info("User data request unsuccessful: %s", e)
                 if response is not None:
@@ -215,7 +267,7 @@ class YARS:
                 kind = item["kind"]
                 item_data = item["data"]
                 if kind == "t3":
-                    post_url = f"https://www.reddit.com{item_data.get('permalink', '')}"
+                    post_url = f"{REDDIT_URL}{item_data.get('permalink', '')}"
                     all_items.append(
                         {
                             "type": "post",
@@ -240,7 +292,7 @@ class YARS:
                     )
                 elif kind == "t1":
                     comment_url = (
-                        f"https://www.reddit.com{item_data.get('permalink', '')}"
+                        f"{REDDIT_URL}{item_data.get('permalink', '')}"
                     )
                     all_items.append(
                         {
@@ -269,11 +321,12 @@ class YARS:
                     break
 
             params["after"] = data["data"].get("after")
-            if not params["after"]:
+            # No sleep unless another page is going to be fetched
+            if not params["after"] or count >= limit:
                 break
 
             time.sleep(random.uniform(1, 2))
-            self.logger.info("Sleeping for random time")
+            self.logger.debug("Sleeping for random time")
 
         self.logger.info("Successfully scraped user data for %s", username)
         return all_items
@@ -288,8 +341,7 @@ class YARS:
             category,
             time_filter,
         )
-        if category not in ["hot", "top", "new", "userhot", "usertop", "usernew"]:
-            raise ValueError("Category for Subredit must be either 'hot', 'top', or 'new' or for User must be 'userhot', 'usertop', or 'usernew'")
+        self._validate_category(category)
 
         batch_size = min(100, limit)
         total_fetched = 0
@@ -297,74 +349,148 @@ class YARS:
         all_posts = []
 
         while total_fetched < limit:
-            if category == "hot":
-                url = f"https://www.reddit.com/r/{subreddit}/hot.json"
-            elif category == "top":
-                url = f"https://www.reddit.com/r/{subreddit}/top.json"
-            elif category == "new":
-                url = f"https://www.reddit.com/r/{subreddit}/new.json"
-            elif category == "userhot":
-                url = f"https://www.reddit.com/user/{subreddit}/submitted/hot.json"
-            elif category == "usertop":
-                url = f"https://www.reddit.com/user/{subreddit}/submitted/top.json"
-            else:
-                url = f"https://www.reddit.com/user/{subreddit}/submitted/new.json"
-
-            params = {
-                "limit": batch_size,
-                "after": after,
-                "raw_json": 1,
-                "t": time_filter,
-            }
-            response = None
-            try:
-                response = self.session.get(url, params=params, timeout=self.timeout)
-                response.raise_for_status()
-                self.logger.info("Subreddit/user posts request successful")
-            except Exception as e:
-                self.logger.info("Subreddit/user posts request unsuccessful: %s", e)
-                if response is not None:
-                    if response.status_code != 200:
-                        self.logger.info(f"Failed to fetch posts for subreddit/user {subreddit}: {response.status_code}")
-                        break
-                else:
-                    self.logger.info(f"Failed to fetch posts for subreddit/user: {subreddit}: {e}")
-
-            data = response.json()
-            posts = data["data"]["children"]
+            posts, after = self._fetch_subreddit_page(subreddit, category, time_filter, batch_size, after)
             if not posts:
                 break
 
-            for post in posts:
-                post_data = post["data"]
-                post_info = {
-                    "title": post_data["title"],
-                    "author": post_data["author"],
-                    "permalink": post_data["permalink"],
-                    "score": post_data["score"],
-                    "num_comments": post_data["num_comments"],
-                    "created_utc": post_data["created_utc"],
-                }
-                if post_data.get("post_hint") == "image" and "url" in post_data:
-                    post_info["image_url"] = post_data["url"]
-                elif "preview" in post_data and "images" in post_data["preview"]:
-                    post_info["image_url"] = post_data["preview"]["images"][0][
-                        "source"
-                    ]["url"]
-                if "thumbnail" in post_data and post_data["thumbnail"] != "self":
-                    post_info["thumbnail_url"] = post_data["thumbnail"]
-
+            for post_info in posts:
                 all_posts.append(post_info)
                 total_fetched += 1
                 if total_fetched >= limit:
                     break
 
-            after = data["data"].get("after")
-            if not after:
+            if not after or total_fetched >= limit:
                 break
 
             time.sleep(random.uniform(1, 2))
-            self.logger.info("Sleeping for random time")
+            self.logger.debug("Sleeping for random time")
 
         self.logger.info("Successfully fetched subreddit posts for %s", subreddit)
         return all_posts
+
+    def stream_subreddit_posts(
+        self, subreddits, limit=10, categories=("hot",), time_filters=("all",), max_workers=8, page_delay=(1, 2)
+    ):
+        """
+        Fetches posts of many subreddits/users concurrently and yields them as they arrive.
+
+        Every (subreddit, category, time_filter) combination is a separate source with its own
+        ``after`` cursor and ``limit``. At most ``max_workers`` pages are in flight at once and
+        consecutive pages of one source are spaced by a random ``page_delay`` (in seconds), without
+        blocking the other sources meanwhile. Each yielded post is the ``fetch_subreddit_posts``
+        dictionary extended with its ``source``, ``category`` and ``time_filter``.
+        """
+        for category in categories:
+            self._validate_category(category)
+
+        sources = list(itertools.product(subreddits, categories, time_filters))
+        self.logger.info("Streaming posts of %d subreddit/user sources, limit: %d, workers: %d",
+                         len(sources), limit, max_workers)
+        batch_size = min(100, limit)
+        cursors = {source: None for source in sources}
+        fetched = {source: 0 for source in sources}
+        ready = deque(sources)
+        delayed = []  # heap of (ready_at, order, source)
+        order = itertools.count()
+        pending = {}
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while ready or delayed or pending:
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    ready.append(heapq.heappop(delayed)[2])
+                while ready and len(pending) < max_workers:
+                    source = ready.popleft()
+                    future = executor.submit(self._fetch_subreddit_page, *source,
+                                             min(batch_size, limit - fetched[source]), cursors[source])
+                    pending[future] = source
+
+                timeout = max(0., delayed[0][0] - now) if delayed else None
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = pending.pop(future)
+                    try:
+                        posts, after = future.result()
+                    except Exception as e:
+                        # Only this source is finished, like a failed page of fetch_subreddit_posts
+                        self.logger.info("Failed to fetch posts for subreddit/user %s (%s, %s): %s", *source, e)
+                        continue
+                    subreddit, category, time_filter = source
+                    for post_info in posts[:limit - fetched[source]]:
+                        fetched[source] += 1
+                        yield post_info | {"source": subreddit, "category": category, "time_filter": time_filter}
+
+                    cursors[source] = after
+                    if posts and after and fetched[source] < limit:
+                        heapq.heappush(delayed, (time.monotonic() + random.uniform(*page_delay), next(order), source))
+                    else:
+                        self.logger.info("Successfully fetched subreddit posts for %s (%s, %s)", *source)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _validate_category(category):
+        if category not in ["hot", "top", "new", "userhot", "usertop", "usernew"]:
+            raise ValueError("Category for Subredit must be either 'hot', 'top', or 'new' or for User must be 'userhot', 'usertop', or 'usernew'")
+
+    def _fetch_subreddit_page(self, subreddit, category, time_filter, batch_size, after):
+        if category == "hot":
+            url = f"{self.base_url}/r/{subreddit}/hot.json"
+        elif category == "top":
+            url = f"{self.base_url}/r/{subreddit}/top.json"
+        elif category == "new":
+            url = f"{self.base_url}/r/{subreddit}/new.json"
+        elif category == "userhot":
+            url = f"{self.base_url}/user/{subreddit}/submitted/hot.json"
+        elif category == "usertop":
+            url = f"{self.base_url}/user/{subreddit}/submitted/top.json"
+        else:
+            url = f"{self.base_url}/user/{subreddit}/submitted/new.json"
+
+        params = {
+            "limit": batch_size,
+            "after": after,
+            "raw_json": 1,
+            "t": time_filter,
+        }
+        response = None
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            self.logger.debug("Subreddit/user posts request successful")
+        except Exception as e:
+            self.logger.info("Subreddit/user posts request unsuccessful: %s", e)
+            if response is not None:
+                self.logger.info(f"Failed to fetch posts for subreddit/user {subreddit}: {response.status_code}")
+            else:
+                self.logger.info(f"Failed to fetch posts for subreddit/user: {subreddit}: {e}")
+            return [], None
+
+        data = response.json()
+        posts = []
+        for post in data["data"]["children"]:
+            post_data = post["data"]
+            post_info = {
+                "title": post_data["title"],
+                "author": post_data["author"],
+                "permalink": post_data["permalink"],
+                "score": post_data["score"],
+                "num_comments": post_data["num_comments"],
+                "created_utc": post_data["created_utc"],
+            }
+            if post_data.get("post_hint") == "image" and "url" in post_data:
+                post_info["image_url"] = post_data["url"]
+            elif "preview" in post_data and "images" in post_data["preview"]:
+                post_info["image_url"] = post_data["preview"]["images"][0][
+                    "source"
+                ]["url"]
+            if "thumbnail" in post_data and post_data["thumbnail"] != "self":
+                post_info["thumbnail_url"] = post_data["thumbnail"]
+            posts.append(post_info)
+
+        return posts, data["data"].get("after")